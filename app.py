@@ -38,6 +38,12 @@ with app.app_context():
     # Make sure to import the models here or their tables won't be created
     import models
     db.create_all()
+    
+    # Add columns and indexes introduced since the database was created
+    from migrations import upgrade_schema
+    upgrade_schema(db.engine, db.metadata)
 
 if __name__ == "__main__":
+    from jobs import start_workers
+    start_workers()
     app.run(host="0.0.0.0", port=5000, debug=True)
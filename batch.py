@@ -0,0 +1,313 @@
+import os
+import sys
+import asyncio
+import argparse
+import logging
+import itertools
+import threading
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, CancelledError as FutureCancelled, TimeoutError as FutureTimeout
+from app import app, db
+from models import ScrapingSession
+from scraper import scrape_records
+from storage import serialize_elements, store_rows, check_session, SESSION_DELETED_ERRORS
+from parsers import AUTO, PARSER_BACKENDS
+
+# Batch scraping engine.
+#
+# Pages are fetched concurrently on an asyncio event loop. The blocking
+# fetch/parse/extract work for each page runs on a thread pool sized to the
+# global concurrency cap (parsing moves to the parse pool when it is enabled,
+# see parse_pool.py), and a per-host semaphore keeps any single site from
+# receiving more than per_host requests at once. Results are written to the
+# database as soon as each page finishes, one child ScrapingSession per URL
+# under a parent session for the whole batch.
+
+DEFAULT_CONCURRENCY = int(os.environ.get('SCRAPER_BATCH_CONCURRENCY', 32))
+DEFAULT_PER_HOST = int(os.environ.get('SCRAPER_BATCH_PER_HOST', 4))
+# Largest concurrency or per_host a batch, crawl or sitemap request may ask for
+MAX_CONCURRENCY = int(os.environ.get('SCRAPER_BATCH_MAX_CONCURRENCY', DEFAULT_CONCURRENCY * 8))
+
+def scrape_page(url, selector_type, selector_value, parser=None, follow_links=False):
+    """
+    Fetch, parse and extract a single page. Runs on a worker thread.
+
+    Args:
+        url (str): The URL to scrape
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        parser (str): Parser backend, None for the app default
+        follow_links (bool): Whether to collect the page's internal links
+            (used by the crawler)
+
+    Returns:
+        dict: The page result with fetch details, serialized rows and links
+    """
+    fetch_info = {}
+    stats = {}
+    result = scrape_records(url, selector_type, selector_value, parser, fetch_info, stats, follow_links)
+    if result is None:
+        return {'url': url, 'fetch_info': fetch_info, 'rows': None, 'title': None, 'links': [],
+                'error': fetch_info.get('error')}
+
+    # Serialize on the worker thread so the event loop only does the inserts
+    rows = list(serialize_elements(result['records']))
+    return {'url': url, 'fetch_info': fetch_info, 'rows': rows, 'title': result['title'] or url,
+            'links': result['links'], 'stats': stats}
+
+def store_page(parent, selector_type, selector_value, result):
+    """
+    Store one finished page as a child session of the batch.
+
+    Args:
+        parent (ScrapingSession): The batch session
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        result (dict): The page result from scrape_page
+    """
+    child = ScrapingSession(
+        url=result['url'],
+        selector_type=selector_type,
+        selector_value=selector_value,
+        name=(result['title'] or result['url'])[:100],
+        parent_id=parent.id,
+        parser=parent.parser,
+        status="in-progress"
+    )
+    child.record_fetch(result['fetch_info'])
+    child.bytes_saved = result.get('stats', {}).get('bytes_saved')
+    parent.record_cache_status(result['fetch_info'].get('cache_status'))
+    db.session.add(child)
+
+    if result['rows'] is None:
+        child.status = "failed"
+        child.error_message = result.get('error') or "Failed to retrieve content from URL"
+        check_session(parent.id)
+        db.session.commit()
+        return
+
+    # The child's rows and both item counts are committed together
+    db.session.flush()
+    parent.item_count = (parent.item_count or 0) + len(result['rows'])
+    store_rows(child, result['rows'])
+
+async def scrape_batch_async(urls, selector_type, selector_value, parent, concurrency=None, per_host=None):
+    """
+    Scrape many URLs concurrently and stream the results into the database.
+
+    URLs are pulled from the iterable lazily, so generators with very many
+    entries are never materialized in memory. The iterable is read on its own
+    thread and handed over through a bounded queue, so generators that block
+    (such as sitemap streams) do not stall the pages in flight.
+
+    Args:
+        urls (iterable): The URLs to scrape
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        parent (ScrapingSession): The batch session receiving the results
+        concurrency (int): Maximum number of pages in flight overall
+        per_host (int): Maximum number of pages in flight per host
+
+    Returns:
+        dict: Counts of completed and failed pages
+    """
+    concurrency = max(1, concurrency or DEFAULT_CONCURRENCY)
+    per_host = max(1, per_host or DEFAULT_PER_HOST)
+
+    loop = asyncio.get_running_loop()
+    # Read once: the session object cannot be reloaded once it is deleted
+    parser = parent.parser
+    global_slots = asyncio.Semaphore(concurrency)
+    host_slots = defaultdict(lambda: asyncio.Semaphore(per_host))
+    counts = {'completed': 0, 'failed': 0}
+
+    async def scrape_one(url):
+        host = urllib.parse.urlparse(url).netloc.lower()
+        # Take the host slot first so pages queued behind a busy host do not
+        # hold global slots other hosts could use
+        async with host_slots[host]:
+            async with global_slots:
+                try:
+                    return await loop.run_in_executor(executor, scrape_page, url, selector_type, selector_value, parser)
+                except Exception as e:
+                    logging.error(f"Batch error for {url}: {str(e)}")
+                    return {'url': url, 'fetch_info': {}, 'rows': None, 'title': None, 'links': [], 'error': str(e)}
+
+    def handle(task):
+        result = task.result()
+        try:
+            store_page(parent, selector_type, selector_value, result)
+        except SESSION_DELETED_ERRORS:
+            # The batch was deleted: stop instead of failing every page left
+            raise
+        except Exception as e:
+            logging.error(f"Error storing batch result for {result['url']}: {str(e)}")
+            db.session.rollback()
+            result['rows'] = None
+        counts['failed' if result['rows'] is None else 'completed'] += 1
+
+    # Keep a bounded number of tasks alive; queued URLs stay in the iterable
+    max_pending = concurrency * 4
+    url_queue = asyncio.Queue(maxsize=max_pending)
+    stop = threading.Event()
+
+    def put(item):
+        """Hand an item to the event loop, giving up once the batch has stopped"""
+        future = asyncio.run_coroutine_threadsafe(url_queue.put(item), loop)
+        while not stop.is_set():
+            try:
+                future.result(timeout=1)
+                return True
+            except FutureTimeout:
+                continue
+            except FutureCancelled:
+                # The loop cancelled the put because the batch is stopping
+                return False
+        future.cancel()
+        return False
+
+    def produce():
+        try:
+            for url in urls:
+                url = url.strip()
+                if url and not put(url):
+                    return
+        except Exception as e:
+            logging.error(f"Error reading batch URLs: {str(e)}")
+        # None marks the end of the URLs
+        put(None)
+
+    pending = set()
+    producer = loop.run_in_executor(None, produce)
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as executor:
+            # Wait for the next URL and the pages in flight together, so pages
+            # are stored as they finish even while the iterable is slow
+            getter = None
+            exhausted = False
+            while True:
+                if getter is None and not exhausted and len(pending) < max_pending:
+                    getter = asyncio.ensure_future(url_queue.get())
+                waiting = pending | {getter} if getter is not None else pending
+                if not waiting:
+                    break
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task is getter:
+                        getter = None
+                        url = task.result()
+                        if url is None:
+                            exhausted = True
+                        else:
+                            pending.add(asyncio.create_task(scrape_one(url)))
+                    else:
+                        pending.discard(task)
+                        handle(task)
+    finally:
+        stop.set()
+    await producer
+
+    return counts
+
+def create_batch_session(first_url, selector_type, selector_value, name=None, parser=None, source='batch'):
+    """
+    Create the parent session that groups the pages of a batch.
+
+    Args:
+        first_url (str): The first URL of the batch, shown as the session URL
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        name (str): Optional session name
+        parser (str): Parser backend for every page, None for the app default
+        source (str): What runs the batch ('batch', 'crawl' or 'sitemap')
+
+    Returns:
+        ScrapingSession: The new in-progress session
+    """
+    parent = ScrapingSession(
+        url=first_url,
+        selector_type=selector_type,
+        selector_value=selector_value,
+        name=name or f"Batch from {urllib.parse.urlparse(first_url).netloc}",
+        parser=parser,
+        source=source,
+        status="in-progress"
+    )
+    db.session.add(parent)
+    db.session.commit()
+    return parent
+
+def run_batch(urls, selector_type, selector_value, name=None, concurrency=None, per_host=None, parent_session_id=None,
+              parser=None):
+    """
+    Scrape a batch of URLs. Python entry point for the batch engine.
+
+    Must be called inside an application context.
+
+    Args:
+        urls (iterable): The URLs to scrape
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        name (str): Optional name for the batch session
+        concurrency (int): Maximum number of pages in flight overall
+        per_host (int): Maximum number of pages in flight per host
+        parent_session_id (int): Existing batch session to fill instead of
+            creating a new one
+        parser (str): Parser backend for a new batch session
+
+    Returns:
+        int: The ID of the batch session, or None if no URLs were given
+    """
+    urls = iter(urls)
+    if parent_session_id:
+        parent = db.session.get(ScrapingSession, parent_session_id)
+    else:
+        first_url = next((url.strip() for url in urls if url.strip()), None)
+        if not first_url:
+            return None
+        parent = create_batch_session(first_url, selector_type, selector_value, name, parser)
+        urls = itertools.chain([first_url], urls)
+
+    try:
+        counts = asyncio.run(scrape_batch_async(urls, selector_type, selector_value, parent, concurrency, per_host))
+        parent.status = "completed"
+        if counts['failed']:
+            parent.error_message = f"{counts['failed']} of {counts['completed'] + counts['failed']} pages failed"
+        logging.info(f"Batch {parent.id} finished: {counts}")
+    except SESSION_DELETED_ERRORS:
+        db.session.rollback()
+        raise
+    except Exception as e:
+        logging.error(f"Batch error: {str(e)}")
+        db.session.rollback()
+        parent.status = "failed"
+        parent.error_message = str(e)
+    db.session.commit()
+    return parent.id
+
+def main(argv=None):
+    """Command line entry point: python batch.py urls.txt -t tag -v h1"""
+    parser = argparse.ArgumentParser(description='Scrape many URLs concurrently')
+    parser.add_argument('url_file', help="File with one URL per line, or '-' for stdin")
+    parser.add_argument('-t', '--selector-type', default='tag')
+    parser.add_argument('-v', '--selector-value', default='')
+    parser.add_argument('-n', '--name', default=None)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST)
+    parser.add_argument('--parser', default=None, choices=[AUTO] + PARSER_BACKENDS)
+    args = parser.parse_args(argv)
+
+    url_file = sys.stdin if args.url_file == '-' else open(args.url_file, encoding='utf-8')
+    with url_file, app.app_context():
+        session_id = run_batch(url_file, args.selector_type, args.selector_value, args.name, args.concurrency, args.per_host,
+                               parser=args.parser)
+
+    if session_id is None:
+        print('No URLs given')
+        return 1
+    print(f'Batch session {session_id} finished')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Parity check and timing for the HTML parser backends.
+
+The parity checks themselves run as tests (tests/test_parser_parity.py);
+this script is for timing the backends on larger pages.
+
+Parses the generated fixture pages with every installed backend and checks
+that every extract_* mode and identify_important_elements return the same
+serialized results as html.parser, then prints the parse and extract time
+per backend. Exits with status 1 when any backend disagrees.
+
+Malformed markup is where backends legitimately differ (lxml and html5lib
+repair broken nesting the way browsers do), so the fixtures are
+well-formed pages.
+
+Usage:
+    python benchmarks/parser_parity.py [--sizes 200 2000]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from parsers import available_parsers
+from scraper import PARSE_FULL, parse_mode, parse_document, extract_elements, identify_important_elements, serialize_element
+from selector_options import build_page
+
+REFERENCE = 'html.parser'
+
+# Every selector the parity check runs (robots is skipped: it reads robots.txt, not the page)
+SELECTORS = [
+    ('tag', ''), ('tag', 'a'), ('tag', 'li'), ('class', 'title'), ('class', 'meta'), ('id', 'post-3'),
+    ('css', 'article h2.title'), ('css', '.items > li'),
+    ('images', 'All Images'), ('images', 'Large Images Only'), ('images', 'Product Images'), ('images', 'Banner Images'),
+    ('links', 'All Links'), ('links', 'Internal Links'), ('links', 'External Links'),
+    ('links', 'Navigation Links'), ('links', 'Footer Links'),
+    ('meta', 'All Meta Tags'), ('meta', 'Title & Description'), ('meta', 'Keywords'),
+    ('meta', 'Open Graph Data'), ('meta', 'Twitter Cards'),
+]
+
+HEAD = ('<head><title>Fixture</title><base href="https://example.com">'
+        '<meta name="description" content="A fixture page"><meta name="keywords" content="a, b">'
+        '<meta property="og:title" content="OG"><meta property="og:type" content="article">'
+        '<meta name="twitter:card" content="summary"><meta name="twitter:site" content="@x"></head>')
+
+def fixture(blocks):
+    """A generated page with a head full of meta tags"""
+    page = build_page(blocks)
+    start, end = page.index('<head>'), page.index('</head>') + len('</head>')
+    return page[:start] + HEAD + page[end:]
+
+def run_selectors(html, parser):
+    """Extract every selector with one backend, returning serialized results and timings"""
+    results = {}
+    timings = {'parse': 0.0, 'extract': 0.0}
+    for selector_type, selector_value in SELECTORS:
+        start = time.perf_counter()
+        soup = parse_document(html, parse_mode(selector_type, selector_value), parser)
+        soup.__dict__['url'] = 'https://example.com/'
+        parsed = time.perf_counter()
+        results[(selector_type, selector_value)] = [
+            serialize_element(element) for element in extract_elements(soup, selector_type, selector_value)
+        ]
+        timings['extract'] += time.perf_counter() - parsed
+        timings['parse'] += parsed - start
+
+    soup = parse_document(html, PARSE_FULL, parser)
+    soup.__dict__['url'] = 'https://example.com/'
+    results['selector options'] = identify_important_elements(soup)
+    return results, timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check parser backend parity')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 2000])
+    args = parser.parse_args(argv)
+
+    backends = available_parsers()
+    print(f"Installed backends: {', '.join(backends)}")
+    failed = False
+    for size in args.sizes:
+        html = fixture(size)
+        expected, reference_timings = run_selectors(html, REFERENCE)
+        print(f"\n{size} blocks ({len(html) // 1024} KB)")
+        print(f"  {REFERENCE:<12} parse {reference_timings['parse'] * 1000:>8.1f}ms  extract {reference_timings['extract'] * 1000:>8.1f}ms")
+        for backend in backends:
+            if backend == REFERENCE:
+                continue
+            actual, timings = run_selectors(html, backend)
+            mismatches = [key for key in expected if actual.get(key) != expected[key]]
+            status = 'ok' if not mismatches else f"MISMATCH in {mismatches}"
+            failed = failed or bool(mismatches)
+            print(f"  {backend:<12} parse {timings['parse'] * 1000:>8.1f}ms  extract {timings['extract'] * 1000:>8.1f}ms  "
+                  f"{reference_timings['parse'] / timings['parse']:.1f}x  {status}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Throughput and isolation check for the parse pool.
+
+Extracts records from a batch of large generated pages on a thread pool,
+first in the calling threads and then through the parse pool, while the
+main thread keeps extracting a small page and timing it. Prints pages per
+second for the large pages and the small page's latency, which shows how
+much the large pages hold it up, and checks that both paths return the
+same records.
+
+Multi-core hosts should see the throughput scale with --processes; on a
+single core only the latency numbers change.
+
+Usage:
+    python benchmarks/pool_throughput.py [--pages 16] [--blocks 3000] [--processes 4]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import parse_pool
+from scraper import extract_document
+from selector_options import build_page
+
+URL = 'https://example.com/'
+SELECTOR = ('tag', 'p')
+
+def extract(document):
+    """Extract the benchmark selector from a page through the parse pool (or in-thread)"""
+    result = parse_pool.run(extract_document, URL, document, SELECTOR[0], SELECTOR[1], 'html.parser')
+    return [(record.element_type, record.text, record.attrs) for record in result['records']]
+
+def run(documents, small, workers):
+    """Extract all large pages on worker threads while timing the small page"""
+    latencies = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(extract, document) for document in documents]
+        while not all(future.done() for future in futures):
+            small_started = time.perf_counter()
+            extract(small)
+            latencies.append(time.perf_counter() - small_started)
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - started, latencies
+
+def report(label, pages, elapsed, latencies):
+    latencies = latencies or [0.0]
+    print(f"  {label:<10} {pages / elapsed:>6.1f} pages/s  small page p50 {statistics.median(latencies) * 1000:>7.1f}ms"
+          f"  max {max(latencies) * 1000:>7.1f}ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare in-thread parsing with the parse pool')
+    parser.add_argument('--pages', type=int, default=16)
+    parser.add_argument('--blocks', type=int, default=3000)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    documents = [{'content': build_page(args.blocks, seed).encode('utf-8'), 'content_type': 'text/html; charset=utf-8'}
+                 for seed in range(args.pages)]
+    small = {'content': build_page(5).encode('utf-8'), 'content_type': 'text/html; charset=utf-8'}
+    size = len(documents[0]['content']) // 1024
+    print(f"{args.pages} pages of {size} KB, {args.processes} processes, {os.cpu_count()} CPUs")
+
+    parse_pool.configure(processes=0)
+    expected, elapsed, latencies = run(documents, small, args.processes)
+    report('in-thread', args.pages, elapsed, latencies)
+
+    parse_pool.configure(processes=args.processes)
+    # Start the workers before timing
+    extract(small)
+    actual, elapsed, latencies = run(documents, small, args.processes)
+    report('pool', args.pages, elapsed, latencies)
+    parse_pool.shutdown()
+
+    if actual != expected:
+        print("MISMATCH between in-thread and pooled records")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
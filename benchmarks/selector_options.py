@@ -0,0 +1,333 @@
+"""
+Benchmark for scraper.identify_important_elements.
+
+Compares the single-pass analyzer with the original implementation, which
+walked the tree once per question (find_all for classes and ids, ~21
+soup.select() probes, several image and link loops), on generated pages of
+increasing size. Both versions must return identical results.
+
+Usage:
+    python benchmarks/selector_options.py [--sizes 200 2000 10000] [--repeat 3]
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import urllib.parse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from scraper import identify_important_elements
+
+def legacy_identify_important_elements(soup):
+    """
+    The original multi-pass identify_important_elements, kept for comparison.
+    
+    Args:
+        soup (BeautifulSoup): The parsed HTML
+        
+    Returns:
+        dict: A dictionary containing lists of important selectors by type
+    """
+    if not soup:
+        return {
+            'tags': [],
+            'classes': [],
+            'ids': [],
+            'css': [],
+            'images': [],
+            'links': []
+        }
+    
+    # Initialize result dictionary
+    results = {
+        'tags': [],
+        'classes': [],
+        'ids': [],
+        'css': [],
+        'images': [],
+        'links': []
+    }
+    
+    # Identify important tags (elements with substantial content)
+    content_tags = ['div', 'article', 'section', 'p', 'h1', 'h2', 'h3', 'main', 'header', 'footer', 'nav', 'aside', 'ul', 'ol', 'table', 'a']
+    
+    # Add all important tags by default
+    results['tags'] = content_tags
+    
+    # Find important classes (those used multiple times and associated with content)
+    all_classes = []
+    for tag in soup.find_all(True):
+        if 'class' in tag.attrs:
+            # Flatten the list if it's a list
+            if isinstance(tag['class'], list):
+                all_classes.extend(tag['class'])
+            else:
+                all_classes.append(tag['class'])
+    
+    # Count occurrences of each class
+    class_counter = Counter(all_classes)
+    
+    # Choose classes that appear multiple times (likely pattern indicators)
+    # and those with semantically meaningful names
+    semantic_patterns = [
+        'content', 'article', 'post', 'entry', 'main', 'container', 
+        'wrapper', 'body', 'text', 'item', 'card', 'list', 'grid', 
+        'product', 'news', 'story', 'blog', 'title', 'headline',
+        'header', 'footer', 'author', 'date', 'time', 'price'
+    ]
+    
+    important_classes = []
+    
+    # Add classes that appear multiple times
+    for cls, count in class_counter.items():
+        if count > 2:
+            important_classes.append(cls)
+    
+    # Add classes with semantically meaningful names
+    for cls in all_classes:
+        if cls and any(pattern in cls.lower() for pattern in semantic_patterns):
+            if cls not in important_classes:
+                important_classes.append(cls)
+    
+    # Limit to 15 most common classes to avoid overwhelming
+    results['classes'] = important_classes[:15]
+    
+    # Find important IDs (those associated with main content)
+    important_ids = []
+    for tag in soup.find_all(id=True):
+        id_val = tag['id']
+        # Check if ID seems meaningful for content
+        if any(pattern in id_val.lower() for pattern in ['content', 'main', 'article', 'post', 'container', 'wrapper']):
+            important_ids.append(id_val)
+    
+    results['ids'] = important_ids
+    
+    # Generate some useful CSS selectors
+    # Main content areas
+    article_selectors = ['article', 'main', 'div.content', 'div.main', 'div.article', 'div#content', 'div#main', 'section.content']
+    # List items
+    list_selectors = ['ul li', 'ol li', 'div.item', '.items > *', '.list > *', '.articles > *', '.products > *']
+    # Headings
+    heading_selectors = ['h1', 'h2', 'h3', '.title', '.heading', '.headline']
+    
+    # Check which selectors actually match elements on the page
+    results['css'] = []
+    for selector in article_selectors + list_selectors + heading_selectors:
+        try:
+            if soup.select(selector):
+                results['css'].append(selector)
+        except:
+            pass
+    
+    # Find image categories available on the page
+    all_images = soup.find_all('img')
+    if all_images:
+        # Always include "All Images" as an option
+        results['images'] = ['All Images']
+        
+        # Check for large images
+        large_images = []
+        for img in all_images:
+            width = img.get('width')
+            height = img.get('height')
+            style = img.get('style', '')
+            
+            try:
+                width = int(width) if width and width.isdigit() else 0
+                height = int(height) if height and height.isdigit() else 0
+            except (ValueError, TypeError):
+                width, height = 0, 0
+                
+            # Check for size in style attribute
+            width_in_style = re.search(r'width\s*:\s*(\d+)', style)
+            height_in_style = re.search(r'height\s*:\s*(\d+)', style)
+            
+            if width_in_style:
+                width = int(width_in_style.group(1))
+            if height_in_style:
+                height = int(height_in_style.group(1))
+                
+            if width > 200 or height > 200:
+                large_images.append(img)
+        
+        if large_images:
+            results['images'].append('Large Images Only')
+            
+        # Check for product images
+        product_indicators = ['product', 'item', 'thumbnail', 'gallery', 'goods', 'merch']
+        product_images = []
+        
+        for img in all_images:
+            alt_text = img.get('alt', '').lower()
+            img_class = ' '.join(img.get('class', [])).lower() if img.get('class') else ''
+            img_id = img.get('id', '').lower()
+            img_src = img.get('src', '').lower()
+            
+            if any(indicator in attr for indicator in product_indicators for attr in [alt_text, img_class, img_id, img_src]):
+                product_images.append(img)
+                
+        if product_images:
+            results['images'].append('Product Images')
+            
+        # Check for banner images
+        banner_indicators = ['banner', 'hero', 'slide', 'carousel', 'header', 'cover', 'featured']
+        banner_images = []
+        
+        for img in all_images:
+            alt_text = img.get('alt', '').lower()
+            img_class = ' '.join(img.get('class', [])).lower() if img.get('class') else ''
+            img_id = img.get('id', '').lower()
+            
+            if any(indicator in attr for indicator in banner_indicators for attr in [alt_text, img_class, img_id]):
+                banner_images.append(img)
+                
+        if banner_images:
+            results['images'].append('Banner Images')
+    
+    # Find link categories available on the page
+    all_links = soup.find_all('a', href=True)
+    if all_links:
+        # Always include "All Links" as an option
+        results['links'] = ['All Links']
+        
+        # Get the base URL to determine internal vs external links
+        base_url = None
+        base_tag = soup.find('base', href=True)
+        if base_tag:
+            base_url = base_tag['href']
+            
+        # If we don't have a base URL from a <base> tag, try to extract from page URL
+        if not base_url and 'url' in soup.__dict__:
+            parsed_url = urllib.parse.urlparse(soup.__dict__.get('url'))
+            base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        
+        if base_url:
+            # Check for internal and external links
+            internal_links = []
+            external_links = []
+            
+            for link in all_links:
+                href = link['href']
+                # Skip fragment-only links
+                if href.startswith('#'):
+                    continue
+                    
+                # Handle relative URLs
+                if not href.startswith(('http://', 'https://', '//')):
+                    internal_links.append(link)
+                else:
+                    # Check if link is to the same domain
+                    parsed_href = urllib.parse.urlparse(href)
+                    href_domain = f"{parsed_href.scheme}://{parsed_href.netloc}"
+                    if href_domain == base_url:
+                        internal_links.append(link)
+                    else:
+                        external_links.append(link)
+                        
+            if internal_links:
+                results['links'].append('Internal Links')
+            if external_links:
+                results['links'].append('External Links')
+        
+        # Check for navigation links
+        nav_containers = soup.select('nav, .nav, .navigation, .menu, header, .header, .navbar')
+        nav_links = []
+        
+        for container in nav_containers:
+            nav_links.extend(container.find_all('a', href=True))
+            
+        if nav_links:
+            results['links'].append('Navigation Links')
+            
+        # Check for footer links
+        footer_containers = soup.select('footer, .footer, #footer')
+        footer_links = []
+        
+        for container in footer_containers:
+            footer_links.extend(container.find_all('a', href=True))
+            
+        if footer_links:
+            results['links'].append('Footer Links')
+    
+    return results
+
+def build_page(blocks, seed=0):
+    """
+    Generate a large, realistic page with the given number of content blocks.
+
+    Args:
+        blocks (int): Number of article cards / list entries to generate
+        seed (int): Seed for the random attribute choices
+
+    Returns:
+        str: The HTML document
+    """
+    rng = random.Random(seed)
+    classes = ['card', 'item', 'teaser', 'grid-cell', 'product-tile', 'meta', 'byline', 'x1', 'x2', 'promo']
+    parts = [
+        '<!DOCTYPE html><html><head><title>Fixture</title><base href="https://example.com"></head><body>',
+        '<header class="site-header"><nav class="navbar"><ul>',
+    ]
+    parts += [f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(20)]
+    parts.append('</ul></nav><img class="hero-banner" src="/hero.jpg" width="1200"></header>')
+    parts.append('<main id="main-content"><div class="content"><ul class="items">')
+    for i in range(blocks):
+        cls = ' '.join(rng.sample(classes, 2))
+        href = rng.choice([f'/post/{i}', f'https://example.com/p/{i}', f'https://other{i % 7}.org/x', f'#c{i}'])
+        image = rng.choice([
+            f'<img src="/img/{i}.jpg" alt="photo {i}">',
+            f'<img src="/product/{i}.png" width="300" height="300">',
+            f'<img src="/t/{i}.gif" style="width: 80px">',
+            '',
+        ])
+        parts.append(
+            f'<li class="{cls}"><article id="post-{i}"><h2 class="title">Post {i}</h2>'
+            f'<p class="text">Lorem ipsum dolor sit amet {i}</p>{image}'
+            f'<div class="meta"><span class="date">2024-01-{i % 28 + 1:02d}</span>'
+            f'<a href="{href}">Read more</a></div></article></li>'
+        )
+    parts.append('</ul><ol><li>Ordered</li></ol></div></main>')
+    parts.append('<footer id="footer"><div class="footer-links">')
+    parts += [f'<a href="https://social{i}.example.net/">Social {i}</a>' for i in range(10)]
+    parts.append('</div></footer></body></html>')
+    return ''.join(parts)
+
+def best_time(func, soup, repeat):
+    """Return the best wall-clock time of several runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(soup)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark identify_important_elements')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 2000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'blocks':>8} {'elements':>9} {'legacy':>10} {'single-pass':>12} {'speedup':>8}")
+    for size in args.sizes:
+        soup = BeautifulSoup(build_page(size), 'html.parser')
+        soup.__dict__['url'] = 'https://example.com/'
+
+        expected = legacy_identify_important_elements(soup)
+        actual = identify_important_elements(soup)
+        if actual != expected:
+            print(f"Results differ for {size} blocks:\n  legacy: {expected}\n  single-pass: {actual}")
+            return 1
+
+        legacy = best_time(legacy_identify_important_elements, soup, args.repeat)
+        single = best_time(identify_important_elements, soup, args.repeat)
+        elements = len(soup.find_all(True))
+        print(f"{size:>8} {elements:>9} {legacy * 1000:>8.1f}ms {single * 1000:>10.1f}ms {legacy / single:>7.1f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
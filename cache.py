@@ -0,0 +1,382 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from utils import canonicalize_url
+
+class DocumentCache:
+    """
+    In-process LRU cache of fetched documents keyed by canonical URL.
+
+    Each entry holds the raw response body and, optionally, parsed trees
+    keyed by how they were parsed. Entries expire after a TTL and the cache
+    is bounded both by entry count and by the total size of stored bodies.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=64 * 1024 * 1024, ttl=120):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _expired(self, entry):
+        return time.monotonic() - entry['stored_at'] > self.ttl
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= len(entry['content'])
+
+    def get(self, url):
+        """
+        Get a cached document.
+
+        Args:
+            url (str): The URL of the document
+
+        Returns:
+            dict: The cache entry or None if missing or expired
+        """
+        key = canonicalize_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, url, content, **metadata):
+        """
+        Store a document body, replacing any previous entry for the URL.
+
+        Args:
+            url (str): The URL of the document
+            content (bytes): The raw response body
+            **metadata: Extra values stored on the entry (encoding, headers...)
+
+        Returns:
+            dict: The new cache entry
+        """
+        key = canonicalize_url(url)
+        entry = dict(metadata, content=content, trees={}, stored_at=time.monotonic())
+
+        # Bodies larger than the whole cache are not worth keeping
+        if len(content) > self.max_bytes:
+            return entry
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._total_bytes += len(content)
+            while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                logging.debug(f"Evicting cached document {oldest_key}")
+                self._remove(oldest_key)
+        return entry
+
+    def get_tree(self, url, parse_key):
+        """
+        Get a parsed tree stored for a cached document.
+
+        Args:
+            url (str): The URL of the document
+            parse_key (str): Identifies how the tree was parsed
+
+        Returns:
+            object: The parsed tree or None
+        """
+        entry = self.get(url)
+        if entry is None:
+            return None
+        return entry['trees'].get(parse_key)
+
+    def set_tree(self, url, parse_key, tree):
+        """
+        Attach a parsed tree to a cached document.
+
+        Args:
+            url (str): The URL of the document
+            parse_key (str): Identifies how the tree was parsed
+            tree (object): The parsed tree
+        """
+        entry = self.get(url)
+        if entry is not None:
+            entry['trees'][parse_key] = tree
+
+    def invalidate(self, url):
+        """Drop a single document from the cache."""
+        with self._lock:
+            self._remove(canonicalize_url(url))
+
+    def clear(self):
+        """Drop every cached document."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """
+        Get the current cache size.
+
+        Returns:
+            dict: Entry count and stored bytes
+        """
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._total_bytes}
+
+# Shared by scrape_url, get_page_title and get_selector_options so an
+# analyze-then-scrape flow fetches and parses each page only once
+document_cache = DocumentCache(
+    max_entries=int(os.environ.get('SCRAPER_DOC_CACHE_ENTRIES', 64)),
+    max_bytes=int(os.environ.get('SCRAPER_DOC_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    ttl=float(os.environ.get('SCRAPER_DOC_CACHE_TTL', 120))
+)
+
+def _parse_max_age(cache_control):
+    """
+    Read the max-age directive from a Cache-Control header.
+
+    Args:
+        cache_control (str): The header value
+
+    Returns:
+        int: The max-age in seconds, or 0 if absent or not cacheable
+    """
+    directives = [part.strip().lower() for part in (cache_control or '').split(',')]
+    if 'no-cache' in directives or 'no-store' in directives:
+        return 0
+    for directive in directives:
+        if directive.startswith('max-age='):
+            try:
+                return max(int(directive[8:]), 0)
+            except ValueError:
+                return 0
+    return 0
+
+class HttpCache:
+    """
+    Persistent on-disk HTTP response cache.
+
+    Bodies are stored gzip-compressed next to a small JSON file holding the
+    validators (ETag / Last-Modified) and freshness information. The files'
+    modification times track recency, and the least recently used responses
+    are evicted once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _paths(self, url):
+        key = hashlib.sha256(canonicalize_url(url).encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.gz'
+
+    def _scan(self):
+        """Return (mtime, size, meta_path, body_path) for every cached response."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            meta_path = os.path.join(self.directory, name)
+            body_path = meta_path[:-5] + '.gz'
+            try:
+                size = os.path.getsize(meta_path) + os.path.getsize(body_path)
+                entries.append((os.path.getmtime(meta_path), size, meta_path, body_path))
+            except OSError:
+                continue
+        return entries
+
+    def lookup(self, url):
+        """
+        Get the stored metadata for a URL.
+
+        Args:
+            url (str): The requested URL
+
+        Returns:
+            dict: The stored metadata (with a 'fresh' flag) or None
+        """
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+            if not os.path.exists(body_path):
+                return None
+            # Mark as recently used for LRU eviction
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+
+        meta['fresh'] = time.time() < meta.get('fresh_until', 0)
+        return meta
+
+    def load_body(self, url):
+        """
+        Read a stored response body.
+
+        Args:
+            url (str): The requested URL
+
+        Returns:
+            bytes: The decompressed body or None
+        """
+        _, body_path = self._paths(url)
+        try:
+            with open(body_path, 'rb') as body_file:
+                return gzip.decompress(body_file.read())
+        except (OSError, EOFError) as e:
+            logging.warning(f"Discarding unreadable cache entry for {url}: {str(e)}")
+            return None
+
+    def conditional_headers(self, meta):
+        """
+        Build the revalidation headers for a stored response.
+
+        Args:
+            meta (dict): The stored metadata
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since headers
+        """
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def store(self, url, content, headers, encoding=None):
+        """
+        Store a response if it can be revalidated or reused later.
+
+        Args:
+            url (str): The requested URL
+            content (bytes): The response body
+            headers (Mapping): The response headers
+            encoding (str): The response text encoding
+
+        Returns:
+            bool: True if the response was stored
+        """
+        cache_control = headers.get('Cache-Control', '')
+        if 'no-store' in cache_control.lower():
+            return False
+
+        max_age = _parse_max_age(cache_control)
+        meta = {
+            'url': url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_type': headers.get('Content-Type'),
+            'encoding': encoding,
+            'stored_at': time.time(),
+            'fresh_until': time.time() + max_age
+        }
+        # Without validators or a freshness lifetime the entry could never be used
+        if not (meta['etag'] or meta['last_modified'] or max_age):
+            return False
+
+        meta_path, body_path = self._paths(url)
+        compressed = gzip.compress(content, compresslevel=5)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._lock:
+                previous = self._entry_size(meta_path, body_path)
+                self._write_atomic(body_path, compressed)
+                self._write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+                self._adjust_total(self._entry_size(meta_path, body_path) - previous)
+        except OSError as e:
+            logging.warning(f"Could not write HTTP cache entry for {url}: {str(e)}")
+            return False
+        return True
+
+    def refresh(self, url, meta, headers):
+        """
+        Update the freshness of a stored response after a 304 Not Modified.
+
+        Args:
+            url (str): The requested URL
+            meta (dict): The stored metadata
+            headers (Mapping): The 304 response headers
+        """
+        meta = {k: v for k, v in meta.items() if k != 'fresh'}
+        meta['etag'] = headers.get('ETag') or meta.get('etag')
+        meta['last_modified'] = headers.get('Last-Modified') or meta.get('last_modified')
+        meta['fresh_until'] = time.time() + _parse_max_age(headers.get('Cache-Control', ''))
+        meta_path, _ = self._paths(url)
+        try:
+            with self._lock:
+                self._write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            logging.warning(f"Could not refresh HTTP cache entry for {url}: {str(e)}")
+
+    def _entry_size(self, meta_path, body_path):
+        size = 0
+        for path in (meta_path, body_path):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def _write_atomic(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+
+    def _adjust_total(self, delta):
+        """Track the directory size and evict old entries past the cap. Caller holds the lock."""
+        if self._total_bytes is None:
+            self._total_bytes = sum(entry[1] for entry in self._scan())
+        else:
+            self._total_bytes += delta
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        for mtime, size, meta_path, body_path in sorted(self._scan()):
+            if self._total_bytes <= self.max_bytes:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes -= size
+
+    def clear(self):
+        """Remove every stored response."""
+        with self._lock:
+            for _, _, meta_path, body_path in self._scan():
+                for path in (meta_path, body_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            self._total_bytes = 0
+
+_default_http_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'http_cache')
+
+# Optional persistent cache used by fetcher.fetch_document; disable with SCRAPER_HTTP_CACHE=0
+http_cache = None
+if os.environ.get('SCRAPER_HTTP_CACHE', '1').lower() not in ('0', 'false', 'no'):
+    http_cache = HttpCache(
+        os.environ.get('SCRAPER_HTTP_CACHE_DIR', _default_http_cache_dir),
+        max_bytes=int(os.environ.get('SCRAPER_HTTP_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    )
@@ -0,0 +1,98 @@
+import os
+import re
+import codecs
+
+# Character encoding sniffing for fetched documents.
+#
+# Follows the order browsers use: a byte order mark, then the charset in the
+# Content-Type header, then a <meta charset> / http-equiv declaration near the
+# top of the document. Without any of those the body is tried as UTF-8 and
+# otherwise read as windows-1252. Nothing here scans the whole body
+# statistically the way requests' apparent_encoding does, so the cost does not
+# grow with page size beyond one UTF-8 validation in the fallback case.
+
+# How much of the document is searched for a <meta> declaration
+SNIFF_BYTES = int(os.environ.get('SCRAPER_CHARSET_SNIFF_BYTES', 4096))
+
+_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+]
+
+_CONTENT_TYPE_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+# <meta charset="..."> and <meta http-equiv="Content-Type" content="...; charset=...">
+_META_CHARSET = re.compile(
+    rb'<meta[^>]+?charset\s*=\s*["\']?\s*([\w.:-]+)',
+    re.IGNORECASE
+)
+
+# Labels that browsers treat as windows-1252, which is a superset of them
+_WINDOWS_1252_ALIASES = {'ascii', 'latin-1', 'iso8859-1', 'us-ascii'}
+
+def normalize_encoding(label):
+    """
+    Map an encoding label to a Python codec name.
+
+    Args:
+        label (str): An encoding label such as 'UTF8' or 'ISO-8859-1'
+
+    Returns:
+        str: The codec name, or None if the label is unknown
+    """
+    if not label:
+        return None
+    try:
+        name = codecs.lookup(label.strip()).name
+    except LookupError:
+        return None
+    if name in _WINDOWS_1252_ALIASES:
+        return 'cp1252'
+    return name
+
+def charset_from_content_type(content_type):
+    """
+    Read the charset parameter of a Content-Type header.
+
+    Args:
+        content_type (str): The header value
+
+    Returns:
+        str: The normalized codec name, or None if absent or unknown
+    """
+    match = _CONTENT_TYPE_CHARSET.search(content_type or '')
+    return normalize_encoding(match.group(1)) if match else None
+
+def sniff_encoding(content, content_type=None):
+    """
+    Work out the encoding of a document body without decoding all of it.
+
+    Args:
+        content (bytes): The document body
+        content_type (str): The Content-Type header, if any
+
+    Returns:
+        tuple: (codec name, source) where source is 'bom', 'header', 'meta',
+            'utf-8' (validated fallback) or 'default'
+    """
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding, 'bom'
+
+    encoding = charset_from_content_type(content_type)
+    if encoding:
+        return encoding, 'header'
+
+    match = _META_CHARSET.search(content[:SNIFF_BYTES])
+    if match:
+        encoding = normalize_encoding(match.group(1).decode('ascii', 'ignore'))
+        # A UTF-16 declaration in an ASCII-compatible prefix cannot be right
+        if encoding and not encoding.startswith('utf-16'):
+            return encoding, 'meta'
+
+    try:
+        # Incremental, so a body cut off mid-character still validates
+        codecs.getincrementaldecoder('utf-8')().decode(content, final=False)
+        return 'utf-8', 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252', 'default'
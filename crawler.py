@@ -0,0 +1,281 @@
+import os
+import sys
+import asyncio
+import hashlib
+import argparse
+import logging
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import insert, update, func
+from app import app, db
+from models import ScrapingSession, CrawlFrontier
+from batch import scrape_page, store_page, create_batch_session, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST
+from storage import SESSION_DELETED_ERRORS
+from parsers import AUTO, PARSER_BACKENDS
+from utils import canonicalize_url
+import robots
+
+# Multi-page crawler.
+#
+# Starts from a seed URL and follows each page's internal links breadth
+# first, applying the session's selector to every page and storing each one
+# as a child session of the crawl, like a batch. The frontier lives in the
+# crawl_frontier table: it is both the queue (read in small chunks, oldest
+# first) and the seen-set (a unique 64-bit hash per canonical URL), so a
+# crawl of hundreds of thousands of URLs keeps only the pages in flight in
+# memory, and an interrupted crawl picks up where it stopped.
+
+DEFAULT_MAX_DEPTH = int(os.environ.get('SCRAPER_CRAWL_MAX_DEPTH', 2))
+DEFAULT_MAX_PAGES = int(os.environ.get('SCRAPER_CRAWL_MAX_PAGES', 100))
+
+def url_hash(url):
+    """64-bit signed hash of a canonical URL, the frontier's dedupe key"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+def _insert_ignoring_duplicates():
+    """An INSERT that skips URLs already in the frontier"""
+    dialect = db.engine.dialect.name
+    table = CrawlFrontier.__table__
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(table).prefix_with('IGNORE')
+    return dialect_insert(table).on_conflict_do_nothing(index_elements=['session_id', 'url_hash'])
+
+def add_to_frontier(session_id, urls, depth):
+    """
+    Queue newly discovered URLs, skipping those the crawl has already seen.
+
+    URLs robots.txt disallows are not queued at all.
+
+    Args:
+        session_id (int): The crawl session
+        urls (iterable): Canonical URLs
+        depth (int): Link depth of the URLs (the seed is 0)
+    """
+    rows = [
+        {'session_id': session_id, 'url_hash': url_hash(url), 'url': url, 'depth': depth, 'state': 'queued'}
+        for url in urls if robots.is_allowed(url)
+    ]
+    if rows:
+        db.session.execute(_insert_ignoring_duplicates(), rows)
+    db.session.commit()
+
+def claim_frontier(session_id, limit):
+    """
+    Take the oldest queued URLs of a crawl, marking them as being fetched.
+
+    Each URL is claimed with a conditional UPDATE, so when two workers run
+    the same crawl a URL is only fetched by the one that claimed it.
+
+    Args:
+        session_id (int): The crawl session
+        limit (int): Maximum number of URLs
+
+    Returns:
+        list: (id, url, depth) tuples in breadth-first order
+    """
+    rows = db.session.query(CrawlFrontier.id, CrawlFrontier.url, CrawlFrontier.depth).filter_by(
+        session_id=session_id, state='queued').order_by(CrawlFrontier.id).limit(limit).all()
+    claimed = []
+    for row in rows:
+        result = db.session.execute(
+            update(CrawlFrontier).where(CrawlFrontier.id == row.id, CrawlFrontier.state == 'queued')
+            .values(state='fetching'))
+        if result.rowcount == 1:
+            claimed.append(row)
+    if rows:
+        db.session.commit()
+    return claimed
+
+def frontier_counts(session_id):
+    """
+    Count a crawl's frontier URLs by state.
+
+    Returns:
+        dict: state -> number of URLs
+    """
+    return dict(
+        db.session.query(CrawlFrontier.state, func.count(CrawlFrontier.id))
+        .filter(CrawlFrontier.session_id == session_id)
+        .group_by(CrawlFrontier.state)
+        .all()
+    )
+
+async def crawl_async(parent, selector_type, selector_value, max_depth, max_pages, concurrency=None, per_host=None):
+    """
+    Crawl breadth first from the parent session's frontier.
+
+    Args:
+        parent (ScrapingSession): The crawl session receiving the pages
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        max_depth (int): Links further than this from the seed are not followed
+        max_pages (int): Maximum number of pages to scrape, including earlier runs
+        concurrency (int): Maximum number of pages in flight overall
+        per_host (int): Maximum number of pages in flight per host
+
+    Returns:
+        dict: Counts of completed and failed pages
+    """
+    concurrency = max(1, concurrency or DEFAULT_CONCURRENCY)
+    per_host = max(1, per_host or DEFAULT_PER_HOST)
+
+    loop = asyncio.get_running_loop()
+    # Read once: the session object cannot be reloaded once it is deleted
+    parser = parent.parser
+    global_slots = asyncio.Semaphore(concurrency)
+    host_slots = defaultdict(lambda: asyncio.Semaphore(per_host))
+    counts = {'completed': 0, 'failed': 0}
+
+    async def scrape_one(frontier_id, url, depth):
+        host = urllib.parse.urlparse(url).netloc.lower()
+        async with host_slots[host]:
+            async with global_slots:
+                try:
+                    result = await loop.run_in_executor(executor, scrape_page, url, selector_type, selector_value,
+                                                        parser, depth < max_depth)
+                except Exception as e:
+                    logging.error(f"Crawl error for {url}: {str(e)}")
+                    result = {'url': url, 'fetch_info': {}, 'rows': None, 'title': None, 'links': [], 'error': str(e)}
+        result['frontier_id'] = frontier_id
+        result['depth'] = depth
+        return result
+
+    def handle(task):
+        result = task.result()
+        try:
+            store_page(parent, selector_type, selector_value, result)
+        except SESSION_DELETED_ERRORS:
+            # The crawl was deleted: stop before its frontier grows again
+            raise
+        except Exception as e:
+            logging.error(f"Error storing crawl result for {result['url']}: {str(e)}")
+            db.session.rollback()
+            result['rows'] = None
+        failed = result['rows'] is None
+        counts['failed' if failed else 'completed'] += 1
+
+        db.session.execute(update(CrawlFrontier).where(CrawlFrontier.id == result['frontier_id'])
+                           .values(state='failed' if failed else 'done'))
+        add_to_frontier(parent.id, result['links'], result['depth'] + 1)
+
+    # Pages already scraped by an earlier, interrupted run count towards the limit
+    dispatched = sum(count for state, count in frontier_counts(parent.id).items() if state in ('done', 'failed'))
+    max_pending = concurrency * 4
+    pending = set()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='crawl') as executor:
+        while True:
+            room = min(max_pending - len(pending), max_pages - dispatched)
+            if room > 0:
+                for frontier_id, url, depth in claim_frontier(parent.id, room):
+                    pending.add(asyncio.create_task(scrape_one(frontier_id, url, depth)))
+                    dispatched += 1
+            # The frontier only grows when a page finishes, so an empty one
+            # with nothing in flight means the crawl is over
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                handle(task)
+
+    return counts
+
+def create_crawl_session(seed_url, selector_type, selector_value, name=None, parser=None):
+    """
+    Create the parent session of a crawl.
+
+    Args:
+        seed_url (str): The URL the crawl starts from
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        name (str): Optional session name
+        parser (str): Parser backend for every page, None for the app default
+
+    Returns:
+        ScrapingSession: The new in-progress session
+    """
+    return create_batch_session(seed_url, selector_type, selector_value,
+                                name or f"Crawl of {urllib.parse.urlparse(seed_url).netloc}", parser, source='crawl')
+
+def run_crawl(seed_url, selector_type, selector_value, name=None, max_depth=None, max_pages=None, concurrency=None,
+              per_host=None, parent_session_id=None, parser=None):
+    """
+    Crawl a site from a seed URL. Python entry point for the crawler.
+
+    Must be called inside an application context. Running it again for an
+    existing crawl session resumes that crawl.
+
+    Args:
+        seed_url (str): The URL the crawl starts from
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        name (str): Optional name for the crawl session
+        max_depth (int): Links further than this from the seed are not followed
+        max_pages (int): Maximum number of pages to scrape
+        concurrency (int): Maximum number of pages in flight overall
+        per_host (int): Maximum number of pages in flight per host
+        parent_session_id (int): Existing crawl session to fill or resume
+        parser (str): Parser backend for a new crawl session
+
+    Returns:
+        int: The ID of the crawl session
+    """
+    max_depth = DEFAULT_MAX_DEPTH if max_depth is None else max(0, max_depth)
+    max_pages = DEFAULT_MAX_PAGES if max_pages is None else max(1, max_pages)
+
+    if parent_session_id:
+        parent = db.session.get(ScrapingSession, parent_session_id)
+    else:
+        parent = create_crawl_session(seed_url, selector_type, selector_value, name, parser)
+
+    # Pages that were in flight when an earlier run stopped are fetched again
+    db.session.execute(update(CrawlFrontier).where(CrawlFrontier.session_id == parent.id,
+                                                   CrawlFrontier.state == 'fetching').values(state='queued'))
+    add_to_frontier(parent.id, [canonicalize_url(seed_url)], 0)
+
+    try:
+        counts = asyncio.run(crawl_async(parent, selector_type, selector_value, max_depth, max_pages, concurrency,
+                                         per_host))
+        parent.status = "completed"
+        if counts['failed']:
+            parent.error_message = f"{counts['failed']} of {counts['completed'] + counts['failed']} pages failed"
+        logging.info(f"Crawl {parent.id} finished: {counts}")
+    except SESSION_DELETED_ERRORS:
+        db.session.rollback()
+        raise
+    except Exception as e:
+        logging.error(f"Crawl error: {str(e)}")
+        db.session.rollback()
+        parent.status = "failed"
+        parent.error_message = str(e)
+    db.session.commit()
+    return parent.id
+
+def main(argv=None):
+    """Command line entry point: python crawler.py https://example.com/ -t tag -v h1 --max-depth 2"""
+    parser = argparse.ArgumentParser(description='Crawl a site from a seed URL')
+    parser.add_argument('seed_url')
+    parser.add_argument('-t', '--selector-type', default='tag')
+    parser.add_argument('-v', '--selector-value', default='')
+    parser.add_argument('-n', '--name', default=None)
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_MAX_DEPTH)
+    parser.add_argument('--max-pages', type=int, default=DEFAULT_MAX_PAGES)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST)
+    parser.add_argument('--parser', default=None, choices=[AUTO] + PARSER_BACKENDS)
+    parser.add_argument('--resume', type=int, default=None, metavar='SESSION_ID', help='Resume an interrupted crawl')
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        session_id = run_crawl(args.seed_url, args.selector_type, args.selector_value, args.name, args.max_depth,
+                               args.max_pages, args.concurrency, args.per_host, parent_session_id=args.resume,
+                               parser=args.parser)
+    print(f'Crawl session {session_id} finished')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
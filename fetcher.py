@@ -0,0 +1,276 @@
+import os
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import cache
+import throttle
+from charset import charset_from_content_type
+
+# Shared HTTP client used by every fetch in scraper.py.
+#
+# A single requests.Session keeps one urllib3 connection pool per host, so
+# repeated requests to the same site reuse the TCP/TLS connection instead of
+# performing a new handshake each time. Pool sizes and timeouts can be tuned
+# with environment variables or at runtime through configure().
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+settings = {
+    # Number of per-host pools kept alive at the same time
+    'pool_connections': int(os.environ.get('SCRAPER_POOL_CONNECTIONS', 32)),
+    # Maximum number of connections kept alive in each host pool
+    'pool_maxsize': int(os.environ.get('SCRAPER_POOL_MAXSIZE', 10)),
+    'connect_timeout': float(os.environ.get('SCRAPER_CONNECT_TIMEOUT', 5)),
+    'read_timeout': float(os.environ.get('SCRAPER_READ_TIMEOUT', 10)),
+    'user_agent': os.environ.get('SCRAPER_USER_AGENT', DEFAULT_USER_AGENT),
+    # Largest (decompressed) document body fetch_document will read; 0 disables the limit
+    'max_body_bytes': int(os.environ.get('SCRAPER_MAX_BODY_BYTES', 20 * 1024 * 1024)),
+    # Size of the chunks document bodies are streamed in
+    'chunk_size': int(os.environ.get('SCRAPER_CHUNK_SIZE', 64 * 1024)),
+}
+
+class BodyTooLarge(requests.exceptions.RequestException):
+    """The response body is larger than the configured limit"""
+
+_session = None
+_session_lock = threading.Lock()
+
+def _accept_encoding():
+    """
+    Build the Accept-Encoding header value.
+
+    Brotli is only advertised when a decoder is installed, since urllib3
+    can only decode br responses with the brotli or brotlicffi package.
+
+    Returns:
+        str: The Accept-Encoding header value
+    """
+    encodings = ['gzip', 'deflate']
+    for module_name in ('brotli', 'brotlicffi'):
+        try:
+            __import__(module_name)
+            encodings.append('br')
+            break
+        except ImportError:
+            continue
+    return ', '.join(encodings)
+
+def _build_session():
+    """
+    Create a requests session with keep-alive connection pools.
+
+    Returns:
+        requests.Session: The configured session
+    """
+    http_session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=settings['pool_connections'],
+        pool_maxsize=settings['pool_maxsize'],
+        max_retries=0
+    )
+    http_session.mount('http://', adapter)
+    http_session.mount('https://', adapter)
+    http_session.headers.update({
+        'User-Agent': settings['user_agent'],
+        'Accept-Encoding': _accept_encoding(),
+        'Connection': 'keep-alive'
+    })
+    return http_session
+
+def get_session():
+    """
+    Get the shared HTTP session, creating it on first use.
+
+    Returns:
+        requests.Session: The shared session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def configure(**options):
+    """
+    Update the client settings and rebuild the shared session.
+
+    Args:
+        **options: Any of pool_connections, pool_maxsize, connect_timeout,
+            read_timeout, user_agent, max_body_bytes or chunk_size
+    """
+    global _session
+    unknown = set(options) - set(settings)
+    if unknown:
+        raise ValueError(f"Unknown fetcher settings: {', '.join(sorted(unknown))}")
+
+    with _session_lock:
+        settings.update(options)
+        old_session, _session = _session, None
+
+    if old_session is not None:
+        old_session.close()
+
+def close():
+    """Close all pooled connections."""
+    global _session
+    with _session_lock:
+        old_session, _session = _session, None
+    if old_session is not None:
+        old_session.close()
+
+def fetch(url, timeout=None, headers=None, **kwargs):
+    """
+    Perform a GET request through the shared connection pools.
+
+    Requests are scheduled within the host's rate limit, and 429/502-504
+    responses, connection errors and timeouts are retried (see throttle.py).
+
+    Args:
+        url (str): The URL to fetch
+        timeout (float or tuple): Optional override for the read timeout, or a
+            (connect, read) tuple
+        headers (dict): Extra request headers
+        **kwargs: Passed through to requests
+
+    Returns:
+        requests.Response: The response
+
+    Raises:
+        throttle.HostUnavailable: If the host's circuit breaker is open
+    """
+    if timeout is None:
+        timeout = (settings['connect_timeout'], settings['read_timeout'])
+    elif not isinstance(timeout, tuple):
+        timeout = (min(settings['connect_timeout'], timeout), timeout)
+
+    logging.debug(f"Fetching {url}")
+    # Rate limited per host, with retries and circuit breaking (see throttle.py)
+    return throttle.request(url, lambda: get_session().get(url, headers=headers, timeout=timeout, **kwargs))
+
+def _read_body(response, stop_at=None):
+    """
+    Stream a response body in chunks, enforcing the size limit.
+
+    Args:
+        response (requests.Response): A response opened with stream=True
+        stop_at (re.Pattern): Optional bytes pattern; reading stops as soon
+            as the data received so far contains a match
+
+    Returns:
+        tuple: (body bytes, True if the whole body was read)
+
+    Raises:
+        BodyTooLarge: If the body is larger than settings['max_body_bytes']
+    """
+    max_bytes = settings['max_body_bytes']
+    # Content-Length is the size on the wire; a compressed body only grows.
+    # Reads that stop early (e.g. after </head>) may never get near the limit,
+    # so for those the byte counter below enforces it instead
+    declared = response.headers.get('Content-Length', '')
+    if max_bytes and stop_at is None and declared.isdigit() and int(declared) > max_bytes:
+        raise BodyTooLarge(f"Response body of {declared} bytes exceeds the limit of {max_bytes} bytes",
+                           response=response)
+
+    chunks = []
+    size = 0
+    tail = b''
+    for chunk in response.iter_content(settings['chunk_size']):
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise BodyTooLarge(f"Response body exceeds the limit of {max_bytes} bytes", response=response)
+        chunks.append(chunk)
+        # Search the new chunk plus the end of the previous one, so a match
+        # split across two chunks is still found
+        if stop_at is not None and stop_at.search(tail + chunk):
+            return b''.join(chunks), False
+        tail = chunk[-64:]
+    return b''.join(chunks), True
+
+def fetch_document(url, timeout=None, use_cache=True, stop_at=None):
+    """
+    Fetch a document body, reusing the on-disk HTTP cache when possible.
+
+    Fresh cached responses are served without a request. Stale ones are
+    revalidated with a conditional GET, and a 304 Not Modified is answered
+    from the cache without downloading the body again. New bodies are
+    streamed in chunks and the download is aborted when it grows past
+    settings['max_body_bytes'].
+
+    Args:
+        url (str): The URL to fetch
+        timeout (float or tuple): Optional timeout override
+        use_cache (bool): Whether to consult the on-disk cache
+        stop_at (re.Pattern): Optional bytes pattern after which the rest of
+            the body is not needed (e.g. </head> for head-only parses).
+            Truncated bodies are not stored in the on-disk cache.
+
+    Returns:
+        dict: The url, content (bytes), encoding (the charset declared in
+            the Content-Type header, or None), headers, status_code,
+            cache_status ('hit', 'revalidated' or 'miss') and complete
+            (False if the download stopped at stop_at)
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails, the
+            server answers with an error status or the body is too large
+            (BodyTooLarge)
+    """
+    disk_cache = cache.http_cache if use_cache else None
+    meta = disk_cache.lookup(url) if disk_cache else None
+
+    if meta and meta['fresh']:
+        body = disk_cache.load_body(url)
+        if body is not None:
+            return {
+                'url': url,
+                'content': body,
+                'encoding': charset_from_content_type(meta.get('content_type')),
+                'headers': {'Content-Type': meta.get('content_type')},
+                'status_code': 200,
+                'cache_status': 'hit',
+                'complete': True
+            }
+
+    conditional_headers = disk_cache.conditional_headers(meta) if meta else None
+    response = fetch(url, timeout=timeout, headers=conditional_headers, stream=True)
+
+    if response.status_code == 304 and meta:
+        response.close()
+        body = disk_cache.load_body(url)
+        if body is not None:
+            disk_cache.refresh(url, meta, response.headers)
+            return {
+                'url': url,
+                'content': body,
+                'encoding': charset_from_content_type(meta.get('content_type')),
+                'headers': {'Content-Type': meta.get('content_type')},
+                'status_code': 200,
+                'cache_status': 'revalidated',
+                'complete': True
+            }
+        # The stored body is gone, so fetch it again unconditionally
+        response = fetch(url, timeout=timeout, stream=True)
+
+    # Closing a partly read response drops the connection instead of
+    # returning it to the pool, which is what we want after an abort
+    with response:
+        response.raise_for_status()  # Raise an exception for 4XX/5XX responses
+        body, complete = _read_body(response, stop_at)
+
+    # Only the declared charset: guessing from the body is left to the
+    # caller, which can sniff it cheaply (see charset.py)
+    encoding = charset_from_content_type(response.headers.get('Content-Type'))
+    if disk_cache and complete:
+        disk_cache.store(url, body, response.headers, encoding)
+
+    return {
+        'url': url,
+        'content': body,
+        'encoding': encoding,
+        'headers': response.headers,
+        'status_code': response.status_code,
+        'cache_status': 'miss',
+        'complete': complete
+    }
@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import app, db
+from models import ScrapingSession, ScrapeJob
+from scraper import scrape_records
+from storage import store_elements
+from batch import run_batch
+from crawler import run_crawl
+from sitemaps import run_sitemap, parse_lastmod
+import schedules
+
+# Background job runner.
+#
+# Jobs are rows in the scrape_job table, so the queue survives restarts and
+# is shared by every web process using the same database. Each process runs a
+# small pool of worker threads that claim queued jobs with a conditional
+# UPDATE, which guarantees a job is only picked up by one worker. While a job
+# runs, a heartbeat thread keeps touching it, so a job is only taken for
+# abandoned once its process has stopped, however long the job itself takes.
+# The scheduler thread of every process sweeps abandoned jobs back into the
+# queue. A job whose session is deleted while it runs is cancelled, not failed.
+
+WORKER_COUNT = int(os.environ.get('SCRAPER_JOB_WORKERS', 2))
+POLL_INTERVAL = float(os.environ.get('SCRAPER_JOB_POLL_INTERVAL', 2))
+# Seconds between heartbeats of running jobs
+HEARTBEAT_INTERVAL = float(os.environ.get('SCRAPER_JOB_HEARTBEAT_SECONDS', 30))
+# Running jobs without a heartbeat for this long are assumed to belong to a dead worker
+STALE_AFTER = int(os.environ.get('SCRAPER_JOB_STALE_SECONDS', 300))
+MAX_ATTEMPTS = int(os.environ.get('SCRAPER_JOB_MAX_ATTEMPTS', 3))
+
+_handlers = {}
+_wakeup = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+# IDs of the jobs this process is running, for the heartbeat
+_running_jobs = set()
+_running_lock = threading.Lock()
+
+def job_handler(kind):
+    """
+    Register a function that runs jobs of the given kind.
+
+    The function receives the ScrapeJob and its decoded payload.
+    """
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+def enqueue(kind, session_id=None, **payload):
+    """
+    Queue a job for the background workers.
+
+    Args:
+        kind (str): The job kind (scrape, batch, crawl, sitemap, scheduled)
+        session_id (int): The scraping session the job fills
+        **payload: JSON-serializable job arguments
+
+    Returns:
+        ScrapeJob: The queued job
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job = ScrapeJob(kind=kind, session_id=session_id, payload=json.dumps(payload), status="queued")
+    db.session.add(job)
+    db.session.commit()
+
+    # Wake an idle worker in this process instead of waiting for the next poll
+    _wakeup.set()
+    return job
+
+def claim_next_job(worker_name):
+    """
+    Atomically claim the oldest queued job.
+
+    Args:
+        worker_name (str): Identifies the claiming worker
+
+    Returns:
+        ScrapeJob: The claimed job or None if the queue is empty
+    """
+    while True:
+        job_id = db.session.query(ScrapeJob.id).filter_by(status="queued").order_by(ScrapeJob.id).limit(1).scalar()
+        if job_id is None:
+            return None
+
+        claimed = db.session.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.id == job_id, ScrapeJob.status == "queued")
+            .values(status="running", worker=worker_name, started_at=datetime.utcnow(),
+                    heartbeat_at=datetime.utcnow(), attempts=ScrapeJob.attempts + 1)
+        )
+        db.session.commit()
+        if claimed.rowcount == 1:
+            return db.session.get(ScrapeJob, job_id)
+        # Another worker got there first; try the next job
+
+def requeue_stale_jobs():
+    """
+    Return jobs abandoned by dead workers to the queue.
+
+    A job is abandoned when its heartbeat has stopped for STALE_AFTER
+    seconds; jobs claimed before heartbeats existed fall back to started_at.
+    Each job is updated only if it is still abandoned, so a job another
+    process has just requeued and claimed is left alone.
+
+    Returns:
+        int: The number of requeued or failed jobs
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_AFTER)
+    last_seen = db.func.coalesce(ScrapeJob.heartbeat_at, ScrapeJob.started_at)
+    stale = db.session.query(ScrapeJob.id, ScrapeJob.attempts, ScrapeJob.session_id).filter(
+        ScrapeJob.status == "running", last_seen < cutoff).all()
+    count = 0
+    for job_id, attempts, session_id in stale:
+        if (attempts or 0) >= MAX_ATTEMPTS:
+            error_message = "Worker stopped before the job finished"
+            values = {'status': "failed", 'error_message': error_message, 'finished_at': datetime.utcnow()}
+        else:
+            values = {'status': "queued"}
+        swept = db.session.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.id == job_id, ScrapeJob.status == "running", last_seen < cutoff)
+            .values(**values)
+        )
+        if swept.rowcount != 1:
+            continue
+        count += 1
+        if values['status'] == "failed":
+            _fail_session(session_id, error_message)
+    db.session.commit()
+    return count
+
+def _fail_session(session_id, error_message):
+    scraping_session = db.session.get(ScrapingSession, session_id) if session_id else None
+    if scraping_session and scraping_session.status == "in-progress":
+        scraping_session.status = "failed"
+        scraping_session.error_message = error_message
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome.
+
+    A job whose session was deleted while it ran (see storage.SessionDeleted)
+    is cancelled; its row has usually been deleted along with the session.
+
+    Args:
+        job (ScrapeJob): The claimed job
+    """
+    job_id, kind, session_id = job.id, job.kind, job.session_id
+    with _running_lock:
+        _running_jobs.add(job_id)
+    try:
+        payload = json.loads(job.payload) if job.payload else {}
+        _handlers[kind](job, payload)
+        outcome = {'status': "completed"}
+    except Exception as e:
+        db.session.rollback()
+        if session_id and db.session.get(ScrapingSession, session_id) is None:
+            logging.info(f"Job {job_id} ({kind}) cancelled: session {session_id} was deleted")
+            outcome = {'status': "cancelled", 'error_message': "Session was deleted"}
+        else:
+            logging.error(f"Job {job_id} ({kind}) failed: {str(e)}")
+            outcome = {'status': "failed", 'error_message': str(e)}
+            _fail_session(session_id, str(e))
+    finally:
+        with _running_lock:
+            _running_jobs.discard(job_id)
+    # A conditional UPDATE, since the job may have been deleted along with its session
+    db.session.execute(update(ScrapeJob).where(ScrapeJob.id == job_id).values(finished_at=datetime.utcnow(), **outcome))
+    db.session.commit()
+
+def _worker_loop(worker_name):
+    while True:
+        try:
+            with app.app_context():
+                job = claim_next_job(worker_name)
+                if job is not None:
+                    run_job(job)
+                    continue
+        except Exception as e:
+            logging.error(f"Job worker {worker_name} error: {str(e)}")
+
+        # Nothing to do: sleep until a job is enqueued or the poll interval passes
+        _wakeup.wait(POLL_INTERVAL)
+        _wakeup.clear()
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        with _running_lock:
+            job_ids = list(_running_jobs)
+        if not job_ids:
+            continue
+        try:
+            with app.app_context():
+                db.session.execute(
+                    update(ScrapeJob)
+                    .where(ScrapeJob.id.in_(job_ids), ScrapeJob.status == "running")
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                db.session.commit()
+        except Exception as e:
+            logging.error(f"Job heartbeat error: {str(e)}")
+
+def _scheduler_loop():
+    while True:
+        try:
+            with app.app_context():
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    logging.info(f"Requeued {requeued} stale jobs")
+                for scraping_session in schedules.claim_due_schedules():
+                    enqueue('scheduled', session_id=scraping_session.id)
+        except Exception as e:
+            logging.error(f"Scheduler error: {str(e)}")
+        time.sleep(schedules.POLL_INTERVAL)
+
+def start_workers(count=None):
+    """
+    Start the background worker threads for this process.
+
+    Calling it again is a no-op once the workers are running.
+
+    Args:
+        count (int): Number of worker threads (SCRAPER_JOB_WORKERS by default)
+    """
+    count = WORKER_COUNT if count is None else count
+    # Parse pool workers import the main module too; they never run jobs
+    if multiprocessing.parent_process() is not None:
+        return
+    with _workers_lock:
+        if _workers or count <= 0:
+            return
+
+        base_name = f"{socket.gethostname()}:{os.getpid()}"
+        for i in range(count):
+            worker = threading.Thread(target=_worker_loop, args=(f"{base_name}:{i}",), name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+        heartbeat = threading.Thread(target=_heartbeat_loop, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        _workers.append(heartbeat)
+
+        # Every process runs a scheduler, which also requeues stale jobs;
+        # claiming a due schedule or a stale job is atomic
+        scheduler = threading.Thread(target=_scheduler_loop, name="scheduler", daemon=True)
+        scheduler.start()
+        _workers.append(scheduler)
+
+@job_handler('scrape')
+def perform_scrape(job, payload):
+    """Fetch a page, extract the selected elements and store them on the job's session"""
+    scraping_session = db.session.get(ScrapingSession, job.session_id)
+
+    fetch_info = {}
+    stats = {}
+    # Parsed and extracted in the parse pool when it is enabled
+    result = scrape_records(scraping_session.url, scraping_session.selector_type, scraping_session.selector_value,
+                            parser=scraping_session.parser, fetch_info=fetch_info, stats=stats)
+    scraping_session.record_fetch(fetch_info)
+
+    # Name the session after the page
+    if payload.get('name_from_title'):
+        scraping_session.name = (result and result['title']) or "Scraping Session"
+
+    if result is None:
+        scraping_session.status = "failed"
+        scraping_session.error_message = fetch_info.get('error') or "Failed to retrieve content from URL"
+        db.session.commit()
+        return
+
+    # Store scraped data, the item count and the status in one transaction
+    scraping_session.bytes_saved = stats.get('bytes_saved')
+    store_elements(scraping_session, result['records'])
+
+@job_handler('batch')
+def perform_batch(job, payload):
+    """Scrape every URL of a batch into the job's session"""
+    run_batch(
+        payload['urls'],
+        payload.get('selector_type', 'tag'),
+        payload.get('selector_value', ''),
+        concurrency=payload.get('concurrency'),
+        per_host=payload.get('per_host'),
+        parent_session_id=job.session_id
+    )
+
+@job_handler('crawl')
+def perform_crawl(job, payload):
+    """Crawl a site from the session's URL into the job's session, resuming if the job is retried"""
+    scraping_session = db.session.get(ScrapingSession, job.session_id)
+    run_crawl(
+        scraping_session.url,
+        scraping_session.selector_type,
+        scraping_session.selector_value,
+        max_depth=payload.get('max_depth'),
+        max_pages=payload.get('max_pages'),
+        concurrency=payload.get('concurrency'),
+        per_host=payload.get('per_host'),
+        parent_session_id=job.session_id
+    )
+
+@job_handler('sitemap')
+def perform_sitemap(job, payload):
+    """Scrape the pages listed in the sitemaps of the session's URL into the job's session"""
+    scraping_session = db.session.get(ScrapingSession, job.session_id)
+    run_sitemap(
+        scraping_session.url,
+        scraping_session.selector_type,
+        scraping_session.selector_value,
+        since=parse_lastmod(payload.get('since')),
+        full=payload.get('full', False),
+        concurrency=payload.get('concurrency'),
+        per_host=payload.get('per_host'),
+        parent_session_id=job.session_id
+    )
+
+@job_handler('scheduled')
+def perform_scheduled_scrape(job, payload):
+    """Run a scheduled scrape into the job's session, storing only what changed since the previous run"""
+    schedules.run_scheduled_scrape(db.session.get(ScrapingSession, job.session_id))
@@ -1,4 +1,8 @@
 from app import app  # noqa: F401
+from jobs import start_workers
+
+# Run queued scrapes in the background of every web process
+start_workers()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
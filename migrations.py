@@ -0,0 +1,133 @@
+import logging
+from sqlalchemy import inspect, text
+
+# Schema upgrades for existing databases.
+#
+# db.create_all() only creates missing tables, so databases created by older
+# versions are brought up to date here at startup, without re-creating any
+# table: missing columns are added with ALTER TABLE, missing indexes declared
+# on the models are created, and the full-text index is built. Every step is
+# idempotent, so it is safe to run on each start.
+
+# Columns added to existing tables after their first release
+ADDED_COLUMNS = {
+    'scraping_session': [
+        ('cache_hits', 'INTEGER DEFAULT 0'),
+        ('cache_misses', 'INTEGER DEFAULT 0'),
+        ('cache_revalidations', 'INTEGER DEFAULT 0'),
+        ('parent_id', 'INTEGER REFERENCES scraping_session (id)'),
+        ('parser', 'VARCHAR(20)'),
+        ('encoding', 'VARCHAR(40)'),
+        ('decode_ms', 'FLOAT'),
+        ('bytes_saved', 'INTEGER'),
+        ('source', 'VARCHAR(20)'),
+        ('schedule_id', 'INTEGER REFERENCES scheduled_scrape (id)'),
+        ('content_hash', 'VARCHAR(32)'),
+        ('changes', 'VARCHAR(20)'),
+    ],
+    'scrape_job': [
+        ('heartbeat_at', 'TIMESTAMP'),
+    ],
+    'scraped_data': [
+        ('content_hash', 'VARCHAR(16)'),
+        ('change_type', 'VARCHAR(10)'),
+        ('previous_index', 'INTEGER'),
+    ],
+}
+
+def upgrade_schema(engine, metadata):
+    """
+    Bring an existing database up to date with the current models.
+    
+    Args:
+        engine (Engine): The SQLAlchemy engine of the application database
+        metadata (MetaData): The metadata holding the model tables
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    with engine.begin() as connection:
+        for table, columns in ADDED_COLUMNS.items():
+            if table not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table)}
+            for column_name, column_type in columns:
+                if column_name not in existing_columns:
+                    logging.info(f"Adding column {table}.{column_name}")
+                    connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column_name} {column_type}'))
+    
+    ensure_indexes(engine, metadata)
+    ensure_search_index(engine)
+
+def ensure_indexes(engine, metadata):
+    """
+    Create the indexes declared on the models that an existing database lacks.
+    
+    Args:
+        engine (Engine): The SQLAlchemy engine of the application database
+        metadata (MetaData): The metadata holding the model tables
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                logging.info(f"Creating index {index.name}")
+                index.create(engine)
+
+# SQLite: external-content FTS5 table over scraped_data.content, kept in sync
+# by triggers so inserts and deletes through any code path are indexed
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE scraped_data_fts USING fts5(
+        content, content='scraped_data', content_rowid='id', tokenize='unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS scraped_data_fts_insert AFTER INSERT ON scraped_data BEGIN
+        INSERT INTO scraped_data_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS scraped_data_fts_delete AFTER DELETE ON scraped_data BEGIN
+        INSERT INTO scraped_data_fts(scraped_data_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS scraped_data_fts_update AFTER UPDATE OF content ON scraped_data BEGIN
+        INSERT INTO scraped_data_fts(scraped_data_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO scraped_data_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    # Index the rows that existed before the table was created
+    "INSERT INTO scraped_data_fts(scraped_data_fts) VALUES ('rebuild')",
+]
+
+# PostgreSQL: generated tsvector column with a GIN index, maintained by the database
+POSTGRES_SEARCH_DDL = [
+    """ALTER TABLE scraped_data ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(content, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_scraped_data_content_tsv ON scraped_data USING GIN (content_tsv)",
+]
+
+def ensure_search_index(engine):
+    """
+    Create the full-text index used by /search if it does not exist yet.
+    
+    Databases without full-text support keep working; search then falls
+    back to substring matching.
+    
+    Args:
+        engine (Engine): The SQLAlchemy engine of the application database
+    """
+    dialect = engine.dialect.name
+    try:
+        if dialect == 'sqlite':
+            if 'scraped_data_fts' in inspect(engine).get_table_names():
+                return
+            logging.info("Building the scraped_data full-text index")
+            with engine.begin() as connection:
+                for statement in SQLITE_SEARCH_DDL:
+                    connection.execute(text(statement))
+        elif dialect == 'postgresql':
+            with engine.begin() as connection:
+                for statement in POSTGRES_SEARCH_DDL:
+                    connection.execute(text(statement))
+    except Exception as e:
+        logging.warning(f"Full-text search index unavailable: {str(e)}")
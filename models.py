@@ -4,14 +4,50 @@ from app import db
 class ScrapingSession(db.Model):
     """Model for storing scraping session information"""
     id = db.Column(db.Integer, primary_key=True)
-    url = db.Column(db.String(512), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    url = db.Column(db.String(512), nullable=False, index=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     selector_type = db.Column(db.String(20), nullable=True)  # tag, class, id
     selector_value = db.Column(db.String(100), nullable=True)
     item_count = db.Column(db.Integer, default=0)
     name = db.Column(db.String(100), nullable=True)
-    status = db.Column(db.String(20), default="completed")  # completed, failed, in-progress
+    status = db.Column(db.String(20), default="completed", index=True)  # completed, failed, in-progress
     error_message = db.Column(db.Text, nullable=True)
+    # Batch and crawl runs store one child session per page under a parent session
+    parent_id = db.Column(db.Integer, db.ForeignKey('scraping_session.id'), nullable=True, index=True)
+    # What created a parent session: batch, crawl or sitemap (None for single pages)
+    source = db.Column(db.String(20), nullable=True)
+    # HTTP cache usage for the fetches made by this session
+    cache_hits = db.Column(db.Integer, default=0)
+    cache_misses = db.Column(db.Integer, default=0)
+    cache_revalidations = db.Column(db.Integer, default=0)
+    # HTML parser backend for this session (None uses the app default)
+    parser = db.Column(db.String(20), nullable=True)
+    # Character encoding the page was read with and the time spent decoding it
+    encoding = db.Column(db.String(40), nullable=True)
+    decode_ms = db.Column(db.Float, nullable=True)
+    # Text saved by the text extraction mode compared with storing every tag's text
+    bytes_saved = db.Column(db.Integer, nullable=True)
+    # Scheduled runs: the schedule, a hash of all extracted items, and how the
+    # result compares with the previous run (initial, changed, unchanged)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('scheduled_scrape.id'), nullable=True, index=True)
+    content_hash = db.Column(db.String(32), nullable=True)
+    changes = db.Column(db.String(20), nullable=True)
+
+    def record_cache_status(self, cache_status):
+        """Count a fetch result ('hit', 'revalidated' or 'miss') against this session"""
+        if cache_status == 'hit':
+            self.cache_hits = (self.cache_hits or 0) + 1
+        elif cache_status == 'revalidated':
+            self.cache_revalidations = (self.cache_revalidations or 0) + 1
+        elif cache_status == 'miss':
+            self.cache_misses = (self.cache_misses or 0) + 1
+
+    def record_fetch(self, fetch_info):
+        """Record the fetch details collected by scrape_url for this session's page"""
+        self.record_cache_status(fetch_info.get('cache_status'))
+        self.encoding = fetch_info.get('encoding')
+        decode_ms = fetch_info.get('decode_ms')
+        self.decode_ms = round(decode_ms, 3) if decode_ms is not None else None
 
     def to_dict(self):
         return {
@@ -23,11 +59,28 @@ class ScrapingSession(db.Model):
             'item_count': self.item_count,
             'name': self.name,
             'status': self.status,
-            'error_message': self.error_message
+            'error_message': self.error_message,
+            'parent_id': self.parent_id,
+            'source': self.source,
+            'cache_hits': self.cache_hits or 0,
+            'cache_misses': self.cache_misses or 0,
+            'cache_revalidations': self.cache_revalidations or 0,
+            'parser': self.parser,
+            'encoding': self.encoding,
+            'decode_ms': self.decode_ms,
+            'bytes_saved': self.bytes_saved,
+            'schedule_id': self.schedule_id,
+            'content_hash': self.content_hash,
+            'changes': self.changes
         }
 
 class ScrapedData(db.Model):
     """Model for storing the actual scraped data"""
+    # Every read path filters by session and orders by position
+    __table_args__ = (
+        db.Index('ix_scraped_data_session_id_index', 'session_id', 'index'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('scraping_session.id'), nullable=False)
     content = db.Column(db.Text, nullable=True)
@@ -35,6 +88,13 @@ class ScrapedData(db.Model):
     element_type = db.Column(db.String(20), nullable=True)  # The HTML tag type
     attributes = db.Column(db.Text, nullable=True)  # JSON string of attributes
     index = db.Column(db.Integer, nullable=False)  # Order within the scraping results
+    # Scheduled runs only store differences: the item's hash and whether it was
+    # added, removed or changed. Removed items are numbered after the run's own
+    # items, so (session_id, index) stays unique, and keep their position in
+    # the previous run in previous_index
+    content_hash = db.Column(db.String(16), nullable=True)
+    change_type = db.Column(db.String(10), nullable=True)
+    previous_index = db.Column(db.Integer, nullable=True)
     
     # Relationship
     session = db.relationship('ScrapingSession', backref=db.backref('data_items', lazy=True))
@@ -47,5 +107,96 @@ class ScrapedData(db.Model):
             'content_type': self.content_type, 
             'element_type': self.element_type,
             'attributes': self.attributes,
-            'index': self.index
+            'index': self.index,
+            'content_hash': self.content_hash,
+            'change_type': self.change_type,
+            'previous_index': self.previous_index
+        }
+
+class ScrapeJob(db.Model):
+    """Model for background work queued by the web app"""
+    # Workers look up the oldest job by status
+    __table_args__ = (
+        db.Index('ix_scrape_job_status_id', 'status', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # scrape, batch, crawl, sitemap, scheduled
+    payload = db.Column(db.Text, nullable=True)  # JSON string of job arguments
+    status = db.Column(db.String(20), default="queued")  # queued, running, completed, failed, cancelled
+    session_id = db.Column(db.Integer, db.ForeignKey('scraping_session.id'), nullable=True, index=True)
+    attempts = db.Column(db.Integer, default=0)
+    worker = db.Column(db.String(64), nullable=True)
+    error_message = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    # Refreshed by the worker's process while the job runs
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'session_id': self.session_id,
+            'attempts': self.attempts,
+            'error_message': self.error_message,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'heartbeat_at': self.heartbeat_at.strftime('%Y-%m-%d %H:%M:%S') if self.heartbeat_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
+
+class CrawlFrontier(db.Model):
+    """Model for the URLs a crawl has discovered: its queue and its seen-set"""
+    __table_args__ = (
+        # A URL is queued at most once per crawl (url_hash is a 64-bit hash of the canonical URL)
+        db.Index('ix_crawl_frontier_session_id_url_hash', 'session_id', 'url_hash', unique=True),
+        # The crawler takes the oldest queued URLs, which is breadth-first order
+        db.Index('ix_crawl_frontier_session_id_state_id', 'session_id', 'state', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('scraping_session.id'), nullable=False)
+    url_hash = db.Column(db.BigInteger, nullable=False)
+    url = db.Column(db.String(2048), nullable=False)
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    state = db.Column(db.String(10), default="queued")  # queued, fetching, done, failed
+
+class ScheduledScrape(db.Model):
+    """Model for a URL and selector the app scrapes again at a fixed interval"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=True)
+    url = db.Column(db.String(512), nullable=False)
+    selector_type = db.Column(db.String(20), nullable=True)
+    selector_value = db.Column(db.String(100), nullable=True)
+    parser = db.Column(db.String(20), nullable=True)
+    interval_seconds = db.Column(db.Integer, nullable=False)
+    enabled = db.Column(db.Boolean, default=True)
+    # The scheduler starts every enabled schedule whose next run is due
+    next_run_at = db.Column(db.DateTime, nullable=False, index=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    last_session_id = db.Column(db.Integer, nullable=True)
+    # State of the latest successful run that new results are compared with:
+    # its page hash and the space-separated hashes of its items, in order
+    content_hash = db.Column(db.String(32), nullable=True)
+    item_hashes = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'url': self.url,
+            'selector_type': self.selector_type,
+            'selector_value': self.selector_value,
+            'parser': self.parser,
+            'interval_seconds': self.interval_seconds,
+            'enabled': bool(self.enabled),
+            'next_run_at': self.next_run_at.strftime('%Y-%m-%d %H:%M:%S') if self.next_run_at else None,
+            'last_run_at': self.last_run_at.strftime('%Y-%m-%d %H:%M:%S') if self.last_run_at else None,
+            'last_session_id': self.last_session_id,
+            'content_hash': self.content_hash,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
         }
@@ -0,0 +1,157 @@
+import os
+import atexit
+import signal
+import logging
+import threading
+import multiprocessing
+
+# Process pool for parsing and extraction.
+#
+# BeautifulSoup tree building and the extractors are pure Python and hold the
+# GIL, so a large page parsed on a web or batch thread stalls every other
+# thread of the process. With SCRAPER_PARSE_PROCESSES set, that work runs in
+# worker processes instead: the raw body goes in and compact records come
+# out. Every job has a time limit, and workers are replaced after a number of
+# jobs so the memory big trees leave fragmented is given back. With the
+# setting at 0 (the default) jobs run in the calling thread, without a limit.
+# On a single CPU there is no other core for a worker to use, so the pool
+# stays off whatever the setting says, and bodies smaller than min_bytes are
+# always parsed in the calling thread, where they take less time than the
+# round trip to a worker.
+
+# Whether the machine has more than one CPU for workers to run on
+MULTI_CPU = (os.cpu_count() or 1) > 1
+
+settings = {
+    # Number of worker processes; 0 runs jobs in the calling thread
+    'processes': int(os.environ.get('SCRAPER_PARSE_PROCESSES', 0)) if MULTI_CPU else 0,
+    # Bodies smaller than this many bytes are parsed in the calling thread
+    'min_bytes': int(os.environ.get('SCRAPER_PARSE_POOL_MIN_BYTES', 64 * 1024)),
+    # Seconds a single job may run; 0 disables the limit
+    'timeout': float(os.environ.get('SCRAPER_PARSE_TIMEOUT', 30)),
+    # Jobs a worker runs before it is replaced; 0 keeps workers for good
+    'max_tasks_per_child': int(os.environ.get('SCRAPER_PARSE_MAX_TASKS', 100)),
+    # 'spawn' starts clean workers instead of forking a threaded web process
+    'start_method': os.environ.get('SCRAPER_PARSE_START_METHOD', 'spawn'),
+}
+
+# How much longer than the limit the caller waits for a worker that cannot be
+# interrupted (e.g. stuck inside a C extension) before replacing the pool
+HARD_TIMEOUT_GRACE = 5
+
+class ParseTimeout(Exception):
+    """A parse job ran past its time limit"""
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _on_deadline(signum, frame):
+    raise ParseTimeout("Parsing took too long")
+
+def _run_with_deadline(func, args, timeout):
+    """Run a job inside a worker process, interrupting it after timeout seconds"""
+    use_timer = timeout and hasattr(signal, 'setitimer')
+    if use_timer:
+        signal.signal(signal.SIGALRM, _on_deadline)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    finally:
+        if use_timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+def enabled():
+    """Check whether jobs are sent to worker processes"""
+    return settings['processes'] > 0
+
+def offload(document):
+    """
+    Check whether a fetched document is worth parsing in a worker process.
+
+    Args:
+        document (dict): A document from load_document
+
+    Returns:
+        bool: True if the pool is enabled and the body is at least min_bytes
+    """
+    return enabled() and len(document['content']) >= settings['min_bytes']
+
+def configure(**overrides):
+    """
+    Change pool settings at runtime.
+
+    The current pool is shut down and a new one is started with the new
+    settings by the next job.
+
+    Args:
+        **overrides: Keys of the settings dict and their new values
+    """
+    global _pool
+    unknown = set(overrides) - set(settings)
+    if unknown:
+        raise ValueError(f"Unknown parse pool settings: {', '.join(sorted(unknown))}")
+    with _pool_lock:
+        settings.update(overrides)
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+def shutdown():
+    """Stop the worker processes; the next job starts a new pool"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+atexit.register(shutdown)
+
+def _get_pool():
+    """Return the worker pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context(settings['start_method'])
+            _pool = context.Pool(settings['processes'], maxtasksperchild=settings['max_tasks_per_child'] or None)
+        return _pool
+
+def _replace_pool(pool):
+    """Kill a pool with a stuck worker; the next job starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is not pool:
+            return
+        _pool = None
+    logging.warning("Parse worker is not responding, restarting the parse pool")
+    # Jobs still in flight on the old pool fail with ParseTimeout
+    pool.terminate()
+
+def run(func, *args, timeout=None):
+    """
+    Run func(*args) in a parse worker process.
+
+    Runs in the calling thread when the pool is disabled.
+
+    Args:
+        func (callable): A module-level function (workers import it by name)
+        *args: Picklable arguments for the function
+        timeout (float): Time limit in seconds, defaults to the setting
+
+    Returns:
+        The return value of the function
+
+    Raises:
+        ParseTimeout: If the job runs past its time limit
+    """
+    if not enabled():
+        return func(*args)
+
+    timeout = settings['timeout'] if timeout is None else timeout
+    pool = _get_pool()
+    result = pool.apply_async(_run_with_deadline, (func, args, timeout))
+    try:
+        return result.get(timeout + HARD_TIMEOUT_GRACE if timeout else None)
+    except multiprocessing.TimeoutError:
+        _replace_pool(pool)
+        raise ParseTimeout(f"Parsing did not finish within {timeout:g}s")
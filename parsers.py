@@ -0,0 +1,60 @@
+import os
+import logging
+import importlib.util
+
+# HTML parser backends for BeautifulSoup.
+#
+# Listed fastest first: lxml (C) is several times faster than the pure
+# Python html.parser, and html5lib is the slowest but parses exactly like a
+# browser. 'auto' picks the fastest backend that is installed. The app-wide
+# choice comes from SCRAPER_PARSER and a session can override it.
+
+PARSER_BACKENDS = ['lxml', 'html.parser', 'html5lib']
+AUTO = 'auto'
+DEFAULT_PARSER = os.environ.get('SCRAPER_PARSER', AUTO)
+
+# Module each backend needs (html.parser ships with Python)
+_BACKEND_MODULES = {'lxml': 'lxml', 'html.parser': None, 'html5lib': 'html5lib'}
+# html5lib builds the whole tree and ignores parse_only strainers
+STRAINER_BACKENDS = {'lxml', 'html.parser'}
+# Backends that decode bytes natively; the pure Python ones are given text
+BYTES_BACKENDS = {'lxml'}
+
+_available = None
+
+def available_parsers():
+    """
+    List the installed parser backends, fastest first.
+
+    Returns:
+        list: Backend names usable with BeautifulSoup
+    """
+    global _available
+    if _available is None:
+        _available = [
+            backend for backend in PARSER_BACKENDS
+            if _BACKEND_MODULES[backend] is None or importlib.util.find_spec(_BACKEND_MODULES[backend])
+        ]
+    return _available
+
+def is_valid_parser(name):
+    """Check whether a parser name can be stored on a session"""
+    return not name or name == AUTO or name in PARSER_BACKENDS
+
+def resolve_parser(name=None):
+    """
+    Turn a parser setting into an installed backend.
+
+    Args:
+        name (str): A backend name, 'auto', or None for the app default
+
+    Returns:
+        str: The backend to pass to BeautifulSoup
+    """
+    name = name or DEFAULT_PARSER
+    available = available_parsers()
+    if name in available:
+        return name
+    if name != AUTO:
+        logging.warning(f"Parser backend {name!r} is not available, using {available[0]}")
+    return available[0]
@@ -0,0 +1,345 @@
+import os
+import re
+import time
+import logging
+import threading
+import urllib.parse
+from collections import OrderedDict
+import requests
+import fetcher
+import throttle
+
+# robots.txt rules, cached per host.
+#
+# Each site's robots.txt is downloaded once per TTL and compiled into
+# matchers for every user-agent group, following RFC 9309: the longest
+# matching rule wins, Allow wins a tie, '*' matches any run of characters
+# and '$' anchors the end of the path. A robots.txt that does not exist
+# (4xx) allows everything; one that cannot be fetched (5xx or a network
+# error) disallows everything until it is retried after a shorter TTL.
+# scraper.load_document checks the rules before downloading a page.
+
+settings = {
+    # Whether pages disallowed by robots.txt are refused
+    'enabled': os.environ.get('SCRAPER_RESPECT_ROBOTS', '1').lower() not in ('0', 'false', 'no'),
+    # Product token matched against the User-agent lines; '*' uses the default group
+    'user_agent': os.environ.get('SCRAPER_ROBOTS_AGENT', '*'),
+    # Seconds a downloaded robots.txt is used before it is fetched again
+    'ttl': float(os.environ.get('SCRAPER_ROBOTS_TTL', 3600)),
+    # Seconds before a robots.txt that could not be fetched is retried
+    'error_ttl': float(os.environ.get('SCRAPER_ROBOTS_ERROR_TTL', 300)),
+    # Number of hosts whose rules are kept
+    'cache_size': int(os.environ.get('SCRAPER_ROBOTS_CACHE_SIZE', 1024)),
+    # Longer files are truncated (RFC 9309 asks parsers to read at least 500 KiB)
+    'max_bytes': 512 * 1024,
+}
+
+class Disallowed(requests.exceptions.RequestException):
+    """The page is disallowed by the site's robots.txt"""
+
+class Unavailable(Disallowed):
+    """The site's robots.txt could not be fetched, so none of its pages are"""
+
+_FIELD = re.compile(r'^\s*([A-Za-z-]+)\s*:\s*(.*?)\s*$')
+
+def _compile_rule(path):
+    """
+    Build a matcher for an Allow/Disallow path pattern.
+
+    Plain prefixes are matched with str.startswith; patterns using '*' or '$'
+    are compiled to a regular expression.
+
+    Returns:
+        callable: Takes a path (with query string) and returns True on a match
+    """
+    if '*' not in path and not path.endswith('$'):
+        return lambda target: target.startswith(path)
+    anchored = path.endswith('$')
+    body = path[:-1] if anchored else path
+    pattern = '.*'.join(re.escape(part) for part in body.split('*'))
+    return re.compile(pattern + ('$' if anchored else '')).match
+
+class RuleGroup:
+    """The rules that apply to one user agent"""
+
+    def __init__(self, agent):
+        self.agent = agent
+        # (path, allowed) in file order, for display
+        self.rules = []
+        self.crawl_delay = None
+        self._matchers = None
+
+    def add_rule(self, path, allowed):
+        self.rules.append((path, allowed))
+        self._matchers = None
+
+    def is_allowed(self, target):
+        """
+        Check a path against the group's rules.
+
+        Args:
+            target (str): The URL path, with its query string
+
+        Returns:
+            bool: False if the most specific matching rule is a Disallow
+        """
+        if self._matchers is None:
+            # Longest pattern first; Allow before Disallow for equal lengths
+            ordered = sorted(self.rules, key=lambda rule: (-len(rule[0]), not rule[1]))
+            self._matchers = [(_compile_rule(path), allowed) for path, allowed in ordered]
+        for matches, allowed in self._matchers:
+            if matches(target):
+                return allowed
+        return True
+
+class RobotsRules:
+    """The parsed robots.txt of one site"""
+
+    def __init__(self, robots_url, status_code=None, error=None, allow_all=False, disallow_all=False):
+        self.robots_url = robots_url
+        self.status_code = status_code
+        self.error = error
+        self.allow_all = allow_all
+        self.disallow_all = disallow_all
+        # Lowercased user agent -> RuleGroup, in file order
+        self.groups = {}
+        self.sitemaps = []
+        self._group_cache = {}
+
+    @classmethod
+    def parse(cls, robots_url, text, status_code=200):
+        """
+        Parse the text of a robots.txt file.
+
+        Args:
+            robots_url (str): Where the file was fetched from
+            text (str): The file content
+            status_code (int): The HTTP status it was served with
+
+        Returns:
+            RobotsRules: The compiled rules
+        """
+        rules = cls(robots_url, status_code)
+        # Groups of the agents named by the current run of User-agent lines
+        current = []
+        in_agent_lines = False
+        for line in text.splitlines():
+            match = _FIELD.match(line.split('#', 1)[0])
+            if not match:
+                continue
+            field, value = match.group(1).lower(), match.group(2)
+
+            if field == 'user-agent':
+                if not in_agent_lines:
+                    current = []
+                in_agent_lines = True
+                if value:
+                    # Rules of several groups for the same agent are merged
+                    group = rules.groups.setdefault(value.lower(), RuleGroup(value))
+                    current.append(group)
+                continue
+
+            in_agent_lines = False
+            if field == 'sitemap':
+                if value:
+                    rules.sitemaps.append(value)
+            elif field in ('allow', 'disallow'):
+                # An empty Disallow allows everything, so it is not a rule
+                if value:
+                    for group in current:
+                        group.add_rule(value, field == 'allow')
+            elif field == 'crawl-delay':
+                try:
+                    delay = float(value)
+                except ValueError:
+                    continue
+                for group in current:
+                    group.crawl_delay = delay
+        return rules
+
+    def group_for(self, user_agent=None):
+        """
+        Find the group that applies to a user agent.
+
+        The group whose User-agent token the agent contains wins, the longest
+        token first; otherwise the '*' group applies.
+
+        Returns:
+            RuleGroup: The group, or None if no group applies
+        """
+        user_agent = (user_agent or settings['user_agent']).lower()
+        if user_agent not in self._group_cache:
+            best = self.groups.get('*')
+            best_length = 0
+            for agent, group in self.groups.items():
+                if agent != '*' and agent in user_agent and len(agent) > best_length:
+                    best, best_length = group, len(agent)
+            self._group_cache[user_agent] = best
+        return self._group_cache[user_agent]
+
+    def is_allowed(self, url, user_agent=None):
+        """
+        Check whether a URL may be fetched.
+
+        Args:
+            url (str): The URL to check
+            user_agent (str): The product token, defaults to the setting
+
+        Returns:
+            bool: True if the URL may be fetched
+        """
+        parsed = urllib.parse.urlsplit(url)
+        target = (parsed.path or '/') + (f"?{parsed.query}" if parsed.query else '')
+        if target == '/robots.txt' or self.allow_all:
+            return True
+        if self.disallow_all:
+            return False
+        group = self.group_for(user_agent)
+        return group.is_allowed(target) if group else True
+
+    def crawl_delay(self, user_agent=None):
+        """The Crawl-delay in seconds for a user agent, or None"""
+        group = self.group_for(user_agent)
+        return group.crawl_delay if group else None
+
+class RobotsCache:
+    """
+    Per-host robots.txt rules with a TTL and a bounded size.
+
+    Entries are evicted least recently used first. Concurrent lookups for a
+    host that is not cached wait for a single download.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, error_ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+
+    def _lookup(self, site):
+        with self._lock:
+            entry = self._entries.get(site)
+            if entry is None:
+                return None
+            rules, expires = entry
+            if expires < time.time():
+                del self._entries[site]
+                return None
+            self._entries.move_to_end(site)
+            return rules
+
+    def _store(self, site, rules):
+        ttl = self.ttl if rules.status_code and rules.status_code < 500 else self.error_ttl
+        with self._lock:
+            self._entries[site] = (rules, time.time() + ttl)
+            self._entries.move_to_end(site)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, url):
+        """
+        Get the robots.txt rules of the site a URL belongs to.
+
+        Args:
+            url (str): Any URL of the site
+
+        Returns:
+            RobotsRules: The rules, downloaded if they are not cached
+        """
+        parsed = urllib.parse.urlsplit(url)
+        site = f"{parsed.scheme.lower()}://{parsed.netloc.lower()}"
+        rules = self._lookup(site)
+        if rules is not None:
+            return rules
+
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(site, threading.Lock())
+        with fetch_lock:
+            # Another thread may have downloaded it while this one waited
+            rules = self._lookup(site)
+            if rules is None:
+                rules = fetch_rules(f"{site}/robots.txt")
+                self._store(site, rules)
+        with self._lock:
+            self._fetch_locks.pop(site, None)
+        return rules
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+def fetch_rules(robots_url):
+    """
+    Download and parse a robots.txt file.
+
+    Args:
+        robots_url (str): The URL of the file
+
+    Returns:
+        RobotsRules: The rules; an allow-all or disallow-all placeholder when
+            the file is missing or cannot be fetched
+    """
+    try:
+        with fetcher.fetch(robots_url, timeout=5, stream=True) as response:
+            status_code = response.status_code
+            if status_code != 200:
+                # A missing file allows everything, an unreachable one nothing
+                return RobotsRules(robots_url, status_code, allow_all=status_code < 500,
+                                   disallow_all=status_code >= 500)
+            body = b''
+            for chunk in response.iter_content(fetcher.settings['chunk_size']):
+                body += chunk
+                if len(body) >= settings['max_bytes']:
+                    body = body[:settings['max_bytes']]
+                    break
+        # robots.txt is UTF-8 by definition
+        return RobotsRules.parse(robots_url, body.decode('utf-8', errors='replace'), status_code)
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"Could not fetch {robots_url}: {str(e)}")
+        return RobotsRules(robots_url, error=str(e), disallow_all=True)
+
+robots_cache = RobotsCache(
+    max_entries=settings['cache_size'],
+    ttl=settings['ttl'],
+    error_ttl=settings['error_ttl']
+)
+
+def get_rules(url):
+    """Get the cached robots.txt rules for the site of a URL"""
+    return robots_cache.get(url)
+
+def is_allowed(url):
+    """Check a URL against its site's robots.txt (always True when checks are off)"""
+    return not settings['enabled'] or get_rules(url).is_allowed(url)
+
+def check_allowed(url):
+    """
+    Refuse a URL that robots.txt disallows.
+
+    The site's Crawl-delay, if any, is applied to its rate limit. Does
+    nothing when robots.txt checks are turned off.
+
+    Args:
+        url (str): The URL about to be fetched
+
+    Raises:
+        Disallowed: If the site's robots.txt disallows the URL
+        Unavailable: If the site's robots.txt could not be fetched (a server
+            error or no response); it is tried again after error_ttl
+    """
+    if not settings['enabled']:
+        return
+    rules = get_rules(url)
+    if not rules.is_allowed(url):
+        if rules.error or (rules.status_code or 0) >= 500:
+            reason = rules.error or f"HTTP {rules.status_code}"
+            raise Unavailable(f"Could not fetch {rules.robots_url} ({reason}), not requesting {url}")
+        raise Disallowed(f"Blocked by robots.txt: {url}")
+    throttle.set_crawl_delay(url, rules.crawl_delay())
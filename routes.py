@@ -1,145 +1,262 @@
-import json
 import logging
 from flask import render_template, request, redirect, url_for, jsonify, flash, session
 from app import app, db
-from models import ScrapingSession, ScrapedData
-from scraper import scrape_url, extract_elements, get_page_title, get_selector_options
-from utils import export_to_csv, export_to_json, sanitize_input
+from models import ScrapingSession, ScrapedData, ScrapeJob, ScheduledScrape, CrawlFrontier
+from scraper import get_selector_options
+from sqlalchemy import select
+from utils import export_to_csv, export_to_json, export_to_ndjson, sanitize_input
+from parsers import available_parsers, is_valid_parser
+from selector_cache import validate_selector
+import throttle
+# batch, crawler, sitemaps, schedules, jobs and search import app, which
+# imports this module, so the views import them when they run; that way
+# each of them can also be imported first, as an entry point
+
+# Page sizes for the visualization page and the /api/data endpoint
+ITEMS_PAGE_SIZE = 100
+MAX_ITEMS_PAGE_SIZE = 1000
+# Sessions or search results per page of the history and search pages
+RESULTS_PAGE_SIZE = 50
+# Recent runs shown by /api/schedules/<id>
+MAX_SCHEDULE_RUNS = 50
+
+def _optional_int(value):
+    """Convert a request value to int, returning None when missing or invalid"""
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+def _request_payload():
+    """The request's JSON object or form, or None for a JSON body that is not an object"""
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return request.form
+    return payload if isinstance(payload, dict) else None
+
+def _concurrency_limits(payload):
+    """
+    Read the concurrency and per_host limits of a batch, crawl or sitemap request
+    
+    Returns:
+        tuple: (concurrency, per_host, error) where the limits are None when
+            not given and error is a message when one is above MAX_CONCURRENCY
+    """
+    from batch import MAX_CONCURRENCY
+    concurrency = _optional_int(payload.get('concurrency'))
+    per_host = _optional_int(payload.get('per_host'))
+    for name, value in (('concurrency', concurrency), ('per_host', per_host)):
+        if value is not None and value > MAX_CONCURRENCY:
+            return concurrency, per_host, f'{name} must be at most {MAX_CONCURRENCY}'
+    return concurrency, per_host, None
+
+def _pagination(page, total, per_page=RESULTS_PAGE_SIZE):
+    """Page numbers for the paged history and search templates"""
+    pages = max(1, (total + per_page - 1) // per_page)
+    return {
+        'page': page,
+        'pages': pages,
+        'prev_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if page < pages else None
+    }
+
+def _items_page(session_id, after, limit):
+    """
+    Get one page of a session's items using keyset pagination on (session_id, index)
+    
+    Args:
+        session_id (int): The session to read
+        after (int): Return items whose index is greater than this, or None for the first page
+        limit (int): Maximum number of items
+        
+    Returns:
+        tuple: (list of ScrapedData, cursor for the next page or None)
+    """
+    query = ScrapedData.query.filter(ScrapedData.session_id == session_id)
+    if after is not None:
+        query = query.filter(ScrapedData.index > after)
+    items = query.order_by(ScrapedData.index).limit(limit + 1).all()
+    
+    if len(items) > limit:
+        items = items[:limit]
+        return items, items[-1].index
+    return items, None
+
+def _iter_session_rows(session_id, batch_size=1000):
+    """
+    Stream a session's rows in index order without loading them all
+    
+    Rows are plain result rows rather than ORM objects and are fetched in
+    batches (a server-side cursor on PostgreSQL).
+    """
+    table = ScrapedData.__table__
+    query = (
+        select(table)
+        .where(table.c.session_id == session_id)
+        .order_by(table.c.index)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.session.execute(query):
+        yield row
 
 # Routes
 @app.route('/')
 def index():
     """Render the main dashboard page"""
-    return render_template('index.html')
+    return render_template('index.html', parsers=available_parsers())
 
 @app.route('/scrape', methods=['POST'])
 def scrape():
     """Handle the scraping request"""
+    from jobs import enqueue
     url = sanitize_input(request.form.get('url', ''))
     selector_type = sanitize_input(request.form.get('selector_type', 'tag'))
-    selector_value = sanitize_input(request.form.get('selector_value', ''))
+    # Selectors are validated, stored and run as typed; templates escape them
+    # on output, and escaping here would turn '.list > *' into '.list &gt; *'
+    selector_value = str(request.form.get('selector_value') or '')
     session_name = sanitize_input(request.form.get('session_name', ''))
+    parser = sanitize_input(request.form.get('parser', ''))
     
     if not url:
         flash('Please enter a valid URL', 'danger')
         return redirect(url_for('index'))
     
-    try:
-        # Create a new scraping session
-        new_session = ScrapingSession(
-            url=url,
-            selector_type=selector_type,
-            selector_value=selector_value,
-            name=session_name if session_name else get_page_title(url),
-            status="in-progress"
-        )
-        db.session.add(new_session)
-        db.session.commit()
-        
-        # Perform the scraping
-        soup = scrape_url(url)
-        if not soup:
-            new_session.status = "failed"
-            new_session.error_message = "Failed to retrieve content from URL"
-            db.session.commit()
-            flash('Failed to retrieve content from URL', 'danger')
-            return redirect(url_for('index'))
-        
-        # Extract elements based on selector
-        elements = extract_elements(soup, selector_type, selector_value)
-        
-        # Store scraped data
-        for i, element in enumerate(elements):
-            try:
-                # Handle dictionary data (for special types like robots, meta)
-                if isinstance(element, dict):
-                    element_type = element.get('type', 'dict')
-                    content = str(element.get('content', json.dumps(element)))
-                    attributes = json.dumps(element) if element else None
-                else:
-                    # Regular BeautifulSoup element
-                    element_type = getattr(element, 'name', 'unknown')
-                    content = element.get_text(strip=True) if hasattr(element, 'get_text') else str(element)
-                    attributes = json.dumps({k: v for k, v in element.attrs.items()}) if hasattr(element, 'attrs') and element.attrs else None
-                
-                scraped_data = ScrapedData(
-                    session_id=new_session.id,
-                    content=content,
-                    element_type=element_type,
-                    attributes=attributes,
-                    index=i
-                )
-                db.session.add(scraped_data)
-            except Exception as e:
-                logging.error(f"Error processing element {i}: {str(e)}")
-        
-        # Update session with count and status
-        new_session.item_count = len(elements)
-        new_session.status = "completed"
-        db.session.commit()
-        
-        flash(f'Successfully scraped {len(elements)} items', 'success')
-        # Store the session ID in the session for immediate visualization
-        session['current_session_id'] = new_session.id
-        return redirect(url_for('visualization', session_id=new_session.id))
+    if not is_valid_parser(parser):
+        flash(f'Unknown parser: {parser}', 'danger')
+        return redirect(url_for('index'))
+    
+    selector_error = validate_selector(selector_type, selector_value)
+    if selector_error:
+        flash(selector_error, 'danger')
+        return redirect(url_for('index'))
+    
+    # Create the session and hand the work to the background workers
+    new_session = ScrapingSession(
+        url=url,
+        selector_type=selector_type,
+        selector_value=selector_value,
+        name=session_name if session_name else url[:100],
+        parser=parser or None,
+        status="in-progress"
+    )
+    db.session.add(new_session)
+    db.session.commit()
     
+    try:
+        enqueue('scrape', session_id=new_session.id, name_from_title=not session_name)
     except Exception as e:
         logging.error(f"Scraping error: {str(e)}")
-        if new_session.id:
-            new_session.status = "failed"
-            new_session.error_message = str(e)
-            db.session.commit()
+        new_session.status = "failed"
+        new_session.error_message = str(e)
+        db.session.commit()
         flash(f'An error occurred: {str(e)}', 'danger')
         return redirect(url_for('index'))
+    
+    flash('Scraping started. Results will appear here as soon as they are ready.', 'info')
+    # Store the session ID in the session for immediate visualization
+    session['current_session_id'] = new_session.id
+    return redirect(url_for('visualization', session_id=new_session.id))
 
 @app.route('/history')
 def history():
-    """View scraping history"""
-    sessions = ScrapingSession.query.order_by(ScrapingSession.timestamp.desc()).all()
-    return render_template('history.html', sessions=sessions)
+    """View scraping history, one page of top-level sessions at a time"""
+    page = max(1, request.args.get('page', 1, type=int))
+    # Batch, crawl and sitemap pages are reached through their parent session
+    query = ScrapingSession.query.filter(ScrapingSession.parent_id.is_(None))
+    total = query.count()
+    sessions = (query.order_by(ScrapingSession.timestamp.desc())
+                .offset((page - 1) * RESULTS_PAGE_SIZE).limit(RESULTS_PAGE_SIZE).all())
+    return render_template('history.html', sessions=sessions, pagination=_pagination(page, total))
 
 @app.route('/visualization/<int:session_id>')
 def visualization(session_id):
     """Display visualization of scraped data"""
     session_data = ScrapingSession.query.get_or_404(session_id)
-    scraped_items = ScrapedData.query.filter_by(session_id=session_id).order_by(ScrapedData.index).all()
-    return render_template('visualization.html', session=session_data, items=scraped_items)
+    # Only the first page is rendered; the page loads the rest as the user scrolls
+    scraped_items, next_cursor = _items_page(session_id, None, ITEMS_PAGE_SIZE)
+    return render_template('visualization.html', session=session_data, items=scraped_items, next_cursor=next_cursor)
 
 @app.route('/api/data/<int:session_id>')
 def get_data(session_id):
-    """API to get scraped data in JSON format"""
+    """API to get one page of scraped data in JSON format
+    
+    Pages are addressed by cursor: pass the returned next_cursor as ?after=
+    to get the following page.
+    """
     session_data = ScrapingSession.query.get_or_404(session_id)
-    scraped_items = ScrapedData.query.filter_by(session_id=session_id).order_by(ScrapedData.index).all()
+    after = request.args.get('after', type=int)
+    limit = min(max(request.args.get('limit', ITEMS_PAGE_SIZE, type=int), 1), MAX_ITEMS_PAGE_SIZE)
+    scraped_items, next_cursor = _items_page(session_id, after, limit)
     
     return jsonify({
         'session': session_data.to_dict(),
-        'items': [item.to_dict() for item in scraped_items]
+        'items': [item.to_dict() for item in scraped_items],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/data/<int:session_id>/summary')
+def get_data_summary_api(session_id):
+    """API to get element type and content length counts for the charts"""
+    ScrapingSession.query.get_or_404(session_id)
+    
+    element_types = dict(
+        db.session.query(db.func.coalesce(ScrapedData.element_type, 'unknown'), db.func.count(ScrapedData.id))
+        .filter(ScrapedData.session_id == session_id)
+        .group_by(db.func.coalesce(ScrapedData.element_type, 'unknown'))
+        .all()
+    )
+    
+    length = db.func.coalesce(db.func.length(ScrapedData.content), 0)
+    length_range = db.case(
+        (length == 0, 'Empty'),
+        (length <= 10, '1-10 chars'),
+        (length <= 50, '11-50 chars'),
+        (length <= 100, '51-100 chars'),
+        (length <= 500, '101-500 chars'),
+        else_='500+ chars'
+    )
+    content_lengths = dict(
+        db.session.query(length_range, db.func.count(ScrapedData.id))
+        .filter(ScrapedData.session_id == session_id)
+        .group_by(length_range)
+        .all()
+    )
+    
+    return jsonify({
+        'element_types': element_types,
+        'content_lengths': content_lengths
     })
 
 @app.route('/export/<format>/<int:session_id>')
 def export_data(format, session_id):
-    """Export data in CSV or JSON format"""
+    """Export data in CSV, JSON or NDJSON format, optionally gzipped (?gzip=1)"""
     session_data = ScrapingSession.query.get_or_404(session_id)
-    scraped_items = ScrapedData.query.filter_by(session_id=session_id).order_by(ScrapedData.index).all()
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
     
-    if format.lower() == 'csv':
-        return export_to_csv(session_data, scraped_items)
-    elif format.lower() == 'json':
-        return export_to_json(session_data, scraped_items)
-    else:
+    exporters = {
+        'csv': export_to_csv,
+        'json': export_to_json,
+        'ndjson': export_to_ndjson
+    }
+    exporter = exporters.get(format.lower())
+    if not exporter:
         flash('Invalid export format', 'danger')
         return redirect(url_for('visualization', session_id=session_id))
+    
+    return exporter(session_data, _iter_session_rows(session_id), compress=compress)
 
 @app.route('/help')
 def help_page():
     """Display help information"""
     return render_template('help.html')
 
-@app.route('/search', methods=['POST'])
+@app.route('/search', methods=['GET', 'POST'])
 def search():
     """Search through scraped data"""
-    search_term = sanitize_input(request.form.get('search_term', ''))
-    session_id = request.form.get('session_id')
+    from search import search_items, search_sessions
+    search_term = sanitize_input(request.values.get('search_term', ''))
+    session_id = request.values.get('session_id', type=int)
+    page = request.values.get('page', 1, type=int)
     
     if not search_term:
         flash('Please enter a search term', 'warning')
@@ -149,34 +266,40 @@ def search():
     
     # If we have a session ID, search within that session
     if session_id:
-        items = ScrapedData.query.filter(
-            ScrapedData.session_id == session_id,
-            ScrapedData.content.ilike(f'%{search_term}%')
-        ).order_by(ScrapedData.index).all()
-        
         session_data = ScrapingSession.query.get_or_404(session_id)
+        items, total = search_items(search_term, session_id=session_id, page=page, per_page=RESULTS_PAGE_SIZE)
+        
         return render_template(
             'visualization.html', 
             session=session_data, 
             items=items, 
             search_term=search_term,
-            search_count=len(items)
+            search_count=total,
+            pagination=_pagination(page, total),
+            # Search results are paged by number, not loaded on scroll
+            next_cursor=None
         )
     
     # Otherwise search across all sessions
-    sessions = ScrapingSession.query.join(ScrapedData).filter(
-        ScrapedData.content.ilike(f'%{search_term}%')
-    ).distinct().all()
+    sessions, total = search_sessions(search_term, page=page, per_page=RESULTS_PAGE_SIZE)
     
-    return render_template('history.html', sessions=sessions, search_term=search_term)
+    return render_template('history.html', sessions=sessions, search_term=search_term,
+                           pagination=_pagination(page, total))
 
 @app.route('/delete/<int:session_id>', methods=['POST'])
 def delete_session(session_id):
-    """Delete a scraping session and its data"""
+    """Delete a scraping session, its child pages and everything that refers to them"""
     session_data = ScrapingSession.query.get_or_404(session_id)
     
-    # Delete all associated scraped data
-    ScrapedData.query.filter_by(session_id=session_id).delete()
+    # The session and the child sessions of a batch, crawl or sitemap run
+    session_ids = select(ScrapingSession.id).where(
+        db.or_(ScrapingSession.id == session_id, ScrapingSession.parent_id == session_id))
+    
+    # Delete the dependent rows first, all in one transaction
+    ScrapedData.query.filter(ScrapedData.session_id.in_(session_ids)).delete(synchronize_session=False)
+    ScrapeJob.query.filter(ScrapeJob.session_id.in_(session_ids)).delete(synchronize_session=False)
+    CrawlFrontier.query.filter_by(session_id=session_id).delete(synchronize_session=False)
+    ScrapingSession.query.filter_by(parent_id=session_id).delete(synchronize_session=False)
     
     # Delete the session itself
     db.session.delete(session_data)
@@ -189,16 +312,17 @@ def delete_session(session_id):
 def get_selectors():
     """Get recommended selector options for a given URL"""
     url = sanitize_input(request.form.get('url', ''))
+    parser = sanitize_input(request.form.get('parser', ''))
     
-    if not url:
+    if not url or not is_valid_parser(parser):
         return jsonify({
             'success': False,
-            'message': 'Please provide a valid URL',
+            'message': 'Please provide a valid URL' if not url else f'Unknown parser: {parser}',
             'options': None
         }), 400
     
     # Get the selector options
-    selector_options = get_selector_options(url)
+    selector_options = get_selector_options(url, parser=parser or None)
     
     if not selector_options:
         return jsonify({
@@ -212,3 +336,303 @@ def get_selectors():
         'message': 'Successfully identified selector options',
         'options': selector_options
     })
+
+@app.route('/api/batch', methods=['POST'])
+def start_batch():
+    """Start scraping a batch of URLs with the same selector"""
+    from batch import create_batch_session
+    from jobs import enqueue
+    payload = _request_payload()
+    if payload is None:
+        return jsonify({
+            'success': False,
+            'message': 'The request body must be a JSON object',
+            'session_id': None
+        }), 400
+    urls = payload.get('urls', [])
+    if isinstance(urls, str):
+        urls = urls.splitlines()
+    if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+        return jsonify({
+            'success': False,
+            'message': 'urls must be a list of strings',
+            'session_id': None
+        }), 400
+    urls = [url.strip() for url in urls if url.strip()]
+    
+    if not urls:
+        return jsonify({
+            'success': False,
+            'message': 'Please provide at least one URL',
+            'session_id': None
+        }), 400
+    
+    selector_type = sanitize_input(payload.get('selector_type', 'tag'))
+    selector_value = str(payload.get('selector_value') or '')
+    concurrency, per_host, limit_error = _concurrency_limits(payload)
+    parser = sanitize_input(payload.get('parser', ''))
+    
+    selector_error = validate_selector(selector_type, selector_value) or limit_error
+    if not is_valid_parser(parser) or selector_error:
+        return jsonify({
+            'success': False,
+            'message': selector_error or f'Unknown parser: {parser}',
+            'session_id': None
+        }), 400
+    
+    parent = create_batch_session(urls[0], selector_type, selector_value, sanitize_input(payload.get('name', '')) or None,
+                                  parser or None)
+    
+    enqueue('batch', session_id=parent.id, urls=urls, selector_type=selector_type,
+            selector_value=selector_value, concurrency=concurrency, per_host=per_host)
+    
+    return jsonify({
+        'success': True,
+        'message': f'Started scraping {len(urls)} URLs',
+        'session_id': parent.id
+    }), 202
+
+@app.route('/api/batch/<int:session_id>')
+def batch_status(session_id):
+    """Get the progress of a batch"""
+    parent = ScrapingSession.query.get_or_404(session_id)
+    counts = dict(
+        db.session.query(ScrapingSession.status, db.func.count(ScrapingSession.id))
+        .filter(ScrapingSession.parent_id == session_id)
+        .group_by(ScrapingSession.status)
+        .all()
+    )
+    
+    return jsonify({
+        'session': parent.to_dict(),
+        'pages': counts
+    })
+
+@app.route('/api/crawl', methods=['POST'])
+def start_crawl():
+    """Start crawling a site from a seed URL, applying the selector to every page"""
+    from crawler import create_crawl_session
+    from jobs import enqueue
+    payload = _request_payload()
+    if payload is None:
+        return jsonify({
+            'success': False,
+            'message': 'The request body must be a JSON object',
+            'session_id': None
+        }), 400
+    seed_url = (payload.get('url') or '').strip()
+    
+    if not seed_url:
+        return jsonify({
+            'success': False,
+            'message': 'Please provide a seed URL',
+            'session_id': None
+        }), 400
+    
+    selector_type = sanitize_input(payload.get('selector_type', 'tag'))
+    selector_value = str(payload.get('selector_value') or '')
+    concurrency, per_host, limit_error = _concurrency_limits(payload)
+    parser = sanitize_input(payload.get('parser', ''))
+    
+    selector_error = validate_selector(selector_type, selector_value) or limit_error
+    if not is_valid_parser(parser) or selector_error:
+        return jsonify({
+            'success': False,
+            'message': selector_error or f'Unknown parser: {parser}',
+            'session_id': None
+        }), 400
+    
+    parent = create_crawl_session(seed_url, selector_type, selector_value, sanitize_input(payload.get('name', '')) or None,
+                                  parser or None)
+    
+    enqueue('crawl', session_id=parent.id, max_depth=_optional_int(payload.get('max_depth')),
+            max_pages=_optional_int(payload.get('max_pages')), concurrency=concurrency, per_host=per_host)
+    
+    return jsonify({
+        'success': True,
+        'message': f'Started crawling {seed_url}',
+        'session_id': parent.id
+    }), 202
+
+@app.route('/api/crawl/<int:session_id>')
+def crawl_status(session_id):
+    """Get the progress of a crawl: its pages and its frontier"""
+    from crawler import frontier_counts
+    parent = ScrapingSession.query.get_or_404(session_id)
+    counts = dict(
+        db.session.query(ScrapingSession.status, db.func.count(ScrapingSession.id))
+        .filter(ScrapingSession.parent_id == session_id)
+        .group_by(ScrapingSession.status)
+        .all()
+    )
+    
+    return jsonify({
+        'session': parent.to_dict(),
+        'pages': counts,
+        'frontier': frontier_counts(session_id)
+    })
+
+@app.route('/api/sitemap', methods=['POST'])
+def start_sitemap():
+    """Start scraping the pages listed in a site's sitemaps; progress is reported by /api/batch/<id>"""
+    from sitemaps import create_sitemap_session, parse_lastmod
+    from jobs import enqueue
+    payload = _request_payload()
+    if payload is None:
+        return jsonify({
+            'success': False,
+            'message': 'The request body must be a JSON object',
+            'session_id': None
+        }), 400
+    url = (payload.get('url') or '').strip()
+    
+    if not url:
+        return jsonify({
+            'success': False,
+            'message': 'Please provide a site, robots.txt or sitemap URL',
+            'session_id': None
+        }), 400
+    
+    selector_type = sanitize_input(payload.get('selector_type', 'tag'))
+    selector_value = str(payload.get('selector_value') or '')
+    concurrency, per_host, limit_error = _concurrency_limits(payload)
+    parser = sanitize_input(payload.get('parser', ''))
+    since = (payload.get('since') or '').strip()
+    full = str(payload.get('full', '')).lower() in ('1', 'true', 'yes', 'on')
+    
+    selector_error = validate_selector(selector_type, selector_value) or limit_error
+    if not is_valid_parser(parser) or selector_error:
+        return jsonify({
+            'success': False,
+            'message': selector_error or f'Unknown parser: {parser}',
+            'session_id': None
+        }), 400
+    if since and parse_lastmod(since) is None:
+        return jsonify({
+            'success': False,
+            'message': f'Invalid date: {since}',
+            'session_id': None
+        }), 400
+    
+    parent = create_sitemap_session(url, selector_type, selector_value, sanitize_input(payload.get('name', '')) or None,
+                                    parser or None)
+    
+    enqueue('sitemap', session_id=parent.id, since=since or None, full=full,
+            concurrency=concurrency, per_host=per_host)
+    
+    return jsonify({
+        'success': True,
+        'message': f'Started scraping the sitemaps of {url}',
+        'session_id': parent.id
+    }), 202
+
+@app.route('/api/schedules', methods=['GET', 'POST'])
+def schedules_api():
+    """List the scheduled scrapes, or create one whose first run starts right away"""
+    from schedules import create_schedule, MIN_INTERVAL
+    if request.method == 'GET':
+        schedules = ScheduledScrape.query.order_by(ScheduledScrape.id).all()
+        return jsonify({'schedules': [schedule.to_dict() for schedule in schedules]})
+    
+    payload = _request_payload()
+    if payload is None:
+        return jsonify({
+            'success': False,
+            'message': 'The request body must be a JSON object',
+            'schedule_id': None
+        }), 400
+    url = (payload.get('url') or '').strip()
+    interval = _optional_int(payload.get('interval_seconds'))
+    
+    if not url or interval is None:
+        return jsonify({
+            'success': False,
+            'message': 'Please provide a URL and interval_seconds',
+            'schedule_id': None
+        }), 400
+    
+    selector_type = sanitize_input(payload.get('selector_type', 'tag'))
+    selector_value = str(payload.get('selector_value') or '')
+    parser = sanitize_input(payload.get('parser', ''))
+    
+    selector_error = validate_selector(selector_type, selector_value)
+    if not is_valid_parser(parser) or selector_error:
+        return jsonify({
+            'success': False,
+            'message': selector_error or f'Unknown parser: {parser}',
+            'schedule_id': None
+        }), 400
+    if interval < MIN_INTERVAL:
+        return jsonify({
+            'success': False,
+            'message': f'The interval must be at least {MIN_INTERVAL} seconds',
+            'schedule_id': None
+        }), 400
+    
+    schedule = create_schedule(url, selector_type, selector_value, interval,
+                               sanitize_input(payload.get('name', '')) or None, parser or None)
+    
+    return jsonify({
+        'success': True,
+        'message': f'Scheduled {url} every {interval} seconds',
+        'schedule_id': schedule.id
+    }), 201
+
+@app.route('/api/schedules/<int:schedule_id>', methods=['GET', 'PATCH', 'DELETE'])
+def schedule_api(schedule_id):
+    """Show a schedule and its recent runs, change its interval or pause it, or delete it"""
+    from schedules import MIN_INTERVAL
+    schedule = ScheduledScrape.query.get_or_404(schedule_id)
+    
+    if request.method == 'DELETE':
+        # The runs are kept as ordinary sessions
+        ScrapingSession.query.filter_by(schedule_id=schedule_id).update({'schedule_id': None})
+        db.session.delete(schedule)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Schedule deleted'})
+    
+    if request.method == 'PATCH':
+        payload = _request_payload()
+        if payload is None:
+            return jsonify({
+                'success': False,
+                'message': 'The request body must be a JSON object'
+            }), 400
+        if 'interval_seconds' in payload:
+            interval = _optional_int(payload.get('interval_seconds'))
+            if interval is None or interval < MIN_INTERVAL:
+                return jsonify({
+                    'success': False,
+                    'message': f'The interval must be at least {MIN_INTERVAL} seconds'
+                }), 400
+            schedule.interval_seconds = interval
+        if 'enabled' in payload:
+            schedule.enabled = str(payload.get('enabled')).lower() in ('1', 'true', 'yes', 'on')
+        db.session.commit()
+    
+    runs = (ScrapingSession.query.filter_by(schedule_id=schedule_id)
+            .order_by(ScrapingSession.timestamp.desc()).limit(MAX_SCHEDULE_RUNS).all())
+    return jsonify({
+        'schedule': schedule.to_dict(),
+        'runs': [run.to_dict() for run in runs]
+    })
+
+@app.route('/api/status/<int:session_id>')
+def session_status(session_id):
+    """Poll the progress of a scraping session and its background job"""
+    session_data = ScrapingSession.query.get_or_404(session_id)
+    job = ScrapeJob.query.filter_by(session_id=session_id).order_by(ScrapeJob.id.desc()).first()
+    
+    return jsonify({
+        'session': session_data.to_dict(),
+        'job': job.to_dict() if job else None,
+        'done': session_data.status != 'in-progress'
+    })
+
+@app.route('/api/hosts')
+def host_status():
+    """Rate limit and circuit breaker state of the hosts this process has fetched from"""
+    return jsonify({
+        'settings': throttle.settings,
+        'hosts': throttle.host_states()
+    })
@@ -0,0 +1,321 @@
+import os
+import hashlib
+import logging
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from sqlalchemy import update
+from app import db
+from models import ScrapingSession, ScrapedData, ScheduledScrape
+from scraper import scrape_records
+from storage import serialize_elements, store_changes
+
+# Recurring scrapes with change detection.
+#
+# A ScheduledScrape is a URL and selector the app scrapes again every
+# interval_seconds: the scheduler thread (jobs.py) claims due schedules and
+# queues a 'scheduled' job for each. Every extracted item gets a 64-bit
+# content hash and the page a hash of all of them. A run whose page hash
+# matches the previous run stores no rows and is marked 'unchanged';
+# otherwise the item hashes are aligned with the previous run's (kept on the
+# schedule) and only the added, removed and changed items are stored. The
+# first run stores every item as 'added'. Removed items are numbered after the
+# run's items and keep their old position in previous_index.
+
+# How often the scheduler looks for due schedules, in seconds
+POLL_INTERVAL = float(os.environ.get('SCRAPER_SCHEDULE_POLL_INTERVAL', 30))
+# Shortest allowed interval between runs, in seconds
+MIN_INTERVAL = int(os.environ.get('SCRAPER_SCHEDULE_MIN_INTERVAL', 60))
+
+# Number of hashes per query when looking up the content of removed items
+LOOKUP_CHUNK_SIZE = 500
+# Largest old x new item count of a stretch without unique items that is
+# aligned with SequenceMatcher; bigger stretches are paired up by position
+DIFF_FALLBACK_LIMIT = 250000
+
+def item_hash(element_type, content, attributes):
+    """Hash of one stored item: its tag, text and attributes"""
+    data = f"{element_type}\0{content}\0{attributes or ''}".encode('utf-8')
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+def page_hash(hashes):
+    """Hash of a page's result, from its item hashes in order"""
+    return hashlib.blake2b(' '.join(hashes).encode('ascii'), digest_size=16).hexdigest()
+
+def _unique_anchors(old_hashes, new_hashes, old_lo, old_hi, new_lo, new_hi):
+    """
+    Pair up the items that occur exactly once in both stretches.
+
+    Returns:
+        list: The longest run of (old_index, new_index) pairs of unique items
+            that are in the same order in both stretches
+    """
+    old_counts = Counter(old_hashes[old_lo:old_hi])
+    new_counts = Counter(new_hashes[new_lo:new_hi])
+    old_positions = {old_hashes[i]: i for i in range(old_lo, old_hi) if old_counts[old_hashes[i]] == 1}
+    pairs = [(old_positions[new_hashes[j]], j) for j in range(new_lo, new_hi)
+             if new_counts[new_hashes[j]] == 1 and new_hashes[j] in old_positions]
+
+    # Longest increasing subsequence of the old indexes (patience sorting)
+    tail_values = []
+    tails = []
+    links = []
+    for position, (i, _) in enumerate(pairs):
+        slot = bisect_left(tail_values, i)
+        links.append(tails[slot - 1] if slot else None)
+        if slot == len(tails):
+            tail_values.append(i)
+            tails.append(position)
+        else:
+            tail_values[slot] = i
+            tails[slot] = position
+    anchors = []
+    position = tails[-1] if tails else None
+    while position is not None:
+        anchors.append(pairs[position])
+        position = links[position]
+    anchors.reverse()
+    return anchors
+
+def _matched_items(old_hashes, new_hashes):
+    """
+    Find the items two runs have in common, in order.
+
+    Common leading and trailing items are matched first, then items that occur
+    once in both runs anchor the match and the stretches between them are
+    aligned the same way. This keeps repeated items ("Read more" links, list
+    entries) from being matched across the page, and runs in about linear time
+    on typical pages. A stretch with no unique items falls back to
+    SequenceMatcher, or to pairing by position when it is large.
+
+    Returns:
+        list: (old_index, new_index) pairs, increasing in both
+    """
+    matched = []
+    stack = [(0, len(old_hashes), 0, len(new_hashes))]
+    while stack:
+        old_lo, old_hi, new_lo, new_hi = stack.pop()
+        while old_lo < old_hi and new_lo < new_hi and old_hashes[old_lo] == new_hashes[new_lo]:
+            matched.append((old_lo, new_lo))
+            old_lo += 1
+            new_lo += 1
+        while old_lo < old_hi and new_lo < new_hi and old_hashes[old_hi - 1] == new_hashes[new_hi - 1]:
+            old_hi -= 1
+            new_hi -= 1
+            matched.append((old_hi, new_hi))
+        if old_lo == old_hi or new_lo == new_hi:
+            continue
+
+        anchors = _unique_anchors(old_hashes, new_hashes, old_lo, old_hi, new_lo, new_hi)
+        if anchors:
+            matched.extend(anchors)
+            bounds = [(old_lo - 1, new_lo - 1)] + anchors + [(old_hi, new_hi)]
+            for (old_start, new_start), (old_end, new_end) in zip(bounds, bounds[1:]):
+                stack.append((old_start + 1, old_end, new_start + 1, new_end))
+        elif (old_hi - old_lo) * (new_hi - new_lo) <= DIFF_FALLBACK_LIMIT:
+            matcher = SequenceMatcher(None, old_hashes[old_lo:old_hi], new_hashes[new_lo:new_hi], autojunk=False)
+            for old_start, new_start, size in matcher.get_matching_blocks():
+                matched.extend((old_lo + old_start + k, new_lo + new_start + k) for k in range(size))
+    matched.sort()
+    return matched
+
+def diff_items(old_hashes, new_hashes):
+    """
+    Align the items of two runs.
+
+    Items are matched in order, so an item inserted near the top is reported
+    once as added rather than every later item as changed. Where a run of
+    items was replaced, items are paired up as changed and any left over are
+    added or removed.
+
+    Args:
+        old_hashes (list): Item hashes of the previous run, in order
+        new_hashes (list): Item hashes of the new run, in order
+
+    Returns:
+        tuple: (changes, removed) where changes is a list of
+            (new_index, change_type) for added and changed items and removed
+            is a list of old indexes
+    """
+    changes = []
+    removed = []
+    old_start = new_start = 0
+    for old_end, new_end in _matched_items(old_hashes, new_hashes) + [(len(old_hashes), len(new_hashes))]:
+        paired = min(old_end - old_start, new_end - new_start)
+        changes.extend((i, 'changed') for i in range(new_start, new_start + paired))
+        changes.extend((i, 'added') for i in range(new_start + paired, new_end))
+        removed.extend(range(old_start + paired, old_end))
+        old_start, new_start = old_end + 1, new_end + 1
+    return changes, removed
+
+def _removed_contents(schedule_id, hashes):
+    """
+    Find the stored content of items that disappeared.
+
+    Args:
+        schedule_id (int): The schedule whose earlier runs are searched
+        hashes (set): Item hashes
+
+    Returns:
+        dict: hash -> (element_type, content, attributes) from the latest
+            run that stored the item
+    """
+    found = {}
+    hashes = list(hashes)
+    for start in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+        rows = (
+            db.session.query(ScrapedData.content_hash, ScrapedData.element_type, ScrapedData.content,
+                             ScrapedData.attributes)
+            .join(ScrapingSession, ScrapedData.session_id == ScrapingSession.id)
+            .filter(ScrapingSession.schedule_id == schedule_id,
+                    ScrapedData.content_hash.in_(hashes[start:start + LOOKUP_CHUNK_SIZE]),
+                    ScrapedData.change_type != 'removed')
+            .order_by(ScrapedData.id.desc())
+            .all()
+        )
+        for content_hash, element_type, content, attributes in rows:
+            found.setdefault(content_hash, (element_type, content, attributes))
+    return found
+
+def create_schedule(url, selector_type, selector_value, interval_seconds, name=None, parser=None):
+    """
+    Create a schedule whose first run is due right away.
+
+    Args:
+        url (str): The URL to scrape
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        interval_seconds (int): Seconds between runs (at least MIN_INTERVAL)
+        name (str): Optional name, also given to every run's session
+        parser (str): Parser backend, None for the app default
+
+    Returns:
+        ScheduledScrape: The new schedule
+    """
+    schedule = ScheduledScrape(
+        url=url,
+        selector_type=selector_type,
+        selector_value=selector_value,
+        interval_seconds=max(MIN_INTERVAL, interval_seconds),
+        name=(name or f"Schedule for {url}")[:100],
+        parser=parser,
+        enabled=True,
+        next_run_at=datetime.utcnow()
+    )
+    db.session.add(schedule)
+    db.session.commit()
+    return schedule
+
+def claim_due_schedules(now=None):
+    """
+    Claim the schedules whose next run is due and create a session for each.
+
+    A schedule is claimed by moving its next run forward with a conditional
+    UPDATE, so only one scheduler starts it when several processes share the
+    database. Runs missed while the app was down are not made up for. A
+    schedule whose previous run is still going skips this run.
+
+    Args:
+        now (datetime): The current time (naive UTC)
+
+    Returns:
+        list: The new in-progress ScrapingSessions, one per claimed schedule
+    """
+    now = now or datetime.utcnow()
+    # Read the due times up front: commits below reload objects, which could
+    # pick up a time another process has already moved
+    due = db.session.query(ScheduledScrape.id, ScheduledScrape.next_run_at, ScheduledScrape.interval_seconds).filter(
+        ScheduledScrape.enabled.is_(True), ScheduledScrape.next_run_at <= now).all()
+
+    sessions = []
+    for schedule_id, next_run_at, interval_seconds in due:
+        claimed = db.session.execute(
+            update(ScheduledScrape)
+            .where(ScheduledScrape.id == schedule_id, ScheduledScrape.next_run_at == next_run_at)
+            .values(next_run_at=now + timedelta(seconds=interval_seconds))
+        )
+        db.session.commit()
+        if claimed.rowcount != 1:
+            continue
+
+        schedule = db.session.get(ScheduledScrape, schedule_id)
+        previous = db.session.get(ScrapingSession, schedule.last_session_id) if schedule.last_session_id else None
+        if previous is not None and previous.status == 'in-progress':
+            logging.warning(f"Schedule {schedule.id} is still running session {previous.id}, skipping this run")
+            continue
+
+        scraping_session = ScrapingSession(
+            url=schedule.url,
+            selector_type=schedule.selector_type,
+            selector_value=schedule.selector_value,
+            name=schedule.name,
+            parser=schedule.parser,
+            schedule_id=schedule.id,
+            status="in-progress"
+        )
+        db.session.add(scraping_session)
+        db.session.flush()
+        schedule.last_run_at = now
+        schedule.last_session_id = scraping_session.id
+        db.session.commit()
+        sessions.append(scraping_session)
+    return sessions
+
+def run_scheduled_scrape(scraping_session):
+    """
+    Scrape a scheduled run's page and store how it differs from the previous run.
+
+    Must be called inside an application context.
+
+    Args:
+        scraping_session (ScrapingSession): The run's in-progress session
+
+    Returns:
+        int: The number of rows stored
+    """
+    schedule = db.session.get(ScheduledScrape, scraping_session.schedule_id)
+    if schedule is None:
+        raise ValueError(f"Schedule {scraping_session.schedule_id} no longer exists")
+
+    fetch_info = {}
+    result = scrape_records(scraping_session.url, scraping_session.selector_type, scraping_session.selector_value,
+                            parser=scraping_session.parser, fetch_info=fetch_info)
+    scraping_session.record_fetch(fetch_info)
+    if result is None:
+        scraping_session.status = "failed"
+        scraping_session.error_message = fetch_info.get('error') or "Failed to retrieve content from URL"
+        db.session.commit()
+        return 0
+
+    rows = list(serialize_elements(result['records']))
+    hashes = [item_hash(element_type, content, attributes) for _, element_type, content, attributes in rows]
+    scraping_session.content_hash = page_hash(hashes)
+
+    if schedule.item_hashes is None:
+        scraping_session.changes = 'initial'
+        changes, removed = [(i, 'added') for i in range(len(rows))], []
+    elif scraping_session.content_hash == schedule.content_hash:
+        scraping_session.changes = 'unchanged'
+        changes, removed = [], []
+    else:
+        scraping_session.changes = 'changed'
+        old_hashes = schedule.item_hashes.split()
+        changes, removed = diff_items(old_hashes, hashes)
+
+    stored = [rows[i] + (hashes[i], change_type, None) for i, change_type in changes]
+    if removed:
+        old_items = _removed_contents(schedule.id, {old_hashes[i] for i in removed})
+        # Numbered after the run's items so no index is used twice in the session
+        for index, i in enumerate(removed, len(rows)):
+            element_type, content, attributes = old_items.get(old_hashes[i], (None, None, None))
+            stored.append((index, element_type, content, attributes, old_hashes[i], 'removed', i))
+
+    if scraping_session.changes != 'unchanged':
+        schedule.content_hash = scraping_session.content_hash
+        schedule.item_hashes = ' '.join(hashes)
+    # The rows, the schedule's new state and the status are committed together
+    count = store_changes(scraping_session, stored)
+    logging.info(f"Scheduled run {scraping_session.id} of schedule {schedule.id}: {scraping_session.changes}, "
+                 f"{count} of {len(rows)} items stored")
+    return count
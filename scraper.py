@@ -1,6 +1,15 @@
+import time
 import logging
 import requests
-from bs4 import BeautifulSoup
+import fetcher
+import parse_pool
+import robots
+from cache import document_cache
+from parsers import resolve_parser, STRAINER_BACKENDS, BYTES_BACKENDS
+from charset import sniff_encoding
+from selector_cache import compile_selector, select
+from utils import canonicalize_url
+from bs4 import BeautifulSoup, SoupStrainer, NavigableString, CData
 import urllib.parse
 from collections import Counter
 import json
@@ -8,16 +17,201 @@ import re
 
 # Note: trafilatura is imported dynamically in the extract_text_content function to handle import errors gracefully
 
-def scrape_url(url):
+# Partial parse modes. Images and most link scrapes only need a handful of
+# tag types, so the tree is built from those alone (plus <title>, which is
+# used to name sessions). Meta and robots scrapes only need the <head>, so
+# parsing stops at </head>. Every other selector gets the full tree.
+PARSE_FULL = 'full'
+PARSE_STRAINERS = {
+    'images': ['img', 'title'],
+    'links': ['a', 'base', 'title'],
+}
+PARSE_HEAD = 'head'
+HEAD_END = re.compile(r'</head\s*>', re.IGNORECASE)
+HEAD_END_BYTES = re.compile(rb'</head\s*>', re.IGNORECASE)
+
+def parse_mode(selector_type=None, selector_value=None, follow_links=False):
+    """
+    Choose how much of a page needs to be parsed for a selector.
+    
+    Args:
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        follow_links (bool): Whether the page's links are needed as well
+        
+    Returns:
+        str: 'full', 'head' or a key of PARSE_STRAINERS
+    """
+    if follow_links:
+        mode = parse_mode(selector_type, selector_value)
+        return mode if mode in (PARSE_FULL, 'links') else PARSE_FULL
+    if selector_type == 'images':
+        return 'images'
+    if selector_type == 'links' and selector_value not in ('Navigation Links', 'Footer Links'):
+        # Navigation and footer links depend on their containers
+        return 'links'
+    if selector_type in ('meta', 'robots'):
+        return PARSE_HEAD
+    return PARSE_FULL
+
+def decode_document(content, content_type=None, parser=None):
+    """
+    Prepare a document body for the parser.
+    
+    The encoding is sniffed from the BOM, the Content-Type header or a
+    <meta charset> near the top (see charset.py). Backends that decode
+    natively get the bytes as they are; the others get decoded text.
+    
+    Args:
+        content (bytes): The document body
+        content_type (str): The Content-Type header, if any
+        parser (str): Parser backend or 'auto'; defaults to the app setting
+        
+    Returns:
+        tuple: (markup, encoding, encoding source)
+    """
+    encoding, source = sniff_encoding(content, content_type)
+    if resolve_parser(parser) in BYTES_BACKENDS:
+        return content, encoding, source
+    
+    text = content.decode(encoding, errors='replace')
+    if text.startswith('\ufeff'):
+        text = text[1:]
+    return text, encoding, source
+
+def parse_document(markup, mode=PARSE_FULL, parser=None, encoding=None):
+    """
+    Parse HTML, building only the part of the tree the mode needs.
+    
+    Args:
+        markup (str or bytes): The HTML text, or the raw body
+        mode (str): The parse mode from parse_mode()
+        parser (str): Parser backend or 'auto' (see parsers.py); defaults
+            to the app setting
+        encoding (str): The encoding of a raw body
+        
+    Returns:
+        BeautifulSoup: The parsed (possibly partial) HTML
+    """
+    backend = resolve_parser(parser)
+    options = {}
+    if isinstance(markup, bytes) and encoding:
+        options['from_encoding'] = encoding
+    
+    if mode == PARSE_HEAD:
+        head_end = (HEAD_END_BYTES if isinstance(markup, bytes) else HEAD_END).search(markup)
+        if head_end:
+            markup = markup[:head_end.end()]
+    elif mode in PARSE_STRAINERS and backend in STRAINER_BACKENDS:
+        options['parse_only'] = SoupStrainer(PARSE_STRAINERS[mode])
+    return BeautifulSoup(markup, backend, **options)
+
+def tree_key(parser, mode=PARSE_FULL):
+    """Key under which a parsed tree is stored in the document cache"""
+    return parser if mode == PARSE_FULL else f"{parser}:{mode}"
+
+def load_document(url, mode=PARSE_FULL, fetch_info=None):
+    """
+    Get the body of a page from the document cache, downloading it if needed.
+    
+    Args:
+        url (str): The URL of the page
+        mode (str): The parse mode the body is needed for
+        fetch_info (dict): Optional dict that receives the 'cache_status'
+        
+    Returns:
+        dict: The document cache entry ('content', 'content_type', 'complete')
+        
+    Raises:
+        requests.exceptions.RequestException: If the page cannot be downloaded,
+            including robots.Disallowed when robots.txt disallows it and
+            robots.Unavailable when robots.txt could not be fetched
+    """
+    if fetch_info is None:
+        fetch_info = {}
+    
+    # A body cut off after </head> only serves head-only parses
+    document = document_cache.get(url)
+    if document is None or (not document['complete'] and mode != PARSE_HEAD):
+        # Pages robots.txt disallows are refused before any request is made
+        robots.check_allowed(url)
+        
+        # Fetch through the shared keep-alive connection pools and the
+        # on-disk HTTP cache (the client sends a browser user agent to avoid blocking).
+        # The body is streamed with a size cap, and head-only parses stop
+        # downloading once </head> has arrived.
+        response = fetcher.fetch_document(url, timeout=10, stop_at=HEAD_END_BYTES if mode == PARSE_HEAD else None)
+        fetch_info['cache_status'] = response['cache_status']
+        
+        document = document_cache.put(url, response['content'], content_type=response['headers'].get('Content-Type'),
+                                      complete=response['complete'])
+    else:
+        fetch_info['cache_status'] = 'hit'
+    return document
+
+def parse_body(url, document, mode=PARSE_FULL, parser=None, fetch_info=None):
+    """
+    Decode and parse a page body.
+    
+    Args:
+        url (str): The URL of the page
+        document (dict): The body and its 'content_type', as returned by
+            load_document
+        mode (str): The parse mode from parse_mode()
+        parser (str): Parser backend or 'auto'; defaults to the app setting
+        fetch_info (dict): Optional dict that receives the 'encoding' and 'decode_ms'
+        
+    Returns:
+        BeautifulSoup: The parsed HTML
+    """
+    if fetch_info is None:
+        fetch_info = {}
+    
+    # Decode without requests' whole-body charset detection
+    started = time.perf_counter()
+    markup, encoding, encoding_source = decode_document(document['content'], document.get('content_type'), parser)
+    fetch_info['encoding'] = encoding
+    fetch_info['decode_ms'] = (time.perf_counter() - started) * 1000
+    logging.debug(f"Decoding {url} as {encoding} (from {encoding_source})")
+    
+    # Parse the HTML
+    soup = parse_document(markup, mode, parser, encoding)
+    
+    # Store the original URL in the soup object for reference
+    # We use __dict__ to store custom attributes since BeautifulSoup doesn't have a url attribute
+    soup.__dict__['url'] = url
+    soup.__dict__['encoding'] = encoding
+    return soup
+
+def scrape_url(url, fetch_info=None, selector_type=None, selector_value=None, parser=None, keep_tree=True,
+               follow_links=False):
     """
     Scrape a URL and return a BeautifulSoup object.
     
+    When a selector is given, only the part of the page it needs is parsed
+    (see parse_mode). Without one the full page is parsed.
+    
     Args:
         url (str): The URL to scrape
+        fetch_info (dict): Optional dict that receives details about the fetch,
+            such as 'cache_status' ('hit', 'revalidated' or 'miss'), the
+            'parser' backend used, the document 'encoding' and 'decode_ms',
+            and an 'error' message when the page could not be scraped
+        selector_type (str): The type of selector the page is scraped for
+        selector_value (str): The value of the selector
+        parser (str): Parser backend or 'auto'; defaults to the app setting
+        keep_tree (bool): Whether to keep a newly parsed tree in the document
+            cache. Scrapes that turn the tree into records right away pass
+            False so the tree can be freed (see release_tree).
+        follow_links (bool): Whether the page's links are needed as well as
+            the selector's elements
         
     Returns:
         BeautifulSoup: The parsed HTML content or None if an error occurs
     """
+    if fetch_info is None:
+        fetch_info = {}
+    
     try:
         # Check if URL is valid
         parsed_url = urllib.parse.urlparse(url)
@@ -25,39 +219,49 @@ def scrape_url(url):
             logging.error(f"Invalid URL: {url}")
             return None
         
-        # Set user agent to avoid blocking
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        # Make the request
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()  # Raise an exception for 4XX/5XX responses
-        
-        # Parse the HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Store the original URL in the soup object for reference
-        # We use __dict__ to store custom attributes since BeautifulSoup doesn't have a url attribute
-        soup.__dict__['url'] = url
-        
+        # Reuse a parsed tree if this page was fetched recently. A full tree
+        # serves every selector; a partial one only its own parse mode.
+        mode = parse_mode(selector_type, selector_value, follow_links)
+        backend = resolve_parser(parser)
+        fetch_info['parser'] = backend
+        soup = document_cache.get_tree(url, tree_key(backend))
+        if soup is None and mode != PARSE_FULL:
+            soup = document_cache.get_tree(url, tree_key(backend, mode))
+        if soup is not None:
+            # Other threads may be using the same tree; release_tree leaves it alone
+            soup.__dict__['shared'] = True
+            fetch_info['cache_status'] = 'hit'
+            fetch_info['encoding'] = soup.__dict__.get('encoding')
+            fetch_info['decode_ms'] = 0.0
+            return soup
+
+        document = load_document(url, mode, fetch_info)
+        soup = parse_body(url, document, mode, backend, fetch_info)
+        if keep_tree:
+            soup.__dict__['shared'] = True
+            document_cache.set_tree(url, tree_key(backend, mode), soup)
+
         return soup
     
     except requests.exceptions.RequestException as e:
         logging.error(f"Request error: {str(e)}")
+        fetch_info['error'] = str(e)
         return None
     except Exception as e:
         logging.error(f"General error in scrape_url: {str(e)}")
+        fetch_info['error'] = str(e)
         return None
 
-def extract_elements(soup, selector_type, selector_value):
+def extract_elements(soup, selector_type, selector_value, stats=None):
     """
     Extract elements from a BeautifulSoup object based on the selector.
     
     Args:
         soup (BeautifulSoup): The parsed HTML
-        selector_type (str): The type of selector (tag, class, id, css, images, links, robots, meta)
+        selector_type (str): The type of selector (tag, class, id, css, images, links, robots, meta, text)
         selector_value (str): The value of the selector
+        stats (dict): Optional dict that receives extraction statistics
+            (currently the text mode's byte counts)
         
     Returns:
         list: A list of matching BeautifulSoup elements or data objects
@@ -66,7 +270,7 @@ def extract_elements(soup, selector_type, selector_value):
         return []
     
     # Default to getting all elements if no selector is provided
-    if not selector_value and selector_type not in ['tag', 'images', 'links', 'robots', 'meta']:
+    if not selector_value and selector_type not in ['tag', 'images', 'links', 'robots', 'meta', 'text']:
         return []
     
     try:
@@ -75,16 +279,16 @@ def extract_elements(soup, selector_type, selector_value):
             if not selector_value:
                 # If no tag is specified, get all tags in the body
                 return soup.find_all() if not soup.body else soup.body.find_all()
-            return soup.find_all(selector_value)
+            return soup.find_all(compile_selector('tag', selector_value))
         elif selector_type == 'class':
-            return soup.find_all(class_=selector_value)
+            return soup.find_all(compile_selector('class', selector_value))
         elif selector_type == 'id':
             # Since IDs are unique, we wrap it in a list
             element = soup.find(id=selector_value)
             return [element] if element else []
         elif selector_type == 'css':
-            # Basic CSS selector support
-            return soup.select(selector_value)
+            # Basic CSS selector support, compiled once per selector string
+            return select(soup, selector_value)
             
         # Special selector types
         elif selector_type == 'images':
@@ -95,6 +299,8 @@ def extract_elements(soup, selector_type, selector_value):
             return extract_robots_data(soup.__dict__.get('url') if 'url' in soup.__dict__ else None)
         elif selector_type == 'meta':
             return extract_meta_elements(soup, selector_value)
+        elif selector_type == 'text':
+            return extract_text_elements(soup, selector_value or 'Leaf Blocks Only', stats)
         else:
             logging.warning(f"Unsupported selector type: {selector_type}")
             return []
@@ -264,7 +470,7 @@ def extract_link_elements(soup, link_type='All Links'):
     elif link_type == 'Navigation Links':
         # Look for links that are likely part of navigation
         nav_links = []
-        nav_containers = soup.select('nav, .nav, .navigation, .menu, header, .header, .navbar')
+        nav_containers = select(soup, 'nav, .nav, .navigation, .menu, header, .header, .navbar')
         
         for container in nav_containers:
             nav_links.extend(container.find_all('a', href=True))
@@ -273,7 +479,7 @@ def extract_link_elements(soup, link_type='All Links'):
     elif link_type == 'Footer Links':
         # Look for links in the footer
         footer_links = []
-        footer_containers = soup.select('footer, .footer, #footer')
+        footer_containers = select(soup, 'footer, .footer, #footer')
         
         for container in footer_containers:
             footer_links.extend(container.find_all('a', href=True))
@@ -282,10 +488,45 @@ def extract_link_elements(soup, link_type='All Links'):
     else:
         return all_links
 
+def internal_link_urls(soup):
+    """
+    Resolve the internal links of a page to canonical absolute URLs.
+    
+    Used by the crawler to find the next pages to visit. Links that lead to
+    another host or scheme are dropped.
+    
+    Args:
+        soup (BeautifulSoup): The parsed HTML, with its URL
+        
+    Returns:
+        list: Unique canonical URLs in document order
+    """
+    page_url = soup.__dict__.get('url', '')
+    base_tag = soup.find('base', href=True)
+    base = urllib.parse.urljoin(page_url, base_tag['href']) if base_tag else page_url
+    site = urllib.parse.urlsplit(canonicalize_url(page_url))[:2]
+    
+    urls = []
+    seen = set()
+    for link in extract_link_elements(soup, 'Internal Links'):
+        try:
+            url = canonicalize_url(urllib.parse.urljoin(base, link['href'].strip()))
+            if urllib.parse.urlsplit(url)[:2] != site or url in seen:
+                continue
+        except ValueError:
+            # Malformed href, e.g. a broken IPv6 host
+            continue
+        seen.add(url)
+        urls.append(url)
+    return urls
+
 def extract_robots_data(url):
     """
     Analyze the robots.txt file of a website.
     
+    The rules come from the robots.txt cache (see robots.py), so the file
+    is not downloaded again for every scrape.
+    
     Args:
         url (str): The URL of the website
         
@@ -296,55 +537,21 @@ def extract_robots_data(url):
         return [{'content': 'No URL provided for robots.txt analysis'}]
         
     try:
-        # Extract the domain from the URL
-        parsed_url = urllib.parse.urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
+        rules = robots.get_rules(url)
+        robots_url = rules.robots_url
+        base_url = robots_url[:-len('/robots.txt')]
         
-        # Fetch the robots.txt file
-        response = requests.get(robots_url, timeout=5)
+        if rules.error:
+            raise Exception(rules.error)
         
         # Check if we got a successful response
-        if response.status_code == 200:
-            content = response.text
-            
-            # Parse the robots.txt content
-            user_agents = []
-            disallowed = []
-            allowed = []
-            sitemaps = []
-            
-            current_agent = "*"  # Default user agent
-            
-            for line in content.split('\n'):
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                    
-                # Check for user-agent
-                if line.lower().startswith('user-agent:'):
-                    agent = line[11:].strip()
-                    current_agent = agent
-                    if agent not in user_agents:
-                        user_agents.append(agent)
-                        
-                # Check for disallow
-                elif line.lower().startswith('disallow:'):
-                    path = line[9:].strip()
-                    if path:
-                        disallowed.append(f"{current_agent}: {path}")
-                        
-                # Check for allow
-                elif line.lower().startswith('allow:'):
-                    path = line[6:].strip()
-                    if path:
-                        allowed.append(f"{current_agent}: {path}")
-                        
-                # Check for sitemap
-                elif line.lower().startswith('sitemap:'):
-                    sitemap = line[8:].strip()
-                    if sitemap:
-                        sitemaps.append(sitemap)
+        if rules.status_code == 200:
+            groups = list(rules.groups.values())
+            user_agents = [group.agent for group in groups]
+            disallowed = [f"{group.agent}: {path}" for group in groups for path, allowed in group.rules if not allowed]
+            allowed = [f"{group.agent}: {path}" for group in groups for path, allowed in group.rules if allowed]
+            sitemaps = rules.sitemaps
+            crawl_delay = rules.crawl_delay()
             
             # Create a formatted content string for display
             content_summary = (
@@ -358,7 +565,8 @@ def extract_robots_data(url):
                 (f"\n... and {len(allowed)-10} more" if len(allowed) > 10 else "") + 
                 f"\n\nSitemaps ({len(sitemaps)}):\n" + 
                 '\n'.join([f"- {url}" for url in sitemaps[:5]]) +
-                (f"\n... and {len(sitemaps)-5} more" if len(sitemaps) > 5 else "")
+                (f"\n... and {len(sitemaps)-5} more" if len(sitemaps) > 5 else "") +
+                (f"\n\nCrawl-delay: {crawl_delay:g}s" if crawl_delay is not None else "")
             )
             
             # Create the result object with type field for compatibility
@@ -370,6 +578,7 @@ def extract_robots_data(url):
                 'disallowed_paths': disallowed[:10],  # Limit to first 10
                 'allowed_paths': allowed[:10],        # Limit to first 10
                 'sitemaps': sitemaps,
+                'crawl_delay': crawl_delay,
                 'content': content_summary
             }
             
@@ -378,8 +587,8 @@ def extract_robots_data(url):
             error_result = {
                 'type': 'robots_error',
                 'status': 'Error', 
-                'message': f"Could not fetch robots.txt: HTTP {response.status_code}",
-                'content': f"Error: Could not fetch robots.txt file from {robots_url} (HTTP {response.status_code})"
+                'message': f"Could not fetch robots.txt: HTTP {rules.status_code}",
+                'content': f"Error: Could not fetch robots.txt file from {robots_url} (HTTP {rules.status_code})"
             }
             return [error_result]
     except Exception as e:
@@ -392,6 +601,55 @@ def extract_robots_data(url):
         }
         return [error_result]
 
+def build_meta_index(soup):
+    """
+    Index the metadata of a page in one pass.
+    
+    Collects the title, <meta> tags keyed by name and by property, JSON-LD
+    blocks and <link rel> entries. The index is kept on the soup, so every
+    meta mode run against a cached tree reuses it.
+    
+    Args:
+        soup (BeautifulSoup): The parsed HTML (usually just the <head>)
+        
+    Returns:
+        dict: title, names and properties (first content for each key, None
+            if the first tag has no content), metas (name, property, content)
+            in document order, json_ld and links
+    """
+    index = soup.__dict__.get('meta_index')
+    if index is not None:
+        return index
+    
+    index = {'title': None, 'names': {}, 'properties': {}, 'metas': [], 'json_ld': [], 'links': []}
+    for tag in soup.find_all(['title', 'meta', 'script', 'link']):
+        if tag.name == 'meta':
+            name = tag.get('name')
+            prop = tag.get('property')
+            content = tag.get('content')
+            if name is not None:
+                index['names'].setdefault(name, content)
+            if prop is not None:
+                index['properties'].setdefault(prop, content)
+            index['metas'].append((name, prop, content))
+        elif tag.name == 'title':
+            if index['title'] is None:
+                index['title'] = tag.string.strip() if tag.string else ''
+        elif tag.name == 'link':
+            if tag.get('href') and tag.get('rel'):
+                rel = tag['rel']
+                index['links'].append((' '.join(rel) if isinstance(rel, list) else rel, tag['href']))
+        elif (tag.get('type') or '').strip().lower() == 'application/ld+json' and tag.string:
+            try:
+                data = json.loads(tag.string)
+            except ValueError:
+                logging.debug("Skipping invalid JSON-LD block")
+                continue
+            index['json_ld'].extend(data if isinstance(data, list) else [data])
+    
+    soup.__dict__['meta_index'] = index
+    return index
+
 def extract_meta_elements(soup, meta_type='All Meta Tags'):
     """
     Extract meta information from the page.
@@ -407,6 +665,9 @@ def extract_meta_elements(soup, meta_type='All Meta Tags'):
         return []
         
     results = []
+    index = build_meta_index(soup)
+    names = index['names']
+    properties = index['properties']
     
     # Function to wrap metadata in an element-like object
     def create_meta_object(content, name=None, property=None):
@@ -416,93 +677,360 @@ def extract_meta_elements(soup, meta_type='All Meta Tags'):
             'content': content
         }
     
-    # Extract title
-    title = soup.find('title')
-    title_text = title.string.strip() if title else "No title found"
-    
-    # Extract description
-    desc_meta = soup.find('meta', attrs={'name': 'description'})
-    description = desc_meta['content'] if desc_meta and desc_meta.has_attr('content') else "No description found"
-    
-    # Extract keywords
-    keywords_meta = soup.find('meta', attrs={'name': 'keywords'})
-    keywords = keywords_meta['content'] if keywords_meta and keywords_meta.has_attr('content') else "No keywords found"
-    
-    # Extract Open Graph data
-    og_title = soup.find('meta', attrs={'property': 'og:title'})
-    og_title = og_title['content'] if og_title and og_title.has_attr('content') else "No OG title found"
-    
-    og_desc = soup.find('meta', attrs={'property': 'og:description'})
-    og_desc = og_desc['content'] if og_desc and og_desc.has_attr('content') else "No OG description found"
-    
-    og_image = soup.find('meta', attrs={'property': 'og:image'})
-    og_image = og_image['content'] if og_image and og_image.has_attr('content') else "No OG image found"
-    
-    # Extract Twitter Card data
-    twitter_card = soup.find('meta', attrs={'name': 'twitter:card'})
-    twitter_card = twitter_card['content'] if twitter_card and twitter_card.has_attr('content') else "No Twitter card found"
-    
-    twitter_title = soup.find('meta', attrs={'name': 'twitter:title'})
-    twitter_title = twitter_title['content'] if twitter_title and twitter_title.has_attr('content') else "No Twitter title found"
+    def first(values, key, default):
+        return values[key] if values.get(key) is not None else default
     
     # Process based on meta type
     if meta_type == 'All Meta Tags':
         # Get all meta tags
-        results.append(create_meta_object(title_text, name='title'))
-        results.append(create_meta_object(description, name='description'))
-        results.append(create_meta_object(keywords, name='keywords'))
+        results.append(create_meta_object(index['title'] if index['title'] is not None else "No title found", name='title'))
+        results.append(create_meta_object(first(names, 'description', "No description found"), name='description'))
+        results.append(create_meta_object(first(names, 'keywords', "No keywords found"), name='keywords'))
         
         # Add all other meta tags
-        for meta in soup.find_all('meta'):
-            if meta.has_attr('name') and meta.has_attr('content'):
-                results.append(create_meta_object(meta['content'], name=meta['name']))
-            elif meta.has_attr('property') and meta.has_attr('content'):
-                results.append(create_meta_object(meta['content'], property=meta['property']))
+        for name, prop, content in index['metas']:
+            if name is not None and content is not None:
+                results.append(create_meta_object(content, name=name))
+            elif prop is not None and content is not None:
+                results.append(create_meta_object(content, property=prop))
                 
     elif meta_type == 'Title & Description':
-        results.append(create_meta_object(title_text, name='title'))
-        results.append(create_meta_object(description, name='description'))
+        results.append(create_meta_object(index['title'] if index['title'] is not None else "No title found", name='title'))
+        results.append(create_meta_object(first(names, 'description', "No description found"), name='description'))
         
     elif meta_type == 'Keywords':
-        results.append(create_meta_object(keywords, name='keywords'))
+        results.append(create_meta_object(first(names, 'keywords', "No keywords found"), name='keywords'))
         
     elif meta_type == 'Open Graph Data':
-        results.append(create_meta_object(og_title, property='og:title'))
-        results.append(create_meta_object(og_desc, property='og:description'))
-        results.append(create_meta_object(og_image, property='og:image'))
+        results.append(create_meta_object(first(properties, 'og:title', "No OG title found"), property='og:title'))
+        results.append(create_meta_object(first(properties, 'og:description', "No OG description found"), property='og:description'))
+        results.append(create_meta_object(first(properties, 'og:image', "No OG image found"), property='og:image'))
         
         # Add other og: tags
-        for meta in soup.find_all('meta'):
-            if meta.has_attr('property') and meta.has_attr('content'):
-                prop = meta['property']
+        for name, prop, content in index['metas']:
+            if prop is not None and content is not None:
                 if prop.startswith('og:') and prop not in ['og:title', 'og:description', 'og:image']:
-                    results.append(create_meta_object(meta['content'], property=prop))
+                    results.append(create_meta_object(content, property=prop))
                     
     elif meta_type == 'Twitter Cards':
-        results.append(create_meta_object(twitter_card, name='twitter:card'))
-        results.append(create_meta_object(twitter_title, name='twitter:title'))
+        results.append(create_meta_object(first(names, 'twitter:card', "No Twitter card found"), name='twitter:card'))
+        results.append(create_meta_object(first(names, 'twitter:title', "No Twitter title found"), name='twitter:title'))
         
         # Add other twitter: tags
-        for meta in soup.find_all('meta'):
-            if meta.has_attr('name') and meta.has_attr('content'):
-                name = meta['name']
+        for name, prop, content in index['metas']:
+            if name is not None and content is not None:
                 if name.startswith('twitter:') and name not in ['twitter:card', 'twitter:title']:
-                    results.append(create_meta_object(meta['content'], name=name))
+                    results.append(create_meta_object(content, name=name))
+    
+    elif meta_type == 'Structured Data (JSON-LD)':
+        for item in index['json_ld']:
+            item_type = item.get('@type') if isinstance(item, dict) else None
+            results.append(create_meta_object(json.dumps(item, ensure_ascii=False), name='json-ld',
+                                              property=' '.join(item_type) if isinstance(item_type, list) else item_type))
+    
+    elif meta_type == 'Link Relations':
+        for rel, href in index['links']:
+            results.append(create_meta_object(href, name=f"link:{rel}"))
+    
+    return results
+
+# Block-level tags for the 'Leaf Blocks Only' text mode
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'body', 'caption', 'dd', 'details', 'dialog', 'div', 'dl', 'dt',
+    'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hgroup',
+    'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'summary', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead',
+    'tr', 'ul'
+}
+# The string types get_text() returns by default (not comments, scripts or styles)
+TEXT_STRING_TYPES = (NavigableString, CData)
+# Elements whose contents are code rather than text
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+def extract_text_elements(soup, text_mode='Leaf Blocks Only', stats=None):
+    """
+    Extract the text of the page, storing each piece of text only once.
+    
+    Scraping every tag stores each element's full text, so text nested N
+    levels deep is stored N times. Here every string is assigned to a single
+    owner in one walk of the tree:
+    
+    - 'Own Text Only': the element that directly contains it
+    - 'Leaf Blocks Only': its nearest block-level ancestor, so a paragraph
+      with links and emphasis comes out as one entry
+    
+    Args:
+        soup (BeautifulSoup): The parsed HTML
+        text_mode (str): 'Own Text Only' or 'Leaf Blocks Only'
+        stats (dict): Optional dict that receives 'bytes_stored',
+            'bytes_full' (what scraping every tag would store) and
+            'bytes_saved'
+        
+    Returns:
+        list: Data objects with the tag name as type, the text as content
+            and the tag's attributes
+    """
+    if not soup:
+        return []
+    
+    leaf_blocks = text_mode != 'Own Text Only'
+    root = soup.body or soup
+    
+    # Owners in document order, each [tag, text pieces]
+    owners = []
+    string_bytes = 0
+    full_bytes = 0
+    
+    # Each stack entry is (node, owner receiving its strings, number of
+    # enclosing tags below the root). Exit markers ((node, None, depth) for
+    # tags) close an element so its full-text size can be counted the way
+    # get_text() on every tag would.
+    root_owner = [root, []]
+    owners.append(root_owner)
+    stack = [(child, root_owner, 0) for child in reversed(root.contents)]
+    while stack:
+        node, owner, depth = stack.pop()
+        if node.name is None:
+            if type(node) in TEXT_STRING_TYPES:
+                text = node.strip()
+                if text:
+                    owner[1].append(text)
+                    size = len(text.encode('utf-8'))
+                    string_bytes += size
+                    # Repeated once per enclosing tag when every tag is stored
+                    full_bytes += size * depth
+            continue
+        
+        if node.name in NON_TEXT_TAGS:
+            # Not page text, but scraping every tag stores it for the tag itself
+            full_bytes += len(node.get_text(strip=True).encode('utf-8'))
+            continue
+        
+        if not leaf_blocks or node.name in BLOCK_TAGS:
+            owner = [node, []]
+            owners.append(owner)
+        for child in reversed(node.contents):
+            stack.append((child, owner, depth + 1))
     
+    results = []
+    for tag, pieces in owners:
+        if pieces:
+            results.append({
+                'type': tag.name,
+                'content': ''.join(pieces),
+                'attrs': dict(tag.attrs)
+            })
+    
+    if stats is not None:
+        stats['bytes_stored'] = string_bytes
+        stats['bytes_full'] = full_bytes
+        stats['bytes_saved'] = max(full_bytes - string_bytes, 0)
     return results
 
-def get_page_title(url):
+class ElementRecord:
+    """
+    Compact, tree-independent copy of an extracted element.
+    
+    Holds just what is stored for it, so the parse tree can be freed as
+    soon as the records are built.
+    """
+    __slots__ = ('element_type', 'text', 'attrs')
+    
+    def __init__(self, element_type, text, attrs=None):
+        self.element_type = element_type
+        self.text = text
+        # Attributes as a JSON string, or None
+        self.attrs = attrs
+    
+    def __repr__(self):
+        return f"ElementRecord({self.element_type!r}, {self.text[:40]!r})"
+
+def extract_records(soup, selector_type, selector_value, stats=None):
+    """
+    Extract elements and convert them to ElementRecords.
+    
+    Elements that cannot be serialized are logged and skipped.
+    
+    Args:
+        soup (BeautifulSoup): The parsed HTML
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        stats (dict): Optional dict that receives extraction statistics
+        
+    Returns:
+        list: ElementRecords in document order
+    """
+    records = []
+    for i, element in enumerate(extract_elements(soup, selector_type, selector_value, stats)):
+        try:
+            records.append(ElementRecord(*serialize_element(element)))
+        except Exception as e:
+            logging.error(f"Error processing element {i}: {str(e)}")
+    return records
+
+def release_tree(soup):
+    """
+    Free a parse tree that is no longer needed.
+    
+    Trees that came from or were handed to the document cache (marked
+    'shared' by scrape_url when they are obtained) are left alone, even if
+    the cache has since dropped them, since another thread may still hold
+    them. Any other tree is decomposed so its memory is returned right away
+    instead of whenever the garbage collector breaks its reference cycles.
+    
+    Args:
+        soup (BeautifulSoup): The parsed HTML
+    """
+    if soup is None or soup.__dict__.get('shared'):
+        return
+    soup.decompose()
+
+def _page_title(soup):
+    """Title of a parsed page, or None if it has none"""
+    return soup.title.string.strip() if soup.title and soup.title.string else None
+
+def extract_document(url, document, selector_type, selector_value, parser=None, follow_links=False):
+    """
+    Parse a page body and extract ElementRecords from it.
+    
+    Runs in a parse worker process (see parse_pool.py), or in the calling
+    thread for small bodies, so it only takes and returns picklable values and
+    frees the tree before returning.
+    
+    Args:
+        url (str): The URL of the page
+        document (dict): The body and its 'content_type'
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        parser (str): Parser backend
+        follow_links (bool): Whether to collect the page's internal links
+        
+    Returns:
+        dict: The 'records', the page 'title', its internal 'links', the
+            extraction 'stats' and the decoding details in 'fetch_info'
+    """
+    fetch_info = {}
+    stats = {}
+    soup = parse_body(url, document, parse_mode(selector_type, selector_value, follow_links), parser, fetch_info)
+    records = extract_records(soup, selector_type, selector_value, stats)
+    title = _page_title(soup)
+    links = internal_link_urls(soup) if follow_links else []
+    soup.decompose()
+    return {'records': records, 'title': title, 'links': links, 'stats': stats, 'fetch_info': fetch_info}
+
+def scrape_records(url, selector_type, selector_value, parser=None, fetch_info=None, stats=None, follow_links=False):
+    """
+    Scrape a page straight to ElementRecords.
+    
+    The parse tree does not outlive the call. When the parse pool is enabled
+    the body is parsed and extracted in a worker process and only the
+    records come back to this one. Robots scrapes report on the site's
+    robots.txt and do not fetch the page.
+    
+    Args:
+        url (str): The URL to scrape
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        parser (str): Parser backend or 'auto'; defaults to the app setting
+        fetch_info (dict): Optional dict that receives details about the
+            fetch (see scrape_url)
+        stats (dict): Optional dict that receives extraction statistics
+        follow_links (bool): Whether to collect the page's internal links
+            (see internal_link_urls)
+        
+    Returns:
+        dict: The 'records', the page 'title' (None if it has none) and its
+            'links', or None if the page could not be scraped
+    """
+    if fetch_info is None:
+        fetch_info = {}
+    if stats is None:
+        stats = {}
+    
+    if selector_type == 'robots':
+        # The analysis reads robots.txt itself, so the page is neither fetched
+        # nor refused by the rules it is meant to report on
+        parsed_url = urllib.parse.urlparse(url)
+        if not parsed_url.scheme or not parsed_url.netloc:
+            logging.error(f"Invalid URL: {url}")
+            return None
+        records = [ElementRecord(*serialize_element(item)) for item in extract_robots_data(url)]
+        return {'records': records, 'title': None, 'links': []}
+    
+    if not parse_pool.enabled():
+        soup = scrape_url(url, fetch_info, selector_type, selector_value, parser, keep_tree=False,
+                          follow_links=follow_links)
+        if not soup:
+            return None
+        records = extract_records(soup, selector_type, selector_value, stats)
+        title = _page_title(soup)
+        links = internal_link_urls(soup) if follow_links else []
+        release_tree(soup)
+        return {'records': records, 'title': title, 'links': links}
+    
+    try:
+        backend = resolve_parser(parser)
+        fetch_info['parser'] = backend
+        document = load_document(url, parse_mode(selector_type, selector_value, follow_links), fetch_info)
+        # Only the body and its content type are kept, for the worker or extract_document
+        document = {'content': document['content'], 'content_type': document.get('content_type')}
+        args = (url, document, selector_type, selector_value, backend, follow_links)
+        result = parse_pool.run(extract_document, *args) if parse_pool.offload(document) else extract_document(*args)
+    except Exception as e:
+        logging.error(f"Error scraping {url}: {str(e)}")
+        fetch_info['error'] = str(e)
+        return None
+    
+    fetch_info.update(result['fetch_info'])
+    stats.update(result['stats'])
+    return {'records': result['records'], 'title': result['title'], 'links': result['links']}
+
+def serialize_element(element):
+    """
+    Convert an extracted element into the values stored for it.
+    
+    Args:
+        element (Tag, dict or ElementRecord): A BeautifulSoup element, a
+            data object returned by the special extractors (robots, meta,
+            text) or an already converted record
+        
+    Returns:
+        tuple: (element_type, content, attributes) where attributes is a
+            JSON string or None
+    """
+    if isinstance(element, ElementRecord):
+        return element.element_type, element.text, element.attrs
+    
+    # Handle dictionary data (for special types like robots, meta)
+    if isinstance(element, dict):
+        element_type = element.get('type', 'dict')
+        content = str(element.get('content', json.dumps(element)))
+        if 'attrs' in element:
+            # Text records carry the attributes of the tag they came from
+            attributes = json.dumps(element['attrs']) if element['attrs'] else None
+        else:
+            attributes = json.dumps(element) if element else None
+    else:
+        # Regular BeautifulSoup element
+        element_type = getattr(element, 'name', 'unknown')
+        content = element.get_text(strip=True) if hasattr(element, 'get_text') else str(element)
+        attributes = json.dumps({k: v for k, v in element.attrs.items()}) if hasattr(element, 'attrs') and element.attrs else None
+    
+    return element_type, content, attributes
+
+def get_page_title(url, parser=None):
     """
     Get the title of a web page.
     
     Args:
         url (str): The URL of the web page
+        parser (str): Parser backend or 'auto'; defaults to the app setting
         
     Returns:
         str: The title of the web page or a default title
     """
     try:
-        soup = scrape_url(url)
+        # Only the <head> is needed for the title
+        soup = scrape_url(url, selector_type='meta', parser=parser)
         if soup and soup.title and soup.title.string:
             return soup.title.string.strip()
         return "Scraping Session"
@@ -535,26 +1063,114 @@ def extract_text_content(url):
         logging.error(f"Error extracting text content: {str(e)}")
         return None
         
+# Selector-option heuristics used by identify_important_elements
+CONTENT_TAGS = ['div', 'article', 'section', 'p', 'h1', 'h2', 'h3', 'main', 'header', 'footer', 'nav', 'aside', 'ul', 'ol', 'table', 'a']
+SEMANTIC_CLASS_PATTERNS = [
+    'content', 'article', 'post', 'entry', 'main', 'container', 
+    'wrapper', 'body', 'text', 'item', 'card', 'list', 'grid', 
+    'product', 'news', 'story', 'blog', 'title', 'headline',
+    'header', 'footer', 'author', 'date', 'time', 'price'
+]
+CONTENT_ID_PATTERNS = ['content', 'main', 'article', 'post', 'container', 'wrapper']
+PRODUCT_IMAGE_INDICATORS = ['product', 'item', 'thumbnail', 'gallery', 'goods', 'merch']
+BANNER_IMAGE_INDICATORS = ['banner', 'hero', 'slide', 'carousel', 'header', 'cover', 'featured']
+
+# Candidate CSS selectors, in the order they are suggested. Each one is
+# matched during the single tree walk instead of with soup.select():
+#   (selector, tag name or None, required class, required id, parent class, inside ul/ol)
+CSS_CANDIDATES = [
+    # Main content areas
+    ('article', 'article', None, None, None, False),
+    ('main', 'main', None, None, None, False),
+    ('div.content', 'div', 'content', None, None, False),
+    ('div.main', 'div', 'main', None, None, False),
+    ('div.article', 'div', 'article', None, None, False),
+    ('div#content', 'div', None, 'content', None, False),
+    ('div#main', 'div', None, 'main', None, False),
+    ('section.content', 'section', 'content', None, None, False),
+    # List items
+    ('ul li', 'li', None, None, None, 'ul'),
+    ('ol li', 'li', None, None, None, 'ol'),
+    ('div.item', 'div', 'item', None, None, False),
+    ('.items > *', None, None, None, 'items', False),
+    ('.list > *', None, None, None, 'list', False),
+    ('.articles > *', None, None, None, 'articles', False),
+    ('.products > *', None, None, None, 'products', False),
+    # Headings
+    ('h1', 'h1', None, None, None, False),
+    ('h2', 'h2', None, None, None, False),
+    ('h3', 'h3', None, None, None, False),
+    ('.title', None, 'title', None, None, False),
+    ('.heading', None, 'heading', None, None, False),
+    ('.headline', None, 'headline', None, None, False),
+]
+
+# Containers whose links count as navigation / footer links
+NAV_CONTAINER_TAGS = {'nav', 'header'}
+NAV_CONTAINER_CLASSES = {'nav', 'navigation', 'menu', 'header', 'navbar'}
+FOOTER_CONTAINER_CLASSES = {'footer'}
+
+def _class_list(tag):
+    """Return the classes of a tag as a list"""
+    classes = tag.attrs.get('class')
+    if not classes:
+        return []
+    return classes if isinstance(classes, list) else [classes]
+
+def _is_large_image(img):
+    """Check whether an image declares a width or height over 200px"""
+    width = img.get('width')
+    height = img.get('height')
+    style = img.get('style', '')
+    
+    try:
+        width = int(width) if width and width.isdigit() else 0
+        height = int(height) if height and height.isdigit() else 0
+    except (ValueError, TypeError):
+        width, height = 0, 0
+        
+    # Check for size in style attribute
+    width_in_style = re.search(r'width\s*:\s*(\d+)', style)
+    height_in_style = re.search(r'height\s*:\s*(\d+)', style)
+    
+    if width_in_style:
+        width = int(width_in_style.group(1))
+    if height_in_style:
+        height = int(height_in_style.group(1))
+        
+    return width > 200 or height > 200
+
+def _image_categories(img, found):
+    """Add the image categories an image belongs to to the found set"""
+    if 'Large Images Only' not in found and _is_large_image(img):
+        found.add('Large Images Only')
+    
+    alt_text = img.get('alt', '').lower()
+    img_class = ' '.join(img.get('class', [])).lower() if img.get('class') else ''
+    img_id = img.get('id', '').lower()
+    
+    if 'Product Images' not in found:
+        img_src = img.get('src', '').lower()
+        if any(indicator in attr for indicator in PRODUCT_IMAGE_INDICATORS for attr in [alt_text, img_class, img_id, img_src]):
+            found.add('Product Images')
+    
+    if 'Banner Images' not in found:
+        if any(indicator in attr for indicator in BANNER_IMAGE_INDICATORS for attr in [alt_text, img_class, img_id]):
+            found.add('Banner Images')
+
 def identify_important_elements(soup):
     """
     Identify important elements in a webpage for scraping.
     
+    The tree is walked once, collecting class counts, ids, candidate CSS
+    selector matches and image and link categories along the way.
+    
     Args:
         soup (BeautifulSoup): The parsed HTML
         
     Returns:
         dict: A dictionary containing lists of important selectors by type
     """
-    if not soup:
-        return {
-            'tags': [],
-            'classes': [],
-            'ids': [],
-            'css': [],
-            'images': [],
-            'links': []
-        }
-    
     # Initialize result dictionary
     results = {
         'tags': [],
@@ -564,222 +1180,182 @@ def identify_important_elements(soup):
         'images': [],
         'links': []
     }
+    if not soup:
+        return results
     
-    # Identify important tags (elements with substantial content)
-    content_tags = ['div', 'article', 'section', 'p', 'h1', 'h2', 'h3', 'main', 'header', 'footer', 'nav', 'aside', 'ul', 'ol', 'table', 'a']
+    class_counter = Counter()
+    important_ids = []
+    matched_selectors = set()
+    image_categories = set()
+    has_images = False
+    hrefs = []
+    base_url = None
+    has_nav_links = False
+    has_footer_links = False
     
-    # Add all important tags by default
-    results['tags'] = content_tags
-    
-    # Find important classes (those used multiple times and associated with content)
-    all_classes = []
-    for tag in soup.find_all(True):
-        if 'class' in tag.attrs:
-            # Flatten the list if it's a list
-            if isinstance(tag['class'], list):
-                all_classes.extend(tag['class'])
-            else:
-                all_classes.append(tag['class'])
+    # Depth-first walk in document order. Each entry carries what the
+    # candidate selectors need to know about the element's ancestors:
+    # (tag, parent classes, inside ul, inside ol, inside nav, inside footer)
+    stack = [(child, (), False, False, False, False) for child in reversed(soup.contents) if child.name]
+    while stack:
+        tag, parent_classes, in_ul, in_ol, in_nav, in_footer = stack.pop()
+        name = tag.name
+        attrs = tag.attrs
+        classes = _class_list(tag)
+        tag_id = attrs.get('id')
+        
+        # Classes, counted in first-seen order
+        if classes:
+            class_counter.update(classes)
+        
+        # Check if ID seems meaningful for content
+        if tag_id is not None:
+            id_lower = tag_id.lower()
+            if any(pattern in id_lower for pattern in CONTENT_ID_PATTERNS):
+                important_ids.append(tag_id)
+        
+        # Candidate CSS selectors
+        if len(matched_selectors) < len(CSS_CANDIDATES):
+            for selector, sel_tag, sel_class, sel_id, sel_parent_class, sel_ancestor in CSS_CANDIDATES:
+                if selector in matched_selectors:
+                    continue
+                if sel_tag and sel_tag != name:
+                    continue
+                if sel_class and sel_class not in classes:
+                    continue
+                if sel_id and sel_id != tag_id:
+                    continue
+                if sel_parent_class and sel_parent_class not in parent_classes:
+                    continue
+                if sel_ancestor and not (in_ul if sel_ancestor == 'ul' else in_ol):
+                    continue
+                matched_selectors.add(selector)
+        
+        if name == 'img':
+            has_images = True
+            _image_categories(tag, image_categories)
+        elif name == 'a' and attrs.get('href') is not None:
+            hrefs.append(attrs['href'])
+            has_nav_links = has_nav_links or in_nav
+            has_footer_links = has_footer_links or in_footer
+        elif name == 'base' and base_url is None and attrs.get('href') is not None:
+            base_url = attrs['href']
+        
+        if tag.contents:
+            child_in_nav = in_nav or name in NAV_CONTAINER_TAGS or not NAV_CONTAINER_CLASSES.isdisjoint(classes)
+            child_in_footer = (in_footer or name == 'footer' or tag_id == 'footer'
+                               or not FOOTER_CONTAINER_CLASSES.isdisjoint(classes))
+            child_in_ul = in_ul or name == 'ul'
+            child_in_ol = in_ol or name == 'ol'
+            for child in reversed(tag.contents):
+                if child.name:
+                    stack.append((child, classes, child_in_ul, child_in_ol, child_in_nav, child_in_footer))
     
-    # Count occurrences of each class
-    class_counter = Counter(all_classes)
+    # Add all important tags by default
+    results['tags'] = list(CONTENT_TAGS)
     
     # Choose classes that appear multiple times (likely pattern indicators)
     # and those with semantically meaningful names
-    semantic_patterns = [
-        'content', 'article', 'post', 'entry', 'main', 'container', 
-        'wrapper', 'body', 'text', 'item', 'card', 'list', 'grid', 
-        'product', 'news', 'story', 'blog', 'title', 'headline',
-        'header', 'footer', 'author', 'date', 'time', 'price'
-    ]
-    
-    important_classes = []
-    
-    # Add classes that appear multiple times
-    for cls, count in class_counter.items():
-        if count > 2:
+    important_classes = [cls for cls, count in class_counter.items() if count > 2]
+    seen = set(important_classes)
+    for cls in class_counter:
+        if cls and cls not in seen and any(pattern in cls.lower() for pattern in SEMANTIC_CLASS_PATTERNS):
             important_classes.append(cls)
-    
-    # Add classes with semantically meaningful names
-    for cls in all_classes:
-        if cls and any(pattern in cls.lower() for pattern in semantic_patterns):
-            if cls not in important_classes:
-                important_classes.append(cls)
+            seen.add(cls)
     
     # Limit to 15 most common classes to avoid overwhelming
     results['classes'] = important_classes[:15]
-    
-    # Find important IDs (those associated with main content)
-    important_ids = []
-    for tag in soup.find_all(id=True):
-        id_val = tag['id']
-        # Check if ID seems meaningful for content
-        if any(pattern in id_val.lower() for pattern in ['content', 'main', 'article', 'post', 'container', 'wrapper']):
-            important_ids.append(id_val)
-    
     results['ids'] = important_ids
-    
-    # Generate some useful CSS selectors
-    # Main content areas
-    article_selectors = ['article', 'main', 'div.content', 'div.main', 'div.article', 'div#content', 'div#main', 'section.content']
-    # List items
-    list_selectors = ['ul li', 'ol li', 'div.item', '.items > *', '.list > *', '.articles > *', '.products > *']
-    # Headings
-    heading_selectors = ['h1', 'h2', 'h3', '.title', '.heading', '.headline']
-    
-    # Check which selectors actually match elements on the page
-    results['css'] = []
-    for selector in article_selectors + list_selectors + heading_selectors:
-        try:
-            if soup.select(selector):
-                results['css'].append(selector)
-        except:
-            pass
+    results['css'] = [candidate[0] for candidate in CSS_CANDIDATES if candidate[0] in matched_selectors]
     
     # Find image categories available on the page
-    all_images = soup.find_all('img')
-    if all_images:
-        # Always include "All Images" as an option
-        results['images'] = ['All Images']
-        
-        # Check for large images
-        large_images = []
-        for img in all_images:
-            width = img.get('width')
-            height = img.get('height')
-            style = img.get('style', '')
-            
-            try:
-                width = int(width) if width and width.isdigit() else 0
-                height = int(height) if height and height.isdigit() else 0
-            except (ValueError, TypeError):
-                width, height = 0, 0
-                
-            # Check for size in style attribute
-            width_in_style = re.search(r'width\s*:\s*(\d+)', style)
-            height_in_style = re.search(r'height\s*:\s*(\d+)', style)
-            
-            if width_in_style:
-                width = int(width_in_style.group(1))
-            if height_in_style:
-                height = int(height_in_style.group(1))
-                
-            if width > 200 or height > 200:
-                large_images.append(img)
-        
-        if large_images:
-            results['images'].append('Large Images Only')
-            
-        # Check for product images
-        product_indicators = ['product', 'item', 'thumbnail', 'gallery', 'goods', 'merch']
-        product_images = []
-        
-        for img in all_images:
-            alt_text = img.get('alt', '').lower()
-            img_class = ' '.join(img.get('class', [])).lower() if img.get('class') else ''
-            img_id = img.get('id', '').lower()
-            img_src = img.get('src', '').lower()
-            
-            if any(indicator in attr for indicator in product_indicators for attr in [alt_text, img_class, img_id, img_src]):
-                product_images.append(img)
-                
-        if product_images:
-            results['images'].append('Product Images')
-            
-        # Check for banner images
-        banner_indicators = ['banner', 'hero', 'slide', 'carousel', 'header', 'cover', 'featured']
-        banner_images = []
-        
-        for img in all_images:
-            alt_text = img.get('alt', '').lower()
-            img_class = ' '.join(img.get('class', [])).lower() if img.get('class') else ''
-            img_id = img.get('id', '').lower()
-            
-            if any(indicator in attr for indicator in banner_indicators for attr in [alt_text, img_class, img_id]):
-                banner_images.append(img)
-                
-        if banner_images:
-            results['images'].append('Banner Images')
+    if has_images:
+        results['images'] = ['All Images'] + [
+            category for category in ('Large Images Only', 'Product Images', 'Banner Images')
+            if category in image_categories
+        ]
     
     # Find link categories available on the page
-    all_links = soup.find_all('a', href=True)
-    if all_links:
-        # Always include "All Links" as an option
+    if hrefs:
         results['links'] = ['All Links']
         
-        # Get the base URL to determine internal vs external links
-        base_url = None
-        base_tag = soup.find('base', href=True)
-        if base_tag:
-            base_url = base_tag['href']
-            
         # If we don't have a base URL from a <base> tag, try to extract from page URL
         if not base_url and 'url' in soup.__dict__:
             parsed_url = urllib.parse.urlparse(soup.__dict__.get('url'))
             base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
         
         if base_url:
-            # Check for internal and external links
-            internal_links = []
-            external_links = []
-            
-            for link in all_links:
-                href = link['href']
+            has_internal = has_external = False
+            for href in hrefs:
                 # Skip fragment-only links
                 if href.startswith('#'):
                     continue
-                    
-                # Handle relative URLs
+                
+                # Relative URLs are internal, absolute ones are compared by domain
                 if not href.startswith(('http://', 'https://', '//')):
-                    internal_links.append(link)
+                    has_internal = True
                 else:
-                    # Check if link is to the same domain
                     parsed_href = urllib.parse.urlparse(href)
-                    href_domain = f"{parsed_href.scheme}://{parsed_href.netloc}"
-                    if href_domain == base_url:
-                        internal_links.append(link)
+                    if f"{parsed_href.scheme}://{parsed_href.netloc}" == base_url:
+                        has_internal = True
                     else:
-                        external_links.append(link)
-                        
-            if internal_links:
+                        has_external = True
+                if has_internal and has_external:
+                    break
+                    
+            if has_internal:
                 results['links'].append('Internal Links')
-            if external_links:
+            if has_external:
                 results['links'].append('External Links')
         
-        # Check for navigation links
-        nav_containers = soup.select('nav, .nav, .navigation, .menu, header, .header, .navbar')
-        nav_links = []
-        
-        for container in nav_containers:
-            nav_links.extend(container.find_all('a', href=True))
-            
-        if nav_links:
+        if has_nav_links:
             results['links'].append('Navigation Links')
-            
-        # Check for footer links
-        footer_containers = soup.select('footer, .footer, #footer')
-        footer_links = []
-        
-        for container in footer_containers:
-            footer_links.extend(container.find_all('a', href=True))
-            
-        if footer_links:
+        if has_footer_links:
             results['links'].append('Footer Links')
     
     return results
 
-def get_selector_options(url):
+def analyze_document(url, document, parser=None):
+    """
+    Parse a page body and recommend selectors for it.
+    
+    Runs in a parse worker process (see parse_pool.py), or in the calling
+    thread for small bodies.
+    
+    Args:
+        url (str): The URL of the page
+        document (dict): The body and its 'content_type'
+        parser (str): Parser backend
+        
+    Returns:
+        dict: A dictionary containing lists of selectors by type
+    """
+    soup = parse_body(url, document, PARSE_FULL, parser)
+    results = identify_important_elements(soup)
+    soup.decompose()
+    return results
+
+def get_selector_options(url, parser=None):
     """
     Get a list of recommended selector options for the given URL.
     
     Args:
         url (str): The URL to analyze
+        parser (str): Parser backend or 'auto'; defaults to the app setting
         
     Returns:
         dict: A dictionary containing lists of selectors by type
     """
     try:
-        soup = scrape_url(url)
+        if parse_pool.enabled():
+            backend = resolve_parser(parser)
+            document = load_document(url)
+            document = {'content': document['content'], 'content_type': document.get('content_type')}
+            if parse_pool.offload(document):
+                return parse_pool.run(analyze_document, url, document, backend)
+            return analyze_document(url, document, backend)
+        
+        soup = scrape_url(url, parser=parser)
         if not soup:
             return None
         
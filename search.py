@@ -0,0 +1,151 @@
+import re
+import html
+import logging
+from sqlalchemy import inspect, text
+from app import db
+from models import ScrapingSession, ScrapedData
+
+# Full-text search over scraped content.
+#
+# Uses the FTS5 table (SQLite) or the tsvector column (PostgreSQL) created by
+# migrations.ensure_search_index, ranked by bm25 / ts_rank. Databases without
+# either fall back to the original substring scan.
+
+DEFAULT_PER_PAGE = 50
+
+_backend = None
+
+def search_backend():
+    """
+    Detect which full-text implementation the database provides.
+
+    Returns:
+        str: 'fts5', 'tsvector' or 'like'
+    """
+    global _backend
+    if _backend is None:
+        engine = db.engine
+        backend = 'like'
+        try:
+            inspector = inspect(engine)
+            if engine.dialect.name == 'sqlite' and 'scraped_data_fts' in inspector.get_table_names():
+                backend = 'fts5'
+            elif engine.dialect.name == 'postgresql' and any(
+                    column['name'] == 'content_tsv' for column in inspector.get_columns('scraped_data')):
+                backend = 'tsvector'
+        except Exception as e:
+            logging.warning(f"Could not inspect search index: {str(e)}")
+        _backend = backend
+    return _backend
+
+def _search_terms(search_term):
+    """Split a search string into word tokens (the input may be HTML-escaped)"""
+    return re.findall(r'\w+', html.unescape(search_term or ''))
+
+def _match_query(terms):
+    """Build the full-text query matching every term as a word prefix"""
+    if search_backend() == 'fts5':
+        return ' '.join('"' + term.replace('"', '""') + '"*' for term in terms)
+    return ' & '.join(f"{term}:*" for term in terms)
+
+def _ranked_hits_sql(session_filter):
+    """
+    SQL selecting (id, session_id, rank) for the matching rows.
+
+    The FTS5 query carries LIMIT -1 so SQLite does not flatten it into the
+    outer aggregate queries, where bm25() cannot be evaluated.
+    """
+    if search_backend() == 'fts5':
+        return f"""
+            SELECT d.id AS id, d.session_id AS session_id, bm25(scraped_data_fts) AS rank
+            FROM scraped_data_fts JOIN scraped_data d ON d.id = scraped_data_fts.rowid
+            WHERE scraped_data_fts MATCH :query {session_filter}
+            LIMIT -1
+        """
+    return f"""
+        SELECT d.id AS id, d.session_id AS session_id, -ts_rank(d.content_tsv, to_tsquery('simple', :query)) AS rank
+        FROM scraped_data d
+        WHERE d.content_tsv @@ to_tsquery('simple', :query) {session_filter}
+    """
+
+def search_items(search_term, session_id=None, page=1, per_page=DEFAULT_PER_PAGE):
+    """
+    Search scraped content, best matches first.
+
+    Args:
+        search_term (str): The text to search for
+        session_id (int): Restrict the search to one session
+        page (int): 1-based page number
+        per_page (int): Number of items per page
+
+    Returns:
+        tuple: (list of ScrapedData, total number of matches)
+    """
+    page = max(1, page or 1)
+    offset = (page - 1) * per_page
+
+    if search_backend() == 'like':
+        query = ScrapedData.query.filter(ScrapedData.content.ilike(f'%{search_term}%'))
+        if session_id:
+            query = query.filter(ScrapedData.session_id == session_id)
+        total = query.count()
+        items = query.order_by(ScrapedData.session_id, ScrapedData.index).offset(offset).limit(per_page).all()
+        return items, total
+
+    terms = _search_terms(search_term)
+    if not terms:
+        return [], 0
+
+    params = {'query': _match_query(terms), 'limit': per_page, 'offset': offset}
+    session_filter = ''
+    if session_id:
+        session_filter = 'AND d.session_id = :session_id'
+        params['session_id'] = int(session_id)
+
+    hits_sql = _ranked_hits_sql(session_filter)
+    total = db.session.execute(text(f"SELECT count(*) FROM ({hits_sql}) hits"), params).scalar()
+    ids = [row.id for row in db.session.execute(
+        text(f"SELECT id FROM ({hits_sql}) hits ORDER BY rank, id LIMIT :limit OFFSET :offset"), params)]
+
+    # Load the rows and keep the ranking order
+    items_by_id = {item.id: item for item in ScrapedData.query.filter(ScrapedData.id.in_(ids)).all()} if ids else {}
+    return [items_by_id[item_id] for item_id in ids if item_id in items_by_id], total
+
+def search_sessions(search_term, page=1, per_page=DEFAULT_PER_PAGE):
+    """
+    Find the sessions containing a search term, ranked by their best match.
+
+    Args:
+        search_term (str): The text to search for
+        page (int): 1-based page number
+        per_page (int): Number of sessions per page
+
+    Returns:
+        tuple: (list of ScrapingSession, total number of matching sessions)
+    """
+    page = max(1, page or 1)
+    offset = (page - 1) * per_page
+
+    if search_backend() == 'like':
+        query = ScrapingSession.query.join(ScrapedData).filter(
+            ScrapedData.content.ilike(f'%{search_term}%')
+        ).distinct()
+        total = query.count()
+        sessions = query.order_by(ScrapingSession.timestamp.desc()).offset(offset).limit(per_page).all()
+        return sessions, total
+
+    terms = _search_terms(search_term)
+    if not terms:
+        return [], 0
+
+    params = {'query': _match_query(terms), 'limit': per_page, 'offset': offset}
+    hits_sql = _ranked_hits_sql('')
+    total = db.session.execute(
+        text(f"SELECT count(DISTINCT session_id) FROM ({hits_sql}) hits"), params).scalar()
+    session_ids = [row.session_id for row in db.session.execute(text(f"""
+        SELECT session_id, min(rank) AS best FROM ({hits_sql}) hits
+        GROUP BY session_id ORDER BY best, session_id LIMIT :limit OFFSET :offset
+    """), params)]
+
+    sessions_by_id = {s.id: s for s in ScrapingSession.query.filter(ScrapingSession.id.in_(session_ids)).all()} if session_ids else {}
+    return [sessions_by_id[sid] for sid in session_ids if sid in sessions_by_id], total
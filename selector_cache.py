@@ -0,0 +1,93 @@
+import os
+import functools
+import soupsieve
+from bs4 import SoupStrainer
+
+# Process-wide cache of compiled selectors.
+#
+# CSS selectors are compiled with soupsieve once per distinct string and
+# class/tag selectors are turned into reusable SoupStrainer filters, so batch
+# and recurring jobs that apply the same selector to many pages never parse
+# it again. Invalid selectors are cached too (as their error message), which
+# lets routes reject them before any page is fetched.
+
+SELECTOR_CACHE_SIZE = int(os.environ.get('SCRAPER_SELECTOR_CACHE_SIZE', 512))
+
+class InvalidSelector(ValueError):
+    """The selector cannot be compiled"""
+
+@functools.lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def _compile(selector_type, selector_value):
+    """
+    Compile a selector, returning (compiled selector, error message).
+
+    Errors are returned rather than raised so lru_cache keeps them as
+    negative entries.
+    """
+    if selector_type == 'css':
+        try:
+            return soupsieve.compile(selector_value), None
+        except soupsieve.SelectorSyntaxError as e:
+            # soupsieve appends the selector with a position marker on extra lines
+            return None, f"Invalid CSS selector {selector_value!r}: {str(e).splitlines()[0]}"
+    if selector_type == 'class':
+        return SoupStrainer(class_=selector_value), None
+    if selector_type == 'tag':
+        if any(char.isspace() for char in selector_value):
+            return None, f"Invalid tag name {selector_value!r}"
+        return SoupStrainer(selector_value), None
+    return None, f"Selector type {selector_type!r} cannot be compiled"
+
+def compile_selector(selector_type, selector_value):
+    """
+    Get the compiled form of a css, class or tag selector.
+
+    Args:
+        selector_type (str): 'css', 'class' or 'tag'
+        selector_value (str): The selector
+
+    Returns:
+        object: A soupsieve.SoupSieve for css, a SoupStrainer for class/tag
+
+    Raises:
+        InvalidSelector: If the selector cannot be compiled
+    """
+    compiled, error = _compile(selector_type, selector_value)
+    if error:
+        raise InvalidSelector(error)
+    return compiled
+
+def validate_selector(selector_type, selector_value):
+    """
+    Check a selector before scraping with it.
+
+    Only css, class and tag selectors with a value are compiled; the other
+    types take fixed option names and are always accepted.
+
+    Args:
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+
+    Returns:
+        str: An error message, or None if the selector is usable
+    """
+    if selector_type not in ('css', 'class', 'tag') or not selector_value:
+        return None
+    return _compile(selector_type, selector_value)[1]
+
+def select(soup, selector_value):
+    """
+    Run a CSS selector through the compiled cache, like soup.select().
+
+    Args:
+        soup (BeautifulSoup): The parsed HTML
+        selector_value (str): The CSS selector
+
+    Returns:
+        list: The matching elements
+    """
+    return compile_selector('css', selector_value).select(soup)
+
+def cache_info():
+    """Hit/miss statistics of the selector cache"""
+    return _compile.cache_info()._asdict()
@@ -0,0 +1,279 @@
+import io
+import os
+import sys
+import gzip
+import argparse
+import logging
+import urllib.parse
+from datetime import datetime, timezone
+from xml.etree.ElementTree import iterparse, ParseError
+import requests
+from app import app, db
+from models import ScrapingSession
+from batch import run_batch, create_batch_session, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST
+from parsers import AUTO, PARSER_BACKENDS
+import fetcher
+import robots
+
+# Sitemap ingestion.
+#
+# Sitemaps are found in robots.txt (or at /sitemap.xml) and read as streams:
+# gzipped files are decompressed on the fly and the XML is parsed with
+# iterparse, clearing every <url> entry once its <loc> and <lastmod> are read,
+# so a file with millions of entries never exists as a tree in memory.
+# Sitemap indexes are followed to their child sitemaps. Entries whose lastmod
+# predates the previous run for the same sitemap are skipped, and the rest are
+# handed to the batch engine, which pulls them on a thread of its own so the
+# sitemap downloads never hold up the pages being scraped.
+
+# Largest decompressed size read from one sitemap file (the protocol allows 50 MB)
+MAX_SITEMAP_BYTES = int(os.environ.get('SCRAPER_SITEMAP_MAX_BYTES', 200 * 1024 * 1024))
+# How deep sitemap indexes may nest
+MAX_INDEX_DEPTH = 3
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+class _LimitedReader:
+    """File wrapper that stops a stream from growing past a byte limit"""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.remaining = limit
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+        if self.remaining < 0:
+            raise fetcher.BodyTooLarge(f"Sitemap is larger than {MAX_SITEMAP_BYTES} bytes")
+        return data
+
+def _local_name(tag):
+    """Strip the XML namespace from a tag name"""
+    return tag.rsplit('}', 1)[-1]
+
+def parse_lastmod(value):
+    """
+    Parse a W3C datetime as used by <lastmod>.
+
+    Args:
+        value (str): A date ('2024-05-01') or date and time with an offset
+
+    Returns:
+        datetime: The time in naive UTC, or None if it cannot be parsed
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def iter_sitemap_entries(sitemap_url):
+    """
+    Stream the entries of one sitemap file.
+
+    Args:
+        sitemap_url (str): The sitemap (or sitemap index) URL
+
+    Yields:
+        tuple: (kind, loc, lastmod) where kind is 'url' for pages and
+            'sitemap' for the children of an index, and lastmod is a naive
+            UTC datetime or None
+    """
+    response = fetcher.fetch(sitemap_url, timeout=30, stream=True)
+    with response:
+        response.raise_for_status()
+        # Content-Encoding is undone by urllib3; .xml.gz files are gzip themselves
+        response.raw.decode_content = True
+        # BufferedReader reads past the end, which must not find the stream closed
+        response.raw.auto_close = False
+        stream = io.BufferedReader(response.raw, buffer_size=fetcher.settings['chunk_size'])
+        if stream.peek(2)[:2] == GZIP_MAGIC:
+            stream = gzip.GzipFile(fileobj=stream)
+
+        root = None
+        for event, element in iterparse(_LimitedReader(stream, MAX_SITEMAP_BYTES), events=('start', 'end')):
+            if root is None:
+                root = element
+                continue
+            if event != 'end':
+                continue
+            kind = _local_name(element.tag)
+            if kind not in ('url', 'sitemap'):
+                continue
+
+            loc = lastmod = None
+            for child in element:
+                name = _local_name(child.tag)
+                if name == 'loc':
+                    loc = (child.text or '').strip()
+                elif name == 'lastmod':
+                    lastmod = parse_lastmod(child.text)
+            # Drop the finished entry so the tree never grows
+            root.clear()
+            if loc:
+                yield kind, loc, lastmod
+
+def iter_sitemap_urls(sitemap_urls, since=None, stats=None):
+    """
+    Stream the page URLs of sitemaps, following sitemap indexes.
+
+    Args:
+        sitemap_urls (list): Sitemap or sitemap index URLs
+        since (datetime): Skip entries last modified before this (naive UTC);
+            entries without a lastmod are always included
+        stats (dict): Optional dict that receives 'sitemaps', 'urls' and
+            'skipped' counts as the stream is consumed
+
+    Yields:
+        str: Page URLs
+    """
+    if stats is None:
+        stats = {}
+    stats.update(sitemaps=0, urls=0, skipped=0)
+
+    seen = set()
+    stack = [(url, 0) for url in reversed(sitemap_urls)]
+    while stack:
+        sitemap_url, depth = stack.pop()
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        stats['sitemaps'] += 1
+
+        children = []
+        try:
+            for kind, loc, lastmod in iter_sitemap_entries(sitemap_url):
+                if since is not None and lastmod is not None and lastmod < since:
+                    stats['skipped'] += 1
+                    continue
+                if kind == 'sitemap':
+                    if depth < MAX_INDEX_DEPTH:
+                        children.append(loc)
+                    continue
+                stats['urls'] += 1
+                yield loc
+        except (requests.exceptions.RequestException, ParseError, OSError, EOFError) as e:
+            # Keep going with the other sitemaps; entries already read are used
+            logging.error(f"Error reading sitemap {sitemap_url}: {str(e)}")
+
+        stack.extend((child, depth + 1) for child in reversed(children))
+
+def discover_sitemaps(url):
+    """
+    Find the sitemaps to read for a URL.
+
+    A site root or robots.txt URL is looked up in robots.txt (falling back to
+    /sitemap.xml); any other URL is taken to be a sitemap itself.
+
+    Args:
+        url (str): A site, robots.txt or sitemap URL
+
+    Returns:
+        list: Sitemap URLs
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.path not in ('', '/', '/robots.txt'):
+        return [url]
+    rules = robots.get_rules(url)
+    return list(rules.sitemaps) or [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+
+def last_run_time(url):
+    """
+    When the previous successful sitemap run for a URL started.
+
+    Args:
+        url (str): The URL the runs were started with
+
+    Returns:
+        datetime: The start time (naive UTC), or None for a first run
+    """
+    previous = ScrapingSession.query.filter_by(source='sitemap', url=url, status='completed', parent_id=None).order_by(
+        ScrapingSession.timestamp.desc()).first()
+    return previous.timestamp if previous else None
+
+def create_sitemap_session(url, selector_type, selector_value, name=None, parser=None):
+    """
+    Create the parent session of a sitemap run.
+
+    Args:
+        url (str): The site, robots.txt or sitemap URL of the run
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        name (str): Optional session name
+        parser (str): Parser backend for every page, None for the app default
+
+    Returns:
+        ScrapingSession: The new in-progress session
+    """
+    return create_batch_session(url, selector_type, selector_value,
+                                name or f"Sitemap of {urllib.parse.urlparse(url).netloc}", parser, source='sitemap')
+
+def run_sitemap(url, selector_type, selector_value, name=None, since=None, full=False, concurrency=None,
+                per_host=None, parent_session_id=None, parser=None):
+    """
+    Scrape the pages listed in a site's sitemaps. Python entry point.
+
+    Must be called inside an application context.
+
+    Args:
+        url (str): A site, robots.txt or sitemap URL
+        selector_type (str): The type of selector
+        selector_value (str): The value of the selector
+        name (str): Optional name for the session
+        since (datetime): Only scrape pages modified since then (naive UTC);
+            defaults to the start of the previous run for the same URL
+        full (bool): Scrape every page, ignoring lastmod
+        concurrency (int): Maximum number of pages in flight overall
+        per_host (int): Maximum number of pages in flight per host
+        parent_session_id (int): Existing session to fill
+        parser (str): Parser backend for a new session
+
+    Returns:
+        int: The ID of the sitemap session
+    """
+    if not full and since is None:
+        since = last_run_time(url)
+
+    if parent_session_id:
+        parent = db.session.get(ScrapingSession, parent_session_id)
+    else:
+        parent = create_sitemap_session(url, selector_type, selector_value, name, parser)
+
+    sitemap_urls = discover_sitemaps(url)
+    logging.info(f"Reading sitemaps {sitemap_urls} for session {parent.id}"
+                 + (f", pages modified since {since:%Y-%m-%d %H:%M:%S}" if since else ""))
+    stats = {}
+    # Pages robots.txt disallows are left out rather than recorded as failures
+    urls = (page_url for page_url in iter_sitemap_urls(sitemap_urls, since, stats) if robots.is_allowed(page_url))
+    run_batch(urls, selector_type, selector_value,
+              concurrency=concurrency, per_host=per_host, parent_session_id=parent.id)
+    logging.info(f"Sitemap session {parent.id}: {stats}")
+    return parent.id
+
+def main(argv=None):
+    """Command line entry point: python sitemaps.py https://example.com/ -t tag -v h1"""
+    parser = argparse.ArgumentParser(description='Scrape the pages listed in sitemaps')
+    parser.add_argument('url', help='Site root or robots.txt URL (sitemaps are discovered), or a sitemap URL')
+    parser.add_argument('-t', '--selector-type', default='tag')
+    parser.add_argument('-v', '--selector-value', default='')
+    parser.add_argument('-n', '--name', default=None)
+    parser.add_argument('--since', type=parse_lastmod, default=None,
+                        help='Only pages modified since this date (default: since the previous run)')
+    parser.add_argument('--full', action='store_true', help='Scrape every page, ignoring lastmod')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST)
+    parser.add_argument('--parser', default=None, choices=[AUTO] + PARSER_BACKENDS)
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        session_id = run_sitemap(args.url, args.selector_type, args.selector_value, args.name, args.since, args.full,
+                                 args.concurrency, args.per_host, parser=args.parser)
+    print(f'Sitemap session {session_id} finished')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -57,14 +57,16 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    // Handle copy to clipboard buttons
-    const copyButtons = document.querySelectorAll('.copy-content');
-    copyButtons.forEach(button => {
-        button.addEventListener('click', function() {
-            const contentId = this.getAttribute('data-content');
-            const content = document.getElementById(contentId).textContent;
-            copyToClipboard(content, this);
-        });
+    // Handle copy to clipboard buttons (delegated so rows loaded later work too)
+    document.addEventListener('click', function(e) {
+        const button = e.target.closest('.copy-content');
+        if (!button) return;
+        
+        const item = button.closest('.data-item');
+        const contentElement = item ? item.querySelector('.item-content') : null;
+        if (contentElement) {
+            copyToClipboard(contentElement.textContent.trim(), button);
+        }
     });
 
     // Search functionality
@@ -182,7 +184,10 @@ function updateSelectorHelp(selectorType) {
             selectorHelp.innerHTML = 'Analyze the robots.txt file and crawling permissions for this website.';
             break;
         case 'meta':
-            selectorHelp.innerHTML = 'Extract meta information like titles, descriptions, keywords, and Open Graph data.';
+            selectorHelp.innerHTML = 'Extract meta information like titles, descriptions, keywords, Open Graph data, JSON-LD structured data and link relations.';
+            break;
+        case 'text':
+            selectorHelp.innerHTML = 'Extract the page text with each piece stored once: as paragraphs and other blocks, or per element (own text only).';
             break;
     }
 }
@@ -342,6 +347,10 @@ function fetchSelectorOptions(url) {
     // Create form data
     const formData = new FormData();
     formData.append('url', url);
+    const parserSelect = document.getElementById('parser');
+    if (parserSelect && parserSelect.value) {
+        formData.append('parser', parserSelect.value);
+    }
     
     // Send AJAX request to get selector options
     fetch('/api/selector-options', {
@@ -451,9 +460,13 @@ function populateSelectorOptions(selectorType, options) {
             showLoadingIndicator(false);
             return;
         case 'meta':
-            optionsArray = ['All Meta Tags', 'Title & Description', 'Keywords', 'Open Graph Data', 'Twitter Cards'];
+            optionsArray = ['All Meta Tags', 'Title & Description', 'Keywords', 'Open Graph Data', 'Twitter Cards', 'Structured Data (JSON-LD)', 'Link Relations'];
             description = 'Meta Information';
             break;
+        case 'text':
+            optionsArray = ['Leaf Blocks Only', 'Own Text Only'];
+            description = 'Text Modes';
+            break;
     }
     
     // Add default empty option
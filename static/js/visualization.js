@@ -19,6 +19,17 @@ document.addEventListener('DOMContentLoaded', function() {
     // Load preferred view on page load
     loadPreferredView();
     
+    // Poll background scrapes until they finish
+    const progressAlert = document.getElementById('session_progress');
+    if (progressAlert) {
+        pollSessionStatus(progressAlert.getAttribute('data-status-url'));
+    }
+    
+    // Load further pages of items as the user scrolls
+    if (document.getElementById('next_cursor')) {
+        initializeLazyLoading();
+    }
+    
     // Initialize filter functionality
     const filterInput = document.getElementById('filter_content');
     if (filterInput) {
@@ -28,12 +39,29 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// Reload the page once the background job for this session has finished
+function pollSessionStatus(statusUrl) {
+    fetch(statusUrl)
+        .then(response => response.json())
+        .then(data => {
+            if (data.done) {
+                window.location.reload();
+            } else {
+                setTimeout(() => pollSessionStatus(statusUrl), 2000);
+            }
+        })
+        .catch(error => {
+            console.error('Error checking scraping status:', error);
+            setTimeout(() => pollSessionStatus(statusUrl), 5000);
+        });
+}
+
 // Initialize charts using Chart.js
 function initializeCharts() {
     const sessionId = document.getElementById('session_id').value;
     
-    // Fetch data for charts
-    fetch(`/api/data/${sessionId}`)
+    // Fetch aggregated counts for the charts (computed server-side for the whole session)
+    fetch(`/api/data/${sessionId}/summary`)
         .then(response => {
             if (!response.ok) {
                 throw new Error('Network response was not ok');
@@ -51,15 +79,108 @@ function initializeCharts() {
         });
 }
 
-// Create chart showing distribution of element types
-function createElementTypeChart(data) {
-    const elementTypes = {};
+// Fetch the next page of items whenever a "loading more" marker scrolls into view.
+// Pages are appended rather than windowed: rows that scroll out of view are not
+// recycled, so the DOM grows with what the user actually scrolls through, while
+// each request stays bounded by the page size.
+function initializeLazyLoading() {
+    const sessionId = document.getElementById('session_id').value;
+    const cursorInput = document.getElementById('next_cursor');
+    const markers = document.querySelectorAll('.load-more-items');
+    let loading = false;
     
-    // Count element types
-    data.items.forEach(item => {
-        const type = item.element_type || 'unknown';
-        elementTypes[type] = (elementTypes[type] || 0) + 1;
+    function loadNextPage() {
+        if (loading || !cursorInput.value) return;
+        loading = true;
+        
+        fetch(`/api/data/${sessionId}?after=${encodeURIComponent(cursorInput.value)}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(data => {
+                data.items.forEach(appendItem);
+                
+                if (data.next_cursor === null) {
+                    cursorInput.value = '';
+                    markers.forEach(marker => marker.remove());
+                    observer.disconnect();
+                } else {
+                    cursorInput.value = data.next_cursor;
+                }
+                
+                // Keep the current filter applied to the new rows
+                const filterInput = document.getElementById('filter_content');
+                if (filterInput && filterInput.value) {
+                    filterItems(filterInput.value);
+                }
+                loading = false;
+            })
+            .catch(error => {
+                console.error('Error loading more items:', error);
+                loading = false;
+            });
+    }
+    
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadNextPage();
+        }
     });
+    markers.forEach(marker => observer.observe(marker));
+}
+
+// Add one item to both the table and the card view
+function appendItem(item) {
+    const elementType = item.element_type || 'unknown';
+    const content = item.content || '';
+    
+    const row = document.createElement('tr');
+    row.className = 'data-item';
+    row.innerHTML = `
+        <td></td>
+        <td><span class="element-tag"></span></td>
+        <td><div class="item-content"></div></td>
+        <td>
+            <button class="btn btn-sm btn-outline-info copy-content" title="Copy content">
+                <i class="fas fa-copy"></i>
+            </button>
+        </td>`;
+    row.children[0].textContent = item.index + 1;
+    row.querySelector('.element-tag').textContent = elementType;
+    row.querySelector('.item-content').textContent = content;
+    document.getElementById('table_items').appendChild(row);
+    
+    const card = document.createElement('div');
+    card.className = 'col-md-6 col-lg-4 mb-3 data-item';
+    card.innerHTML = `
+        <div class="card h-100 bg-dark">
+            <div class="card-header d-flex justify-content-between align-items-center">
+                <span class="element-tag"></span>
+                <span class="badge bg-secondary"></span>
+            </div>
+            <div class="card-body">
+                <div class="content-preview item-content"></div>
+            </div>
+            <div class="card-footer d-flex justify-content-between">
+                <small class="text-muted"></small>
+                <button class="btn btn-sm btn-outline-info copy-content" title="Copy content">
+                    <i class="fas fa-copy"></i>
+                </button>
+            </div>
+        </div>`;
+    card.querySelector('.element-tag').textContent = elementType;
+    card.querySelector('.badge').textContent = `#${item.index + 1}`;
+    card.querySelector('.item-content').textContent = content;
+    card.querySelector('small').textContent = `${content.length} characters`;
+    document.getElementById('card_items').appendChild(card);
+}
+
+// Create chart showing distribution of element types
+function createElementTypeChart(data) {
+    const elementTypes = data.element_types;
     
     // Prepare data for chart
     const labels = Object.keys(elementTypes);
@@ -110,7 +231,7 @@ function createElementTypeChart(data) {
 
 // Create chart showing content length distribution
 function createContentLengthChart(data) {
-    // Group content by length ranges
+    // Show every length range, including empty ones, in a fixed order
     const lengthRanges = {
         'Empty': 0,
         '1-10 chars': 0,
@@ -119,24 +240,8 @@ function createContentLengthChart(data) {
         '101-500 chars': 0,
         '500+ chars': 0
     };
-    
-    // Count items in each range
-    data.items.forEach(item => {
-        const length = item.content ? item.content.length : 0;
-        
-        if (length === 0) {
-            lengthRanges['Empty']++;
-        } else if (length <= 10) {
-            lengthRanges['1-10 chars']++;
-        } else if (length <= 50) {
-            lengthRanges['11-50 chars']++;
-        } else if (length <= 100) {
-            lengthRanges['51-100 chars']++;
-        } else if (length <= 500) {
-            lengthRanges['101-500 chars']++;
-        } else {
-            lengthRanges['500+ chars']++;
-        }
+    Object.keys(lengthRanges).forEach(range => {
+        lengthRanges[range] = data.content_lengths[range] || 0;
     });
     
     // Prepare data for chart
@@ -219,7 +324,7 @@ function filterItems(searchTerm) {
 }
 
 // Export functionality
-function exportData(format) {
+function exportData(format, gzip = false) {
     const sessionId = document.getElementById('session_id').value;
-    window.location.href = `/export/${format}/${sessionId}`;
+    window.location.href = `/export/${format}/${sessionId}` + (gzip ? '?gzip=1' : '');
 }
@@ -0,0 +1,143 @@
+import os
+import logging
+from sqlalchemy import insert, func
+from sqlalchemy.orm.exc import ObjectDeletedError, StaleDataError
+from app import db
+from models import ScrapingSession, ScrapedData
+from scraper import serialize_element
+
+# Bulk write path for scraped rows.
+#
+# Rows are written with Core insert() executemany calls in fixed-size chunks
+# instead of one ORM object per element, which avoids identity-map and
+# unit-of-work overhead on scrapes that return tens of thousands of elements.
+# A session can be deleted while its job is still running; its rows are then
+# rolled back instead of committed and SessionDeleted tells the job to stop.
+
+CHUNK_SIZE = int(os.environ.get('SCRAPER_INSERT_CHUNK_SIZE', 1000))
+
+class SessionDeleted(Exception):
+    """The session being filled was deleted while its job ran"""
+
+# What writing to a deleted session raises: SessionDeleted from check_session,
+# or the ORM errors for reloading or updating the session's deleted row
+SESSION_DELETED_ERRORS = (SessionDeleted, ObjectDeletedError, StaleDataError)
+
+def check_session(*session_ids):
+    """
+    Make sure sessions still exist before rows are committed for them.
+
+    Args:
+        *session_ids (int): Session IDs; None is ignored
+
+    Raises:
+        SessionDeleted: If one of them was deleted, after rolling back
+    """
+    session_ids = {session_id for session_id in session_ids if session_id is not None}
+    # Without autoflush, so pending changes to a deleted row do not fail first
+    with db.session.no_autoflush:
+        found = db.session.query(func.count(ScrapingSession.id)).filter(ScrapingSession.id.in_(session_ids)).scalar()
+    if found < len(session_ids):
+        db.session.rollback()
+        raise SessionDeleted(f"Session deleted while its job ran (sessions {sorted(session_ids)})")
+
+def serialize_elements(elements):
+    """
+    Serialize extracted elements for storage, skipping any that fail.
+
+    Args:
+        elements (iterable): BeautifulSoup elements or data objects
+
+    Yields:
+        tuple: (index, element_type, content, attributes)
+    """
+    for i, element in enumerate(elements):
+        try:
+            yield (i,) + serialize_element(element)
+        except Exception as e:
+            logging.error(f"Error processing element {i}: {str(e)}")
+
+def store_rows(scraping_session, rows, chunk_size=None):
+    """
+    Insert scraped rows for a session and mark it completed.
+
+    The inserts, the item count and the status change are committed in a
+    single transaction.
+
+    Args:
+        scraping_session (ScrapingSession): The session the rows belong to
+        rows (iterable): (index, element_type, content, attributes) tuples
+        chunk_size (int): Number of rows per executemany call
+
+    Returns:
+        int: The number of rows stored
+    """
+    return store_changes(scraping_session, (row + (None, None, None) for row in rows), chunk_size)
+
+def store_changes(scraping_session, rows, chunk_size=None):
+    """
+    Insert rows that carry a content hash and change type, and mark the session completed.
+
+    Used by scheduled runs, which only store the items that differ from the
+    previous run. Committed in a single transaction like store_rows.
+
+    Args:
+        scraping_session (ScrapingSession): The session the rows belong to
+        rows (iterable): (index, element_type, content, attributes,
+            content_hash, change_type, previous_index) tuples
+        chunk_size (int): Number of rows per executemany call
+
+    Returns:
+        int: The number of rows stored
+
+    Raises:
+        SessionDeleted: If the session or its parent was deleted meanwhile
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    if scraping_session.id is None:
+        db.session.flush()
+
+    table = ScrapedData.__table__
+    session_id = scraping_session.id
+    count = 0
+    chunk = []
+    for index, element_type, content, attributes, content_hash, change_type, previous_index in rows:
+        chunk.append({
+            'session_id': session_id,
+            'content': content,
+            'content_type': 'text',
+            'element_type': element_type,
+            'attributes': attributes,
+            'index': index,
+            'content_hash': content_hash,
+            'change_type': change_type,
+            'previous_index': previous_index
+        })
+        if len(chunk) >= chunk_size:
+            db.session.execute(insert(table), chunk)
+            count += len(chunk)
+            chunk = []
+
+    if chunk:
+        db.session.execute(insert(table), chunk)
+        count += len(chunk)
+
+    check_session(session_id, scraping_session.parent_id)
+    scraping_session.item_count = count
+    scraping_session.status = "completed"
+    db.session.commit()
+    return count
+
+def store_elements(scraping_session, elements, chunk_size=None):
+    """
+    Serialize extracted elements and bulk insert them for a session.
+
+    Args:
+        scraping_session (ScrapingSession): The session the elements belong to
+        elements (iterable): BeautifulSoup elements or data objects
+        chunk_size (int): Number of rows per executemany call
+
+    Returns:
+        int: The number of rows stored
+    """
+    return store_rows(scraping_session, serialize_elements(elements), chunk_size)
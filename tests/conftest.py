@@ -0,0 +1,5 @@
+import os
+
+# Modules that import app create its tables on import; keep them in memory
+# instead of in the instance database
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
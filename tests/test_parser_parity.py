@@ -0,0 +1,94 @@
+"""
+Parity tests for the HTML parser backends.
+
+Every installed backend must give the same serialized results as
+html.parser for every extraction mode, and the same selector suggestions.
+The fixture is well-formed: on broken markup lxml and html5lib repair
+nesting the way browsers do, which is a legitimate difference. It also has
+no inline scripts in the body: html5lib gives script text as plain strings,
+so get_text() based modes include it where the other backends do not.
+"""
+import functools
+
+import pytest
+
+from parsers import available_parsers
+from scraper import PARSE_FULL, parse_mode, parse_document, extract_elements, identify_important_elements, serialize_element
+
+REFERENCE = 'html.parser'
+BACKENDS = [backend for backend in available_parsers() if backend != REFERENCE]
+
+# Every selector that reads the page (robots reads robots.txt instead)
+SELECTORS = [
+    ('tag', ''), ('tag', 'a'), ('tag', 'li'), ('class', 'title'), ('class', 'meta'), ('id', 'post-3'),
+    ('css', 'article h2.title'), ('css', '.items > li'),
+    ('images', 'All Images'), ('images', 'Large Images Only'), ('images', 'Product Images'), ('images', 'Banner Images'),
+    ('links', 'All Links'), ('links', 'Internal Links'), ('links', 'External Links'),
+    ('links', 'Navigation Links'), ('links', 'Footer Links'),
+    ('meta', 'All Meta Tags'), ('meta', 'Title & Description'), ('meta', 'Keywords'),
+    ('meta', 'Open Graph Data'), ('meta', 'Twitter Cards'),
+    ('meta', 'Structured Data (JSON-LD)'), ('meta', 'Link Relations'),
+    ('text', 'Leaf Blocks Only'), ('text', 'Own Text Only'),
+]
+
+HEAD = (
+    '<head><title>Fixture</title><base href="https://example.com">'
+    '<meta name="description" content="A fixture page"><meta name="keywords" content="a, b">'
+    '<meta property="og:title" content="OG"><meta property="og:type" content="article">'
+    '<meta name="twitter:card" content="summary"><meta name="twitter:site" content="@x">'
+    '<link rel="canonical" href="https://example.com/fixture"><link rel="alternate" hreflang="de" href="/de/">'
+    '<link rel="icon" href="/favicon.ico"><link rel="stylesheet" href="/site.css">'
+    '<script type="application/ld+json">{"@context": "https://schema.org", "@type": "Article", "headline": "Fixture"}</script>'
+    '<script type="application/ld+json">[{"@type": ["Organization", "Brand"], "name": "Example"}]</script>'
+    '</head>'
+)
+
+def build_page(blocks=60):
+    """A well-formed page with navigation, cards, images, links and a footer"""
+    parts = ['<!DOCTYPE html><html>', HEAD, '<body><header class="site-header"><nav class="navbar"><ul>']
+    parts += [f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(5)]
+    parts.append('</ul></nav><img class="hero-banner" src="/hero.jpg" width="1200"></header>')
+    parts.append('<main id="main-content"><div class="content"><ul class="items">')
+    for i in range(blocks):
+        href = [f'/post/{i}', f'https://example.com/p/{i}', f'https://other{i % 7}.org/x', f'#c{i}'][i % 4]
+        image = [f'<img src="/img/{i}.jpg" alt="photo {i}">', f'<img src="/product/{i}.png" width="300" height="300">',
+                 f'<img src="/t/{i}.gif" style="width: 80px">', ''][i % 4]
+        parts.append(
+            f'<li class="card meta-{i % 3}"><article id="post-{i}"><h2 class="title">Post {i}</h2>'
+            f'<p class="text">Lorem <em>ipsum</em> dolor <a href="/tag/{i}">sit</a> amet {i}</p>{image}'
+            f'<div class="meta"><span class="date">2024-01-{i % 28 + 1:02d}</span>'
+            f'<a href="{href}">Read more</a></div></article></li>'
+        )
+    parts.append('</ul><ol><li>Ordered</li></ol><!-- a comment --></div></main>')
+    parts.append('<footer id="footer"><div class="footer-links">')
+    parts += [f'<a href="https://social{i}.example.net/">Social {i}</a>' for i in range(3)]
+    parts.append('</div></footer></body></html>')
+    return ''.join(parts)
+
+PAGE = build_page()
+
+def _parse(parser, mode):
+    soup = parse_document(PAGE, mode, parser)
+    soup.__dict__['url'] = 'https://example.com/'
+    return soup
+
+@functools.lru_cache(maxsize=None)
+def extract(parser, selector_type, selector_value):
+    """Serialized results of one selector with one backend"""
+    soup = _parse(parser, parse_mode(selector_type, selector_value))
+    return [serialize_element(element) for element in extract_elements(soup, selector_type, selector_value)]
+
+@pytest.mark.parametrize('selector_type,selector_value', SELECTORS)
+def test_reference_finds_items(selector_type, selector_value):
+    # A selector that finds nothing would make the parity check below vacuous
+    assert extract(REFERENCE, selector_type, selector_value)
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('selector_type,selector_value', SELECTORS)
+def test_extraction_matches_reference(backend, selector_type, selector_value):
+    assert extract(backend, selector_type, selector_value) == extract(REFERENCE, selector_type, selector_value)
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_selector_options_match_reference(backend):
+    assert identify_important_elements(_parse(backend, PARSE_FULL)) == \
+        identify_important_elements(_parse(REFERENCE, PARSE_FULL))
@@ -0,0 +1,64 @@
+"""
+Tests for the item alignment behind scheduled change detection.
+"""
+import time
+
+from schedules import diff_items
+
+
+def _hashes(text):
+    return list(text)
+
+
+def _accounts_for_every_item(old, new, changes, removed):
+    """Every old item is either kept, changed or removed"""
+    added = sum(1 for _, change_type in changes if change_type == 'added')
+    return len(old) == len(new) - added + len(removed)
+
+
+def test_identical_runs_have_no_changes():
+    assert diff_items(_hashes('abcdef'), _hashes('abcdef')) == ([], [])
+
+
+def test_insert_near_top_is_one_addition():
+    assert diff_items(_hashes('abcdef'), _hashes('aXbcdef')) == ([(1, 'added')], [])
+
+
+def test_removal_reports_old_index():
+    assert diff_items(_hashes('abcdef'), _hashes('abdef')) == ([], [2])
+
+
+def test_replaced_items_are_paired_as_changed():
+    assert diff_items(_hashes('abcdef'), _hashes('abXYZWf')) == ([(2, 'changed'), (3, 'changed'), (4, 'changed'),
+                                                                  (5, 'added')], [])
+
+
+def test_moved_block_keeps_unchanged_items():
+    changes, removed = diff_items(_hashes('abcdefgh'), _hashes('efghabcd'))
+    assert len(changes) == 4 and len(removed) == 4
+
+
+def test_repeated_items_edit_is_one_change():
+    # Repeated "Read more" links and list entries must not be treated as junk
+    old = ['read-more', 'item', 'sep'] * 133 + ['footer']
+    new = list(old)
+    new[200] = 'edited'
+    assert diff_items(old, new) == ([(200, 'changed')], [])
+
+
+def test_repeated_items_insert_and_remove():
+    old = ['a', 'b'] * 300
+    new = old[:100] + ['x'] + old[100:450] + old[452:]
+    changes, removed = diff_items(old, new)
+    # One item in, two out: which of the identical items moved is arbitrary
+    assert len(changes) + len(removed) <= 3
+    assert _accounts_for_every_item(old, new, changes, removed)
+
+
+def test_long_repetitive_page_is_fast():
+    old = [str(i % 7) for i in range(20000)]
+    new = [str(i % 5) for i in range(20000)]
+    start = time.perf_counter()
+    changes, removed = diff_items(old, new)
+    assert time.perf_counter() - start < 5
+    assert _accounts_for_every_item(old, new, changes, removed)
@@ -0,0 +1,327 @@
+import os
+import time
+import random
+import logging
+import threading
+import urllib.parse
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+import requests
+
+# Per-host request scheduling for fetcher.fetch.
+#
+# Every host gets a token bucket (SCRAPER_HOST_RATE requests per second with
+# bursts of SCRAPER_HOST_BURST), so any number of workers together stay
+# within the rate. 429, 502, 503 and 504 responses, connection errors and
+# timeouts are retried with exponential backoff and full jitter, waiting at
+# least as long as Retry-After asks; the whole host pauses for that time, not
+# just the request that was refused. A 429 or 503 also halves the host's
+# rate, which then creeps back up with every success. After
+# SCRAPER_BREAKER_THRESHOLD failures in a row the host's circuit opens and
+# requests fail at once until SCRAPER_BREAKER_RESET seconds have passed, when
+# a single trial request decides whether it closes again. The state is per
+# process and shown by /api/hosts.
+
+settings = {
+    'enabled': os.environ.get('SCRAPER_THROTTLE', '1').lower() not in ('0', 'false', 'no'),
+    # Sustained requests per second per host, and the burst allowed above it
+    'rate': float(os.environ.get('SCRAPER_HOST_RATE', 2)),
+    'burst': float(os.environ.get('SCRAPER_HOST_BURST', 4)),
+    # Lowest rate repeated 429/503 responses can push a host down to
+    'min_rate': float(os.environ.get('SCRAPER_HOST_MIN_RATE', 0.05)),
+    'max_retries': int(os.environ.get('SCRAPER_MAX_RETRIES', 3)),
+    'backoff_base': float(os.environ.get('SCRAPER_BACKOFF_BASE', 0.5)),
+    'backoff_max': float(os.environ.get('SCRAPER_BACKOFF_MAX', 60)),
+    # Requests that would have to wait longer than this for a host fail instead
+    'max_wait': float(os.environ.get('SCRAPER_HOST_MAX_WAIT', 60)),
+    'failure_threshold': int(os.environ.get('SCRAPER_BREAKER_THRESHOLD', 5)),
+    'reset_timeout': float(os.environ.get('SCRAPER_BREAKER_RESET', 60)),
+    # Number of hosts whose state is kept
+    'max_hosts': int(os.environ.get('SCRAPER_THROTTLE_HOSTS', 4096)),
+}
+
+RETRY_STATUSES = {429, 502, 503, 504}
+# Statuses that mean the host wants us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+class HostUnavailable(requests.exceptions.RequestException):
+    """The host's circuit is open or it cannot be reached in time"""
+
+def host_key(url):
+    """The scheme and host a URL's limits are kept under"""
+    parsed = urllib.parse.urlsplit(url)
+    return f"{parsed.scheme.lower()}://{parsed.netloc.lower()}"
+
+def parse_retry_after(value):
+    """
+    Read a Retry-After header.
+
+    Args:
+        value (str): Seconds or an HTTP date
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class HostState:
+    """Rate limit and circuit breaker state of one host"""
+
+    def __init__(self, host, rate, burst):
+        self.host = host
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        # Nothing is sent before this (Retry-After and backoff pauses)
+        self.blocked_until = 0.0
+        self.crawl_delay = None
+        self.circuit = CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.rejected = 0
+        self.waited = 0.0
+
+    def limits(self):
+        """The current (rate, burst), slowed down to the Crawl-delay if there is one"""
+        if self.crawl_delay:
+            return min(self.rate, 1.0 / self.crawl_delay), 1.0
+        return self.rate, settings['burst']
+
+    def to_dict(self):
+        now = time.monotonic()
+        rate, burst = self.limits()
+        return {
+            'host': self.host,
+            'circuit': self.circuit,
+            'rate': round(rate, 3),
+            'tokens': round(min(burst, self.tokens + (now - self.updated) * rate), 2),
+            'blocked_for': round(max(0.0, self.blocked_until - now), 2),
+            'crawl_delay': self.crawl_delay,
+            'consecutive_failures': self.consecutive_failures,
+            'reopens_in': round(max(0.0, self.opened_at + settings['reset_timeout'] - now), 2) if self.circuit == OPEN else None,
+            'requests': self.requests,
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'waited': round(self.waited, 2),
+        }
+
+class HostLimiter:
+    """
+    Token buckets and circuit breakers for every host, in one bounded table.
+
+    Hosts not used for a while are dropped least recently used first.
+    """
+
+    def __init__(self, max_hosts=4096):
+        self.max_hosts = max_hosts
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, host):
+        """Get or create a host's state; the caller holds the lock"""
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(host, settings['rate'], settings['burst'])
+            while len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+        return state
+
+    def acquire(self, host):
+        """
+        Wait until a request may be sent to a host.
+
+        Args:
+            host (str): The host key from host_key()
+
+        Raises:
+            HostUnavailable: If the circuit is open or the wait would be
+                longer than settings['max_wait']
+        """
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            if state.circuit == OPEN:
+                if now - state.opened_at < settings['reset_timeout']:
+                    state.rejected += 1
+                    raise HostUnavailable(f"Circuit open for {host} after {state.consecutive_failures} failures")
+                # Let one trial request through
+                state.circuit = HALF_OPEN
+                state.trial_in_flight = False
+            if state.circuit == HALF_OPEN:
+                if state.trial_in_flight:
+                    state.rejected += 1
+                    raise HostUnavailable(f"Circuit half-open for {host}, waiting for a trial request")
+                state.trial_in_flight = True
+
+            # Refill, then take a token; a negative balance reserves a later slot
+            rate, burst = state.limits()
+            state.tokens = min(burst, state.tokens + (now - state.updated) * rate)
+            state.updated = now
+            wait = max(0.0, (1 - state.tokens) / rate, state.blocked_until - now)
+            if wait > settings['max_wait']:
+                state.rejected += 1
+                state.trial_in_flight = False
+                raise HostUnavailable(f"{host} is rate limited for another {wait:.0f}s")
+            state.tokens -= 1
+            state.requests += 1
+            state.waited += wait
+
+        if wait:
+            time.sleep(wait)
+
+    def record_success(self, host):
+        """Close the circuit and let the rate recover after a good response"""
+        with self._lock:
+            state = self._state(host)
+            state.consecutive_failures = 0
+            state.circuit = CLOSED
+            state.trial_in_flight = False
+            # Additive increase back towards the configured rate
+            state.rate = min(settings['rate'], state.rate + settings['rate'] / 10)
+
+    def record_failure(self, host, attempt, retry_after=None, throttled=False):
+        """
+        Count a failed attempt and pause the host before the next one.
+
+        Args:
+            host (str): The host key
+            attempt (int): Number of retries already made for this request
+            retry_after (float): Seconds the server asked us to wait
+            throttled (bool): Whether the server signalled overload (429/503)
+
+        Returns:
+            float: Seconds until the host may be retried, or None if the
+                request should not be retried
+        """
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            state.failures += 1
+            state.consecutive_failures += 1
+            state.trial_in_flight = False
+            if throttled:
+                state.throttled += 1
+                # Multiplicative decrease
+                state.rate = max(settings['min_rate'], state.rate / 2)
+
+            if state.circuit == HALF_OPEN or state.consecutive_failures >= settings['failure_threshold']:
+                if state.circuit != OPEN:
+                    logging.warning(f"Opening circuit for {host} after {state.consecutive_failures} failures")
+                state.circuit = OPEN
+                state.opened_at = now
+                return None
+
+            # Full jitter, but never sooner than Retry-After
+            delay = random.uniform(0, min(settings['backoff_max'], settings['backoff_base'] * 2 ** attempt))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            state.blocked_until = max(state.blocked_until, now + delay)
+            if attempt >= settings['max_retries'] or delay > settings['max_wait']:
+                return None
+            state.retries += 1
+            return delay
+
+    def release_trial(self, host):
+        """Let another request through a half-open circuit after a trial that proved nothing"""
+        with self._lock:
+            self._state(host).trial_in_flight = False
+
+    def set_crawl_delay(self, host, delay):
+        """Slow a host down to one request per delay seconds"""
+        with self._lock:
+            self._state(host).crawl_delay = delay or None
+
+    def snapshot(self):
+        """The state of every tracked host, most recently used first"""
+        with self._lock:
+            return [state.to_dict() for state in reversed(self._hosts.values())]
+
+    def reset(self, host=None):
+        """Forget the state of one host, or of all of them"""
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(host, None)
+
+host_limiter = HostLimiter(max_hosts=settings['max_hosts'])
+
+def request(url, send):
+    """
+    Send a request within its host's limits, retrying transient failures.
+
+    Args:
+        url (str): The URL being requested
+        send (callable): Sends the request and returns a requests.Response
+
+    Returns:
+        requests.Response: The final response; a retryable error status is
+            returned as is once the retries are used up
+
+    Raises:
+        HostUnavailable: If the host's circuit is open or it is rate limited
+            for too long
+        requests.exceptions.RequestException: If the last attempt failed
+    """
+    if not settings['enabled']:
+        return send()
+
+    host = host_key(url)
+    attempt = 0
+    while True:
+        host_limiter.acquire(host)
+        response = None
+        try:
+            response = send()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            error = e
+            delay = host_limiter.record_failure(host, attempt)
+        except BaseException:
+            # Errors that say nothing about the host's health (redirect loops,
+            # invalid URLs, broken bodies) must not leave a trial in flight
+            host_limiter.release_trial(host)
+            raise
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                host_limiter.record_success(host)
+                return response
+            delay = host_limiter.record_failure(host, attempt, parse_retry_after(response.headers.get('Retry-After')),
+                                                throttled=response.status_code in THROTTLE_STATUSES)
+
+        if delay is None:
+            if response is not None:
+                return response
+            raise error
+        if response is not None:
+            response.close()
+        logging.info(f"Retrying {url} in {delay:.1f}s (attempt {attempt + 1})")
+        attempt += 1
+
+def set_crawl_delay(url, delay):
+    """Apply a robots.txt Crawl-delay to the host of a URL"""
+    host_limiter.set_crawl_delay(host_key(url), delay)
+
+def host_states():
+    """The rate limit and circuit state of every tracked host"""
+    return host_limiter.snapshot()
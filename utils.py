@@ -1,10 +1,14 @@
 import csv
-import io
 import json
 import re
-from flask import make_response, jsonify
+import zlib
+from flask import Response, stream_with_context
 import logging
 import html
+import urllib.parse
+
+# Exports are streamed in chunks of about this many characters
+EXPORT_BUFFER_SIZE = 64 * 1024
 
 def sanitize_input(input_str):
     """
@@ -27,62 +31,210 @@ def sanitize_input(input_str):
     
     return sanitized
 
-def export_to_csv(session_data, scraped_items):
+def canonicalize_url(url):
     """
-    Export scraped data to CSV format
+    Normalize a URL so equivalent spellings map to the same cache key
+    
+    Lowercases the scheme and host, drops default ports and fragments,
+    sorts the query string and uses '/' for an empty path.
     
     Args:
-        session_data (ScrapingSession): The scraping session
-        scraped_items (list): List of ScrapedData items
+        url (str): The URL to normalize
         
     Returns:
-        Response: A Flask response with the CSV data
+        str: The canonical URL
     """
-    output = io.StringIO()
-    writer = csv.writer(output)
+    if not url:
+        return ""
     
-    # Write headers
-    writer.writerow(['Index', 'Element Type', 'Content', 'Attributes'])
+    parsed = urllib.parse.urlsplit(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = (parsed.hostname or '').lower()
     
-    # Write data
-    for item in scraped_items:
-        attributes = item.attributes if item.attributes else '{}'
-        writer.writerow([
-            item.index,
-            item.element_type,
-            item.content,
-            attributes
-        ])
-    
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers["Content-Disposition"] = f"attachment; filename=scraping_session_{session_data.id}.csv"
-    response.headers["Content-type"] = "text/csv"
+    # Keep the port only when it differs from the scheme default
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        netloc = f"{netloc}:{port}"
+    if parsed.username:
+        credentials = parsed.username + (f":{parsed.password}" if parsed.password else '')
+        netloc = f"{credentials}@{netloc}"
+    
+    path = parsed.path or '/'
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)))
+    
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, ''))
+
+def _encode_chunks(chunks):
+    """Encode text chunks as UTF-8"""
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
+
+def _gzip_chunks(chunks):
+    """Gzip text chunks on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _buffered(parts, size=EXPORT_BUFFER_SIZE):
+    """Join small text parts into chunks of roughly the given size"""
+    buffer = []
+    buffered = 0
+    for part in parts:
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def _stream_export(parts, filename, mimetype, compress=False):
+    """
+    Build a streaming download response
     
+    Args:
+        parts (iterable): Text fragments of the file
+        filename (str): The download file name
+        mimetype (str): The content type of the uncompressed file
+        compress (bool): Whether to gzip the file on the fly
+        
+    Returns:
+        Response: A streaming Flask response
+    """
+    chunks = _buffered(parts)
+    if compress:
+        body = _gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    else:
+        body = _encode_chunks(chunks)
+    
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
     return response
 
-def export_to_json(session_data, scraped_items):
+def export_to_csv(session_data, scraped_items, compress=False):
+    """
+    Export scraped data to CSV format
+    
+    Rows are written as they are read, so memory use does not depend on
+    the size of the session.
+    
+    Args:
+        session_data (ScrapingSession): The scraping session
+        scraped_items (iterable): ScrapedData rows (objects or mappings)
+        compress (bool): Whether to gzip the file
+        
+    Returns:
+        Response: A streaming Flask response with the CSV data
+    """
+    def generate():
+        line = _CsvLine()
+        writer = csv.writer(line)
+        
+        # Write headers
+        writer.writerow(['Index', 'Element Type', 'Content', 'Attributes',
+                         'Change Type', 'Previous Index', 'Content Hash'])
+        yield line.pop()
+        
+        # Write data
+        for item in scraped_items:
+            item = _as_mapping(item)
+            writer.writerow([
+                item['index'],
+                item['element_type'],
+                item['content'],
+                item['attributes'] if item['attributes'] else '{}',
+                item['change_type'] or '',
+                item['previous_index'] if item['previous_index'] is not None else '',
+                item['content_hash'] or ''
+            ])
+            yield line.pop()
+    
+    return _stream_export(generate(), f"scraping_session_{session_data.id}.csv", "text/csv", compress)
+
+def export_to_json(session_data, scraped_items, compress=False):
     """
     Export scraped data to JSON format
     
+    The document has the same shape as before ({"session": ..., "items": [...]})
+    but is written item by item.
+    
     Args:
         session_data (ScrapingSession): The scraping session
-        scraped_items (list): List of ScrapedData items
+        scraped_items (iterable): ScrapedData rows (objects or mappings)
+        compress (bool): Whether to gzip the file
         
     Returns:
-        Response: A Flask response with the JSON data
+        Response: A streaming Flask response with the JSON data
     """
-    data = {
-        'session': session_data.to_dict(),
-        'items': [item.to_dict() for item in scraped_items]
-    }
+    def generate():
+        yield '{"session": ' + json.dumps(session_data.to_dict()) + ', "items": ['
+        separator = ''
+        for item in scraped_items:
+            yield separator + json.dumps(_item_dict(item))
+            separator = ', '
+        yield ']}'
     
-    # Create response
-    response = make_response(jsonify(data))
-    response.headers["Content-Disposition"] = f"attachment; filename=scraping_session_{session_data.id}.json"
-    response.headers["Content-type"] = "application/json"
+    return _stream_export(generate(), f"scraping_session_{session_data.id}.json", "application/json", compress)
+
+def export_to_ndjson(session_data, scraped_items, compress=False):
+    """
+    Export scraped data as newline-delimited JSON, one item per line
     
-    return response
+    Args:
+        session_data (ScrapingSession): The scraping session
+        scraped_items (iterable): ScrapedData rows (objects or mappings)
+        compress (bool): Whether to gzip the file
+        
+    Returns:
+        Response: A streaming Flask response with the NDJSON data
+    """
+    def generate():
+        for item in scraped_items:
+            yield json.dumps(_item_dict(item)) + '\n'
+    
+    return _stream_export(generate(), f"scraping_session_{session_data.id}.ndjson", "application/x-ndjson", compress)
+
+class _CsvLine:
+    """Minimal file object that hands back what csv.writer wrote"""
+    def __init__(self):
+        self.parts = []
+    
+    def write(self, text):
+        self.parts.append(text)
+    
+    def pop(self):
+        text = ''.join(self.parts)
+        self.parts = []
+        return text
+
+def _as_mapping(item):
+    """Access ScrapedData objects and result rows the same way"""
+    return item._mapping if hasattr(item, '_mapping') else item.to_dict()
+
+def _item_dict(item):
+    """Serialize a ScrapedData object or row like ScrapedData.to_dict()"""
+    item = _as_mapping(item)
+    return {
+        'id': item['id'],
+        'session_id': item['session_id'],
+        'content': item['content'],
+        'content_type': item['content_type'],
+        'element_type': item['element_type'],
+        'attributes': item['attributes'],
+        'index': item['index'],
+        'content_hash': item['content_hash'],
+        'change_type': item['change_type'],
+        'previous_index': item['previous_index']
+    }
 
 def get_data_summary(scraped_items):
     """